@@ -1,6 +1,12 @@
 # probe_token_robust.py
+# Usage:
+#   python checksum.py                   # probe ADDR's TOKEN balance, falling back across RPCS
+#   python checksum.py --bulk pairs.csv  # token,holder rows -> balance table via Multicall3
+import sys, csv
 from web3 import Web3
 from decimal import Decimal
+from rpc_pool import RpcPool
+from erc20_fast import SEL_DECIMALS, SEL_BALANCE, pad32, decode_uint
 
 ADDR  = "0x4106DBe31e9cf790D4dD221E627BDe55c8de195E"  # your wallet
 TOKEN = "0x164239f9a4aec9c4e437bf6890ea8602b759fd74"  # VERONICA proxy (the Contract address)
@@ -12,36 +18,108 @@ RPCS = [
     "https://rpc.ankr.com/base",
 ]
 
-def pad32(x: bytes) -> bytes:
-    return b"\x00"*(32-len(x)) + x
-
 def hex0x(b: bytes) -> str:
     return "0x" + b.hex()
 
-# Method selectors
-# decimals(): 0x313ce567
-# balanceOf(address): 0x70a08231
-SEL_DECIMALS = bytes.fromhex("313ce567")
-SEL_BALANCE  = bytes.fromhex("70a08231")
+# Method selectors (decimals/balanceOf live in erc20_fast.py)
+# aggregate3((address,bool,bytes)[]): 0x82ad56cb
+SEL_AGGREGATE3 = bytes.fromhex("82ad56cb")
+
+MULTICALL3 = "0xcA11bde05977b3631167028862bE2a173976CA11"  # same address on Base and most chains
+MULTICALL_CHUNK = 500   # sub-calls per aggregate3 eth_call
 
 def raw_decimals(w3, token):
     data = SEL_DECIMALS
-    res = w3.eth.call({"to": token, "data": hex0x(data)})
-    if len(res) < 66:  # 0x + 64 hex chars == 32 bytes
-        raise RuntimeError(f"decimals() returned too little data: {res}")
-    return int(res, 16)
+    return decode_uint(w3.eth.call({"to": token, "data": hex0x(data)}))
 
 def raw_balance_of(w3, token, addr):
     a = bytes.fromhex(addr[2:])
     data = SEL_BALANCE + pad32(a)
-    res = w3.eth.call({"to": token, "data": hex0x(data)})
-    if len(res) < 66:
-        raise RuntimeError(f"balanceOf() returned too little data: {res}")
-    return int(res, 16)
-
-for rpc in RPCS:
-    print("\n--- Trying RPC:", rpc)
-    w3 = Web3(Web3.HTTPProvider(rpc, request_kwargs={"timeout": 20}))
+    return decode_uint(w3.eth.call({"to": token, "data": hex0x(data)}))
+
+def u256(n: int) -> bytes:
+    return n.to_bytes(32, "big")
+
+def encode_aggregate3(calls):
+    # calls: [(target, calldata)], all with allowFailure=true
+    # ABI: offset to array, then length, per-element offsets, and the tuples
+    # (address, bool, offset-to-bytes, bytes length, bytes padded to 32).
+    heads, tails = [], b""
+    for target, data in calls:
+        heads.append(u256(32 * len(calls) + len(tails)))
+        padded = data + b"\x00" * (-len(data) % 32)
+        tails += (pad32(bytes.fromhex(target[2:])) + u256(1) + u256(0x60)
+                  + u256(len(data)) + padded)
+    return SEL_AGGREGATE3 + u256(0x20) + u256(len(calls)) + b"".join(heads) + tails
+
+def decode_aggregate3(ret: bytes):
+    # returns [(success, returnData)]
+    word = lambda off: int.from_bytes(ret[off:off + 32], "big")
+    base = word(0)
+    n = word(base)
+    items = base + 32
+    out = []
+    for i in range(n):
+        t = items + word(items + 32 * i)
+        ok = word(t) == 1
+        d = t + word(t + 32)
+        out.append((ok, ret[d + 32:d + 32 + word(d)]))
+    return out
+
+def multicall(w3, calls, chunk=MULTICALL_CHUNK):
+    results = []
+    for i in range(0, len(calls), chunk):
+        part = calls[i:i + chunk]
+        res = w3.eth.call({"to": MULTICALL3, "data": hex0x(encode_aggregate3(part))})
+        results.extend(decode_aggregate3(bytes(res)))
+    return results
+
+def bulk_balances(w3, pairs, chunk=MULTICALL_CHUNK):
+    # pairs: [(token, holder)] -> [{"token", "holder", "balance_raw", "decimals", "balance"}]
+    # decimals() is probed once per distinct token in the same aggregate3 round-trips.
+    tokens = list(dict.fromkeys(Web3.to_checksum_address(t) for t, _ in pairs))
+    pairs = [(Web3.to_checksum_address(t), Web3.to_checksum_address(h)) for t, h in pairs]
+    calls = [(t, SEL_DECIMALS) for t in tokens]
+    calls += [(t, SEL_BALANCE + pad32(bytes.fromhex(h[2:]))) for t, h in pairs]
+    res = multicall(w3, calls, chunk)
+
+    decimals = {}
+    for t, (ok, data) in zip(tokens, res[:len(tokens)]):
+        decimals[t] = int.from_bytes(data[:32], "big") if ok and len(data) >= 32 else None
+    table = []
+    for (t, h), (ok, data) in zip(pairs, res[len(tokens):]):
+        raw = int.from_bytes(data[:32], "big") if ok and len(data) >= 32 else None
+        d = decimals[t]
+        bal = Decimal(raw) / (10 ** d) if raw is not None and d is not None else None
+        table.append({"token": t, "holder": h, "balance_raw": raw, "decimals": d, "balance": bal})
+    return table
+
+def load_pairs(path):
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        return [(r["token"].strip(), r["holder"].strip()) for r in csv.DictReader(f)
+                if (r.get("token") or "").strip() and (r.get("holder") or "").strip()]
+
+def main_bulk(path):
+    pairs = load_pairs(path)
+    pool = RpcPool(RPCS)
+    w3 = Web3(pool)
+    try:
+        table = bulk_balances(w3, pairs)
+    except Exception as e:
+        print("RPC failed:", repr(e))
+        print(pool.stats())
+        return
+    print(f"{len(table)} balances via Multicall3 aggregate3 (chunks of {MULTICALL_CHUNK})")
+    for r in table:
+        bal = "?" if r["balance"] is None else r["balance"]
+        print(f"{r['token']}  {r['holder']}  {bal}")
+    print(pool.stats())
+
+def main():
+    # reads go to the healthiest of RPCS and are hedged onto the next one when
+    # slow, instead of walking the list one 20s timeout at a time
+    pool = RpcPool(RPCS)
+    w3 = Web3(pool)
     try:
         print("chainId:", w3.eth.chain_id)
         token = Web3.to_checksum_address(TOKEN)
@@ -56,6 +134,12 @@ for rpc in RPCS:
 
         print("decimals:", d)
         print("balance:", bal)
-        break
     except Exception as e:
         print("RPC failed:", repr(e))
+    print(pool.stats())
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--bulk":
+        main_bulk(sys.argv[2])
+    else:
+        main()
@@ -0,0 +1,230 @@
+# confirm_tracker.py
+# One head follower for every in-flight tx, instead of a receipt poll per tx.
+# A background thread follows new blocks: an eth_subscribe("newHeads")
+# WebSocket when WS_URL is set (and the websockets package is installed),
+# else an eth_getBlockByNumber("latest") poll every HEAD_POLL seconds. On each
+# new block it fetches that block's receipts with one eth_getBlockReceipts
+# call and matches them against all watched hashes; hashes registered since
+# the last head get a single batched eth_getTransactionReceipt lookup, so txs
+# mined before they were watched are found too. Waiters get a
+# concurrent.futures.Future that resolves once the receipt is `depth` blocks
+# deep (1 = included). Nothing is fetched while no hash is being watched.
+# Nodes without eth_getBlockReceipts fall back to one receipt batch per head.
+# Usage:
+#   tracker = ConfirmationTracker(pool).start()
+#   rcpt = tracker.watch(txh).result(timeout=180)
+#   NonceManager(w3, acct, tracker=tracker)   # nm.wait()/receipt() use it
+import os, json, time, threading
+from concurrent.futures import Future
+from web3.datastructures import AttributeDict
+
+# ----- Config -----
+WS_URL = os.getenv("WS_URL", "")                         # wss://... for newHeads; empty => HTTP head polling
+CONFIRMATIONS = int(os.getenv("RECEIPT_CONFIRMATIONS", "1"))  # blocks deep before a waiter is released
+HEAD_POLL = 1.0          # seconds between head polls without a WebSocket
+WS_RETRY = 30            # seconds of HTTP polling after a WebSocket failure before reconnecting
+MAX_BLOCK_CATCHUP = 20   # head jumped further than this: look watched hashes up directly instead
+RECEIPT_BATCH = 100      # hashes per eth_getTransactionReceipt batch
+KEEP_HEADERS = 256       # recent block hashes remembered for reorg checks
+# -------------------
+
+INT_FIELDS = ("blockNumber", "status", "gasUsed", "effectiveGasPrice", "cumulativeGasUsed", "transactionIndex", "type")
+
+def decode_receipt(raw):
+    r = dict(raw)
+    for k in INT_FIELDS:
+        if isinstance(r.get(k), str):
+            r[k] = int(r[k], 16)
+    return AttributeDict(r)
+
+class RpcError(Exception):
+    pass
+
+class ConfirmationTracker:
+    def __init__(self, pool, ws_url=WS_URL, depth=CONFIRMATIONS):
+        self.pool = pool
+        self.ws_url = ws_url
+        self.depth = max(1, depth)
+        self.lock = threading.Lock()
+        self.watches = {}    # hash -> {"future": Future, "rcpt": receipt or None}
+        self.fresh = set()   # watched since the last head; looked up directly once
+        self.last = None     # last block whose receipts were matched
+        self.head = None
+        self.headers = {}    # number -> block hash
+        self.block_receipts = True  # node supports eth_getBlockReceipts
+        self.closed = threading.Event()
+        self.thread = None
+        self.source = "http"
+        self.heads = self.block_calls = self.batch_calls = self.resolved = self.reorgs = 0
+
+    # ----- waiter API -----
+    def watch(self, txh):
+        # Future for txh's receipt; watching a hash twice returns the same future
+        txh = txh.lower()
+        with self.lock:
+            w = self.watches.get(txh)
+            if w is None:
+                w = self.watches[txh] = {"future": Future(), "rcpt": None}
+                self.fresh.add(txh)
+            return w["future"]
+
+    def forget(self, txh):
+        with self.lock:
+            w = self.watches.pop(txh.lower(), None)
+            self.fresh.discard(txh.lower())
+        if w:
+            w["future"].cancel()
+
+    # ----- lifecycle -----
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.closed.set()
+        if self.thread:
+            self.thread.join(timeout=HEAD_POLL + 5)
+        with self.lock:
+            watches, self.watches = list(self.watches.values()), {}
+        for w in watches:
+            w["future"].cancel()
+
+    def _run(self):
+        retry_ws_at = 0.0
+        while not self.closed.is_set():
+            if self.ws_url and time.time() >= retry_ws_at:
+                try:
+                    self._follow_ws()
+                except Exception as e:
+                    if self.closed.is_set():
+                        return
+                    print(f"[warn] newHeads subscription failed ({e!r}); polling heads over HTTP for {WS_RETRY}s")
+                    retry_ws_at = time.time() + WS_RETRY
+                continue
+            self.source = "http"
+            try:
+                blk = self._rpc("eth_getBlockByNumber", ["latest", False])
+                self.on_head(int(blk["number"], 16), blk["hash"], blk["parentHash"])
+            except Exception as e:
+                print(f"[warn] head poll failed: {e!r}")
+            self.closed.wait(HEAD_POLL)
+
+    def _follow_ws(self):
+        from websockets.sync.client import connect  # optional; only needed with WS_URL
+        with connect(self.ws_url, open_timeout=10) as ws:
+            ws.send(json.dumps({"jsonrpc": "2.0", "id": 1, "method": "eth_subscribe", "params": ["newHeads"]}))
+            ack = json.loads(ws.recv(timeout=10))
+            if "error" in ack:
+                raise RpcError(ack["error"])
+            self.source = "ws"
+            while not self.closed.is_set():
+                try:
+                    msg = json.loads(ws.recv(timeout=HEAD_POLL))
+                except TimeoutError:
+                    continue
+                hdr = (msg.get("params") or {}).get("result")
+                if hdr:
+                    self.on_head(int(hdr["number"], 16), hdr["hash"], hdr["parentHash"])
+
+    # ----- per head -----
+    def _rpc(self, method, params):
+        body = self.pool.post({"jsonrpc": "2.0", "id": 1, "method": method, "params": params}).json()
+        if "error" in body:
+            raise RpcError(body["error"])
+        return body.get("result")
+
+    def _lookup(self, hashes):
+        # batched eth_getTransactionReceipt; returns {hash: receipt} for mined ones
+        found = {}
+        for i in range(0, len(hashes), RECEIPT_BATCH):
+            chunk = hashes[i:i + RECEIPT_BATCH]
+            payload = [{"jsonrpc": "2.0", "id": j, "method": "eth_getTransactionReceipt", "params": [h]}
+                       for j, h in enumerate(chunk)]
+            body = self.pool.post(payload).json()
+            self.batch_calls += 1
+            if not isinstance(body, list):
+                raise RpcError(body.get("error", body) if isinstance(body, dict) else body)
+            for item in body:
+                if isinstance(item.get("id"), int) and item.get("result"):
+                    found[chunk[item["id"]]] = decode_receipt(item["result"])
+        return found
+
+    def on_head(self, number, block_hash, parent_hash):
+        with self.lock:
+            seen = self.head is not None and number <= self.head and self.headers.get(number) == block_hash
+            if seen:
+                pass  # same head polled again: only newly watched hashes are looked up
+            elif self.headers.get(number - 1) not in (None, parent_hash):
+                # reorg: receipts in replaced blocks are looked up again
+                self.reorgs += 1
+                for h, w in self.watches.items():
+                    if w["rcpt"] is not None and w["rcpt"]["blockNumber"] >= number - self.depth:
+                        w["rcpt"] = None
+                        self.fresh.add(h)
+                self.headers = {n: bh for n, bh in self.headers.items() if n < number - 1}
+                self.last = min(self.last, number - 1) if self.last is not None else None
+            if not seen:
+                self.heads += 1
+                self.headers[number] = block_hash
+                for n in [n for n in self.headers if n <= number - KEEP_HEADERS]:
+                    del self.headers[n]
+                self.head = number
+            start = number if self.last is None else self.last + 1
+            pending = {h for h, w in self.watches.items() if w["rcpt"] is None}
+            fresh, self.fresh = self.fresh, set()
+
+        found = {}
+        try:
+            if pending - fresh and start <= number:
+                if self.block_receipts and number - start < MAX_BLOCK_CATCHUP:
+                    for b in range(start, number + 1):
+                        found.update(self._block_receipts(b, pending))
+                else:
+                    found.update(self._lookup(sorted(pending - fresh)))
+            if fresh:
+                found.update(self._lookup(sorted(fresh)))
+        except Exception as e:
+            print(f"[warn] receipt fetch at block {number} failed: {e!r}")
+            with self.lock:
+                self.fresh |= fresh  # retried on the next head
+            return
+        self._resolve(number, found)
+
+    def _block_receipts(self, b, pending):
+        try:
+            rcpts = self._rpc("eth_getBlockReceipts", [hex(b)]) or []
+        except RpcError as e:
+            print(f"[warn] eth_getBlockReceipts unavailable ({e}); using receipt batches")
+            self.block_receipts = False
+            return self._lookup(sorted(pending))
+        self.block_calls += 1
+        return {r["transactionHash"].lower(): decode_receipt(r) for r in rcpts
+                if r.get("transactionHash", "").lower() in pending}
+
+    def _resolve(self, number, found):
+        done = []
+        with self.lock:
+            for h, rcpt in found.items():
+                if h in self.watches:
+                    self.watches[h]["rcpt"] = rcpt
+            for h, w in list(self.watches.items()):
+                r = w["rcpt"]
+                if r is None or number - r["blockNumber"] + 1 < self.depth:
+                    continue
+                if self.headers.get(r["blockNumber"]) not in (None, r.get("blockHash")):
+                    w["rcpt"] = None  # mined in a block that has since been replaced
+                    self.fresh.add(h)
+                    continue
+                done.append((w["future"], r))
+                del self.watches[h]
+            self.last = number
+        for fut, r in done:
+            if fut.set_running_or_notify_cancel():
+                fut.set_result(r)
+                self.resolved += 1
+
+    def stats(self):
+        return (f"confirmations: {self.resolved} resolved at depth {self.depth} via {self.source} heads "
+                f"({self.heads} heads, {self.block_calls} block-receipt calls, {self.batch_calls} receipt batches, "
+                f"{self.reorgs} reorgs, {len(self.watches)} still watched)")
@@ -0,0 +1,91 @@
+# fee_oracle.py
+# Fee quotes and gas limits shared across a whole payout run.
+# Instead of get_block("latest") + estimate_gas for every transfer, the base
+# fee is refreshed once per new block (background polling thread, or lazily
+# when no thread is running) and gas estimates are memoized per call class.
+import threading, time
+from web3 import Web3
+
+# ----- Config -----
+TIP_GWEI = 1                  # maxPriorityFeePerGas
+POLL_INTERVAL = 2.0           # seconds between latest-block polls (Base ~2s blocks)
+MAX_QUOTE_AGE = 30.0          # refresh synchronously if the poller fell this far behind
+GAS_MARGIN = 1.2              # multiply memoized estimates by this
+FRESH_RECIPIENT_EXTRA = 20_000  # zero -> non-zero balance slot costs ~17.1k more gas
+FALLBACK_GAS = 120_000        # used (not memoized) when estimate_gas fails
+# -------------------
+
+class FeeOracle:
+    def __init__(self, w3: Web3, background=True, poll=POLL_INTERVAL):
+        self.w3 = w3
+        self.poll = poll
+        self.tip = w3.to_wei(TIP_GWEI, "gwei")
+        self.base = None
+        self.block = None
+        self.updated = 0.0
+        self.gas_memo = {}
+        self.seen_recipients = set()
+        self.lock = threading.Lock()
+        self.stop_evt = threading.Event()
+        self.thread = None
+        self.block_fetches = 0
+        self.estimates = 0
+        if background:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def close(self):
+        self.stop_evt.set()
+        if self.thread:
+            self.thread.join(timeout=self.poll + 1)
+
+    def refresh(self):
+        latest = self.w3.eth.get_block("latest")
+        self.block_fetches += 1
+        base = latest.get("baseFeePerGas")
+        if base is None:
+            base = self.w3.eth.gas_price
+        with self.lock:
+            if latest["number"] != self.block:
+                self.block = latest["number"]
+                self.base = base
+            self.updated = time.time()
+
+    def _run(self):
+        while not self.stop_evt.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[warn] fee poll failed: {e!r}")
+            self.stop_evt.wait(self.poll)
+
+    def fees(self):
+        # Same quote the scripts used to build per tx: base + 2*tip, 1 gwei tip
+        limit = MAX_QUOTE_AGE if self.thread and self.thread.is_alive() else self.poll
+        if self.base is None or time.time() - self.updated > limit:
+            self.refresh()
+        with self.lock:
+            return {"maxFeePerGas": self.base + 2*self.tip, "maxPriorityFeePerGas": self.tip, "type": 2}
+
+    def gas_for(self, tx, token, method, recipient):
+        # Recipients already paid during this run hold a balance, so their
+        # transfer is cheaper; unseen ones get the zero -> non-zero surcharge.
+        fresh = recipient not in self.seen_recipients
+        key = (token, method, fresh)
+        gas = self.gas_memo.get(key)
+        if gas is None:
+            probe = {k: v for k, v in tx.items() if k != "gas"}
+            try:
+                est = self.w3.eth.estimate_gas(probe)
+                self.estimates += 1
+            except Exception:
+                return FALLBACK_GAS
+            gas = int(est * GAS_MARGIN)
+            if fresh:
+                gas = max(gas, est + FRESH_RECIPIENT_EXTRA)
+            self.gas_memo[key] = gas
+        self.seen_recipients.add(recipient)
+        return gas
+
+    def stats(self):
+        return f"fee oracle: {self.block_fetches} block fetches, {self.estimates} gas estimates"
@@ -1,8 +1,13 @@
 # gas_fees_base.py
-import os, sys, csv, time
+import os, re, sys, csv, json, time, random, asyncio
 from decimal import Decimal, getcontext
 from dotenv import load_dotenv
-from web3 import Web3
+from web3 import Web3, AsyncWeb3
+from web3.datastructures import AttributeDict
+from receipt_cache import ReceiptCache
+from rpc_pool import RpcPool, EndpointError, urls_from_env
+from rpc_metrics import METRICS, batch_label, instrument_provider
+import gas_report
 
 getcontext().prec = 50  # high precision for ETH math
 
@@ -12,12 +17,37 @@ INPUT_FILE  = "hashes.txt"                # optional: one tx hash per line
 OUTPUT_FILE = "gas_fees.csv"
 MAX_RETRIES = 3
 SLEEP_BETWEEN = 0.5
+# --async mode (python gas_fees_base.py --async [hashes...])
+ASYNC_CONCURRENCY = 16  # max hashes in flight at once
+BACKOFF_BASE = 0.5      # seconds; doubled per retry with full jitter
+BACKOFF_MAX  = 8.0
+# Receipts/txs past receipt_cache.CONFIRMATIONS are cached on disk; --no-cache disables
+# --batch mode (python gas_fees_base.py --batch [hashes...])
+BATCH_SIZE = 100        # hashes per JSON-RPC batch (2 calls each); halved on rejection, regrown after success
+MIN_BATCH_SIZE = 1
+# --scan mode (python gas_fees_base.py --scan <wallet> [from_block] [to_block])
+# Finds the wallet's txs from the token's Transfer logs instead of hashes.txt
+TOKEN_ADDR = os.getenv("TOKEN_ADDR", "0x164239FA94aec9c4e437Bf6890ea8602b759fd74")  # VERONICA on Base
+SCAN_CHUNK = 2000       # starting eth_getLogs block range
+SCAN_CHUNK_MAX = 50000  # doubled after each accepted range up to this
+SCAN_CHUNK_MIN = 1      # halved when the provider refuses a range
+SCAN_CONFIRMATIONS = 12 # default to_block = head - this, so checkpoints never cover reorgable blocks
+CHECKPOINT_FILE = "scan_checkpoint.json"  # last scanned block per (chain, token, wallet)
+# --columnar: write typed Parquet (pyarrow) or .npz columns instead of CSV; see gas_report.py
+COLUMNAR_FILE = gas_report.default_path("gas_fees")
 # -------------------
 
+def cli_args():
+    return [a for a in sys.argv[1:] if not a.startswith("--")]
+
+def cli_flag(name):
+    return name in sys.argv[1:]
+
 def load_hashes():
     # Priority: CLI args after script name; else hashes.txt
-    if len(sys.argv) > 1:
-        return [h.strip() for h in sys.argv[1:] if h.strip()]
+    args = cli_args()
+    if args:
+        return [h.strip() for h in args if h.strip()]
     if os.path.exists(INPUT_FILE):
         with open(INPUT_FILE, "r", encoding="utf-8") as f:
             return [line.strip() for line in f if line.strip()]
@@ -31,7 +61,9 @@ def wei_to_gwei(wei: int) -> Decimal:
 
 def get_receipt_with_retry(w3, h):
     last_err = None
-    for _ in range(MAX_RETRIES):
+    for attempt in range(MAX_RETRIES):
+        if attempt:
+            METRICS.retry("rpc", "eth_getTransactionReceipt")
         try:
             rcpt = w3.eth.get_transaction_receipt(h)
             return rcpt
@@ -42,7 +74,9 @@ def get_receipt_with_retry(w3, h):
 
 def get_tx_with_retry(w3, h):
     last_err = None
-    for _ in range(MAX_RETRIES):
+    for attempt in range(MAX_RETRIES):
+        if attempt:
+            METRICS.retry("rpc", "eth_getTransactionByHash")
         try:
             tx = w3.eth.get_transaction(h)
             return tx
@@ -51,75 +85,510 @@ def get_tx_with_retry(w3, h):
             time.sleep(SLEEP_BETWEEN)
     raise last_err
 
-def main():
-    load_dotenv()
-    rpc = os.getenv("RPC_URL", DEFAULT_RPC)
-    w3 = Web3(Web3.HTTPProvider(rpc, request_kwargs={"timeout": 25}))
+def backoff_delay(attempt):
+    # "full jitter": uniform in [0, min(cap, base * 2^attempt)]
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+async def async_call_with_retry(fn, h, method):
+    last_err = None
+    for attempt in range(MAX_RETRIES):
+        if attempt:
+            METRICS.retry("rpc", method)
+        try:
+            return await fn(h)
+        except Exception as e:
+            last_err = e
+            await asyncio.sleep(backoff_delay(attempt))
+    raise last_err
+
+def valid_hash(h):
+    return h.startswith("0x") and len(h) == 66
+
+TRANSFER_TOPIC = Web3.to_hex(Web3.keccak(text="Transfer(address,address,uint256)"))
+SEL_TRANSFER, SEL_TRANSFER_FROM = "0xa9059cbb", "0x23b872dd"
+
+def payout_recipient(inp, to_addr, rcpt):
+    # who got paid: tx.to is the token contract for ERC-20 transfers, so decode
+    # transfer()/transferFrom() calldata, else a single Transfer log's `to`;
+    # plain value transfers pay tx.to. "" when it isn't one recipient (Disperse).
+    if inp.startswith(SEL_TRANSFER) and len(inp) >= 74:
+        return Web3.to_checksum_address("0x" + inp[34:74])
+    if inp.startswith(SEL_TRANSFER_FROM) and len(inp) >= 138:
+        return Web3.to_checksum_address("0x" + inp[98:138])
+    if len(inp) <= 2:
+        return to_addr or ""
+    tos = set()
+    for log in rcpt.get("logs") or []:
+        topics = [t if isinstance(t, str) else Web3.to_hex(t) for t in log.get("topics") or []]
+        if len(topics) == 3 and topics[0].lower() == TRANSFER_TOPIC:
+            tos.add(topics[2][-40:].lower())
+    return Web3.to_checksum_address("0x" + tos.pop()) if len(tos) == 1 else ""
+
+def build_row(h, rcpt, tx, gas_price):
+    status = rcpt.status  # 1=success, 0=revert
+    gas_used = rcpt.gasUsed
+    # effectiveGasPrice for EIP-1559 networks; fallback to tx.gasPrice if missing
+    eff_price = getattr(rcpt, "effectiveGasPrice", None)
+    if eff_price is None:
+        eff_price = rcpt.get("effectiveGasPrice")  # dict-style if needed
+    if eff_price is None:
+        # legacy fallback
+        eff_price = tx.get("gasPrice") or gas_price()
+
+    fee_wei = int(gas_used) * int(eff_price)
+    fee_eth = wei_to_eth(fee_wei)
+
+    # web3 returns input as HexBytes, the batch/cache paths as a hex string
+    inp = tx.get("input") or ""
+    if isinstance(inp, (bytes, bytearray)):
+        inp = "0x" + bytes(inp).hex()
+    method_id = inp[:10]
+    to_addr = tx.get("to")
+    frm = tx.get("from")
+    block = rcpt.blockNumber
+
+    row = {
+        "tx_hash": h,
+        "block": block,
+        "status": status,
+        "from": frm,
+        "to": to_addr,
+        "method_id": method_id,
+        "gas_used": gas_used,
+        "effective_gas_price_wei": eff_price,
+        "effective_gas_price_gwei": str(wei_to_gwei(eff_price)),
+        "fee_eth": str(fee_eth),
+        "recipient": payout_recipient(inp, to_addr, rcpt),
+    }
+    print(f"{h[:10]}… | block {block} | status {status} | gas {gas_used} | fee {fee_eth} ETH")
+    return row, fee_eth
+
+def existing_hashes():
+    if not os.path.exists(OUTPUT_FILE):
+        return set()
+    with open(OUTPUT_FILE, "r", newline="", encoding="utf-8") as f:
+        return {r["tx_hash"] for r in csv.DictReader(f)}
+
+def csv_header(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), [])
+
+def upgrade_csv(path, fields):
+    # rewrite an older OUTPUT_FILE under the current header; columns it lacks
+    # (e.g. recipient) are left blank, which gas_report treats as unknown
+    old = csv_header(path)
+    extra = [c for c in old if c not in fields]
+    if extra:
+        raise SystemExit(f"{path} has columns this version doesn't write ({', '.join(extra)}); "
+                         f"move it aside or rerun without resuming")
+    tmp = path + ".tmp"
+    with open(path, "r", newline="", encoding="utf-8") as src, \
+            open(tmp, "w", newline="", encoding="utf-8") as dst:
+        w = csv.DictWriter(dst, fieldnames=fields, restval="")
+        w.writeheader()
+        w.writerows(csv.DictReader(src))
+    os.replace(tmp, path)
+    print(f"[warn] {path}: added column(s) {', '.join(c for c in fields if c not in old)} before appending")
+
+def write_rows(rows, total_fee_eth, append=False):
+    if rows:
+        fields = list(rows[0].keys())
+        old = csv_header(OUTPUT_FILE) if append else []
+        if old and old != fields:
+            upgrade_csv(OUTPUT_FILE, fields)  # appending under a stale header would shift columns
+        header = not old
+        with open(OUTPUT_FILE, "a" if append else "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=fields)
+            if header:
+                w.writeheader()
+            w.writerows(rows)
+        print(f"\nSaved: {OUTPUT_FILE}")
+        print(f"Total gas paid across {len(rows)} txs: {total_fee_eth} ETH")
+    else:
+        print("No rows to write.")
+
+# Block timestamps for the per-day report; headers come from the cache or one batch per BATCH_SIZE
+def block_timestamps(pool, blocks, cache=None, head=None):
+    out = {}
+    missing = []
+    for b in sorted(set(blocks)):
+        blk = cache.get_block(b) if cache else None
+        if blk is not None:
+            out[b] = int(blk["timestamp"])
+        else:
+            missing.append(b)
+    for i in range(0, len(missing), BATCH_SIZE):
+        chunk = missing[i:i + BATCH_SIZE]
+        try:
+            results = rpc_batch(pool, [("eth_getBlockByNumber", [hex(b), False]) for b in chunk])
+        except (BatchRejected, ValueError) as e:
+            print(f"[warn] block header batch failed ({e}); timestamps left at 0")
+            continue
+        for b, item in zip(chunk, results):
+            blk = (item or {}).get("result")
+            if not blk:
+                continue
+            blk = AttributeDict({**blk, "number": int(blk["number"], 16), "timestamp": int(blk["timestamp"], 16)})
+            out[b] = blk["timestamp"]
+            if cache and head is not None:
+                cache.put_block(blk, head)
+    return out
+
+def write_columnar(pool, rows, total_fee_eth, cache=None, head=None, append=False):
+    if not rows:
+        print("No rows to write.")
+        return
+    ts = block_timestamps(pool, [r["block"] for r in rows], cache, head)
+    cols = gas_report.columns_from_rows(rows, ts)
+    if append:
+        gas_report.append_columns(COLUMNAR_FILE, cols)
+    else:
+        gas_report.write_columns(COLUMNAR_FILE, cols)
+    print(f"Total gas paid across {len(rows)} txs: {total_fee_eth} ETH")
+
+class BatchRejected(Exception):
+    pass
+
+# POST a JSON-RPC batch; returns responses in the same order as `calls`
+def rpc_batch(pool, calls):
+    payload = [{"jsonrpc": "2.0", "id": i, "method": m, "params": p}
+               for i, (m, p) in enumerate(calls)]
     try:
-        chain_id = w3.eth.chain_id
+        resp = pool.post(payload)
+    except EndpointError as e:
+        raise BatchRejected(str(e)) from e
+    if resp.status_code in (413, 429) or resp.status_code >= 500:
+        raise BatchRejected(f"HTTP {resp.status_code}")
+    resp.raise_for_status()
+    body = resp.json()
+    # Providers that cap batch size answer with a single error object instead of a list
+    if not isinstance(body, list):
+        raise BatchRejected(str(body.get("error", body))[:200] if isinstance(body, dict) else "bad body")
+    by_id = {item.get("id"): item for item in body}
+    if len(by_id) != len(calls):
+        raise BatchRejected(f"got {len(by_id)} of {len(calls)} responses")
+    return [by_id.get(i) for i in range(len(calls))]
+
+def decode_receipt(raw):
+    r = dict(raw)
+    for k in ("blockNumber", "status", "gasUsed", "effectiveGasPrice"):
+        if r.get(k) is not None:
+            r[k] = int(r[k], 16)
+    return AttributeDict(r)
+
+def decode_tx(raw):
+    t = dict(raw)
+    for k in ("from", "to"):
+        if t.get(k):
+            t[k] = Web3.to_checksum_address(t[k])
+    for k in ("blockNumber", "gasPrice"):
+        if t.get(k) is not None:
+            t[k] = int(t[k], 16)
+    return AttributeDict(t)
+
+def unwrap(item, h, what):
+    if item is None:
+        raise RuntimeError(f"no response for {what}")
+    if "error" in item:
+        raise RuntimeError(f"{what}: {item['error'].get('message', item['error'])}")
+    if item.get("result") is None:
+        raise RuntimeError(f"{what} for {h} not found")
+    return item["result"]
+
+# Yields (hash, receipt, tx, error) for every hash, shrinking the batch on rejection
+def fetch_batched(pool, hashes):
+    size = BATCH_SIZE
+    ceiling = BATCH_SIZE  # largest size not yet rejected; regrowth stops there
+    i = 0
+    failures = 0
+    while i < len(hashes):
+        chunk = hashes[i:i + size]
+        calls = []
+        for h in chunk:
+            calls.append(("eth_getTransactionReceipt", [h]))
+            calls.append(("eth_getTransactionByHash", [h]))
+        try:
+            results = rpc_batch(pool, calls)
+        except (BatchRejected, ValueError) as e:
+            METRICS.retry("rpc", batch_label(m for m, _ in calls))
+            if size > MIN_BATCH_SIZE:
+                ceiling = max(MIN_BATCH_SIZE, size - 1)
+                size = max(MIN_BATCH_SIZE, size // 2)
+                print(f"[warn] batch of {len(chunk)} rejected ({e}); shrinking to {size}")
+                continue
+            # only rejections at the smallest size use up retries
+            failures += 1
+            if failures < MAX_RETRIES:
+                time.sleep(backoff_delay(failures))
+                continue
+            for h in chunk:
+                yield h, None, None, e
+            i += len(chunk)
+            failures = 0
+            continue
+
+        failures = 0
+        for j, h in enumerate(chunk):
+            try:
+                rcpt = decode_receipt(unwrap(results[2 * j], h, "receipt"))
+                tx = decode_tx(unwrap(results[2 * j + 1], h, "transaction"))
+            except Exception as e:
+                yield h, None, None, e
+                continue
+            yield h, rcpt, tx, None
+        i += len(chunk)
+        size = min(ceiling, size * 2)
+
+# ----- --scan: Transfer logs -> tx hashes -----
+
+class RangeRejected(Exception):
+    pass
+
+def rpc_call(pool, method, params):
+    try:
+        resp = pool.post({"jsonrpc": "2.0", "id": 1, "method": method, "params": params})
+    except EndpointError as e:
+        raise RangeRejected(str(e)) from e
+    if resp.status_code in (413, 429) or resp.status_code >= 500:
+        raise RangeRejected(f"HTTP {resp.status_code}")
+    resp.raise_for_status()
+    body = resp.json()
+    if "error" in body:
+        err = body["error"]
+        raise RangeRejected(str(err.get("message", err) if isinstance(err, dict) else err)[:300])
+    return body.get("result")
+
+def suggested_range(msg):
+    # e.g. Alchemy: "Log response size exceeded. this block range should work: [0x1, 0x2]"
+    m = re.search(r"\[(0x[0-9a-fA-F]+),\s*(0x[0-9a-fA-F]+)\]", msg)
+    if not m:
+        return None
+    return int(m.group(2), 16) - int(m.group(1), 16) + 1
+
+# Yields (lo, hi, logs) for consecutive block ranges covering [start, end];
+# the range shrinks when the provider refuses it and grows back after successes
+def scan_transfer_logs(pool, token, wallet, start, end):
+    topics = [TRANSFER_TOPIC, "0x" + "00" * 12 + wallet[2:].lower()]  # Transfer(from=wallet)
+    size = SCAN_CHUNK
+    lo = start
+    failures = 0
+    while lo <= end:
+        hi = min(end, lo + size - 1)
+        flt = {"address": token, "topics": topics, "fromBlock": hex(lo), "toBlock": hex(hi)}
+        try:
+            logs = rpc_call(pool, "eth_getLogs", [flt])
+        except (RangeRejected, ValueError) as e:
+            METRICS.retry("rpc", "eth_getLogs")
+            if hi > lo and size > SCAN_CHUNK_MIN:
+                hint = suggested_range(str(e))
+                size = max(SCAN_CHUNK_MIN, min(hint, size // 2) if hint else size // 2)
+                print(f"[warn] eth_getLogs {lo}-{hi} rejected ({e}); range now {size} blocks")
+                continue
+            # only rejections at the smallest range use up retries
+            failures += 1
+            if failures < MAX_RETRIES:
+                time.sleep(backoff_delay(failures))
+                continue
+            raise SystemExit(f"eth_getLogs for blocks {lo}-{hi} still rejected after "
+                             f"{MAX_RETRIES} tries at the minimum range ({e}); scan of "
+                             f"{start}-{end} stopped, no checkpoint saved")
+        failures = 0
+        yield lo, hi, [l for l in logs or [] if not l.get("removed")]
+        lo = hi + 1
+        size = min(SCAN_CHUNK_MAX, size * 2)
+
+def checkpoint_key(chain_id, token, wallet):
+    return f"{chain_id}:{token.lower()}:{wallet.lower()}"
+
+def load_checkpoints():
+    if not os.path.exists(CHECKPOINT_FILE):
+        return {}
+    with open(CHECKPOINT_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_checkpoint(key, block):
+    state = load_checkpoints()
+    state[key] = max(block, state.get(key, block))  # never move backwards
+    tmp = CHECKPOINT_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, CHECKPOINT_FILE)
+
+# Returns (hashes, checkpoint key, to_block, resumed)
+def scan_hashes(pool, w3):
+    args = cli_args()
+    if not args or not Web3.is_address(args[0]):
+        raise SystemExit("Usage: gas_fees_base.py --scan <wallet> [from_block] [to_block]")
+    wallet = Web3.to_checksum_address(args[0])
+    token = Web3.to_checksum_address(TOKEN_ADDR)
+    key = checkpoint_key(w3.eth.chain_id, token, wallet)
+    last = load_checkpoints().get(key)
+    resumed = last is not None and len(args) < 2
+    if len(args) >= 2:
+        start = int(args[1])
+    elif resumed:
+        start = last + 1
+    else:
+        raise SystemExit(f"No checkpoint for {wallet} in {CHECKPOINT_FILE}; pass a from_block")
+    end = int(args[2]) if len(args) >= 3 else w3.eth.block_number - SCAN_CONFIRMATIONS
+
+    print(f"Scanning Transfer logs of {token} from {wallet}, blocks {start}-{end}"
+          + (" (resuming from checkpoint)" if resumed else ""))
+    hashes = []
+    calls = 0
+    for lo, hi, logs in scan_transfer_logs(pool, token, wallet, start, end):
+        calls += 1
+        for log in logs:
+            hashes.append(log["transactionHash"])
+    hashes = list(dict.fromkeys(hashes))  # one row per tx even if it moved tokens twice
+    print(f"Found {len(hashes)} txs in {max(0, end - start + 1)} blocks ({calls} eth_getLogs calls)")
+    return hashes, key, end, resumed
+
+def fetch_batch_mode(pool, hashes):
+    print(f"Using RPC: {pool} (JSON-RPC batches of up to {BATCH_SIZE} hashes)")
+    return list(fetch_batched(pool, hashes))
+
+async def fetch_one_async(w3, sem, h):
+    async with sem:
+        return await asyncio.gather(
+            async_call_with_retry(w3.eth.get_transaction_receipt, h, "eth_getTransactionReceipt"),
+            async_call_with_retry(w3.eth.get_transaction, h, "eth_getTransactionByHash"),
+        )
+
+async def fetch_async_mode(rpc, hashes):
+    import aiohttp
+    # web3's own retry layer is off: async_call_with_retry owns retries and backoff
+    w3 = AsyncWeb3(instrument_provider(AsyncWeb3.AsyncHTTPProvider(
+        rpc, request_kwargs={"timeout": aiohttp.ClientTimeout(total=25)},
+        exception_retry_configuration=None)))
+    try:
+        chain_id = await w3.eth.chain_id
     except Exception:
         chain_id = "?"
-    print(f"Using RPC: {rpc} (chainId: {chain_id})")
+    print(f"Using RPC: {rpc} (chainId: {chain_id}, async x{ASYNC_CONCURRENCY})")
 
-    hashes = load_hashes()
-    rows = []
-    total_fee_eth = Decimal(0)
+    sem = asyncio.Semaphore(ASYNC_CONCURRENCY)
+    try:
+        results = await asyncio.gather(*(fetch_one_async(w3, sem, h) for h in hashes),
+                                       return_exceptions=True)
+    finally:
+        await w3.provider.disconnect()  # close the cached aiohttp session before the loop ends
+    out = []
+    for h, res in zip(hashes, results):
+        if isinstance(res, BaseException):
+            out.append((h, None, None, res))
+        else:
+            out.append((h, res[0], res[1], None))
+    return out
 
+def fetch_sync_mode(w3, hashes):
+    try:
+        chain_id = w3.eth.chain_id
+    except Exception:
+        chain_id = "?"
+    print(f"Using RPC: {w3.provider} (chainId: {chain_id})")
+
+    out = []
     for h in hashes:
-        if not h.startswith("0x") or len(h) != 66:
-            print(f"[skip] Not a valid tx hash: {h}")
-            continue
         try:
             rcpt = get_receipt_with_retry(w3, h)
             tx   = get_tx_with_retry(w3, h)
         except Exception as e:
-            print(f"[err] Failed to fetch {h}: {e}")
+            out.append((h, None, None, e))
             continue
+        out.append((h, rcpt, tx, None))
+    return out
 
-        status = rcpt.status  # 1=success, 0=revert
-        gas_used = rcpt.gasUsed
-        # effectiveGasPrice for EIP-1559 networks; fallback to tx.gasPrice if missing
-        eff_price = getattr(rcpt, "effectiveGasPrice", None)
-        if eff_price is None:
-            eff_price = rcpt.get("effectiveGasPrice")  # dict-style if needed
-        if eff_price is None:
-            # legacy fallback
-            eff_price = tx.get("gasPrice") or w3.eth.gas_price
-
-        fee_wei = int(gas_used) * int(eff_price)
-        fee_eth = wei_to_eth(fee_wei)
-        total_fee_eth += fee_eth
+def main():
+    load_dotenv()
+    # RPC_URLS=url1,url2,... spreads reads over several nodes (see rpc_pool.py)
+    urls = urls_from_env(DEFAULT_RPC)
+    # No network I/O happens until the first call on w3
+    pool = RpcPool(urls)
+    w3 = Web3(pool)
+    scan = cli_flag("--scan")
+    if scan:
+        hashes, scan_key, scan_end, resumed = scan_hashes(pool, w3)
+    else:
+        hashes = load_hashes()
+    cache = None if cli_flag("--no-cache") else ReceiptCache()
 
-        method_id = tx["input"][:10] if tx.get("input") else ""
-        to_addr = tx.get("to")
-        frm = tx.get("from")
-        block = rcpt.blockNumber
-
-        row = {
-            "tx_hash": h,
-            "block": block,
-            "status": status,
-            "from": frm,
-            "to": to_addr,
-            "method_id": method_id,
-            "gas_used": gas_used,
-            "effective_gas_price_wei": eff_price,
-            "effective_gas_price_gwei": str(wei_to_gwei(eff_price)),
-            "fee_eth": str(fee_eth),
-        }
-        rows.append(row)
-        print(f"{h[:10]}… | block {block} | status {status} | gas {gas_used} | fee {fee_eth} ETH")
+    good = []
+    for h in hashes:
+        if valid_hash(h):
+            good.append(h)
+        else:
+            print(f"[skip] Not a valid tx hash: {h}")
 
-    # Write CSV
-    if rows:
-        with open(OUTPUT_FILE, "w", newline="", encoding="utf-8") as f:
-            w = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
-            w.writeheader()
-            w.writerows(rows)
-        print(f"\nSaved: {OUTPUT_FILE}")
-        print(f"Total gas paid across {len(rows)} txs: {total_fee_eth} ETH")
+    fetched = {}
+    if cache:
+        for h in good:
+            rcpt, tx = cache.get_receipt(h), cache.get_tx(h)
+            if rcpt is not None and tx is not None:
+                fetched[h] = (rcpt, tx, None)
+    missing = [h for h in good if h not in fetched]
+
+    columnar = cli_flag("--columnar")
+    head = None
+    if missing:
+        if cli_flag("--batch") or scan:
+            results = fetch_batch_mode(pool, missing)
+        elif cli_flag("--async"):
+            # the async path has its own aiohttp session; it talks to the first URL only
+            results = asyncio.run(fetch_async_mode(urls[0], missing))
+        else:
+            results = fetch_sync_mode(w3, missing)
+
+        if cache:
+            try:
+                head = w3.eth.block_number
+            except Exception as e:
+                print(f"[warn] eth_blockNumber failed; not caching this run: {e}")
+        stored = 0
+        for h, rcpt, tx, err in results:
+            fetched[h] = (rcpt, tx, err)
+            if cache and head is not None and err is None:
+                if cache.put_receipt(h, rcpt, head) and cache.put_tx(h, tx, head):
+                    stored += 1
+        if cache:
+            print(f"[cache] stored {stored}/{len(missing)} new results")
+    elif good:
+        print(f"All {len(good)} hashes served from cache; no RPC calls made.")
+
+    rows = []
+    total_fee_eth = Decimal(0)
+    failed = 0
+    # incremental scans append to OUTPUT_FILE; skip txs a previous run already wrote
+    # (the columnar writer de-duplicates on append by itself)
+    seen = existing_hashes() if scan and resumed and not columnar else set()
+    for h in good:  # keep input order
+        rcpt, tx, err = fetched[h]
+        if err is not None:
+            print(f"[err] Failed to fetch {h}: {err}")
+            failed += 1
+            continue
+        if h in seen:
+            continue
+        row, fee_eth = build_row(h, rcpt, tx, lambda: w3.eth.gas_price)
+        rows.append(row)
+        total_fee_eth += fee_eth
+    if columnar:
+        write_columnar(pool, rows, total_fee_eth, cache, head, append=scan and resumed)
     else:
-        print("No rows to write.")
+        write_rows(rows, total_fee_eth, append=scan and resumed)
+    if cache:
+        print(cache.stats())
+        cache.close()
+    if any(e.calls for e in pool.endpoints):
+        print(pool.stats())
+    if scan:
+        if failed:
+            print(f"[warn] {failed} txs failed; checkpoint not advanced, rerun to retry")
+        else:
+            save_checkpoint(scan_key, scan_end)
+            print(f"Checkpoint: {scan_key} -> block {scan_end} ({CHECKPOINT_FILE})")
 
 if __name__ == "__main__":
     main()
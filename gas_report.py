@@ -0,0 +1,244 @@
+# gas_report.py
+# Typed columnar storage for gas fee rows plus vectorized reports over it.
+# Usage:
+#   python gas_report.py gas_fees.parquet                 # per day / method / recipient
+#   python gas_report.py gas_fees.npz --by method --json  # one grouping, JSON out
+#   python gas_report.py --convert gas_fees.csv gas_fees.npz
+# Files are Parquet when pyarrow is installed, else NumPy .npz (no pickled
+# objects). Wei amounts are uint64 columns; totals are summed exactly.
+import os, sys, csv, ast, json
+from decimal import Decimal
+import numpy as np
+
+# ----- Config -----
+PERCENTILES = (0.5, 0.95, 0.99)
+TOP = 20                 # rows printed per grouping (sorted by total fee)
+# -------------------
+
+# column name -> numpy dtype; strings are fixed-width ASCII
+SCHEMA = {
+    "tx_hash": "S66",
+    "block": "int64",
+    "timestamp": "int64",            # block timestamp, 0 if unknown
+    "status": "int8",
+    "from": "S42",
+    "to": "S42",                     # tx target: the token contract for ERC-20 payouts
+    "recipient": "S42",              # decoded payee (transfer calldata / Transfer log), "" if unknown
+    "method_id": "S10",              # "0x" + selector, "" for plain transfers
+    "gas_used": "uint64",
+    "effective_gas_price_wei": "uint64",
+    "fee_wei": "uint64",
+}
+GROUPINGS = ("day", "method", "recipient")
+GWEI = 10**9
+
+def _have_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def default_path(stem="gas_fees"):
+    return stem + (".parquet" if _have_pyarrow() else ".npz")
+
+def _method_id(v):
+    # legacy CSVs stored HexBytes as b'\xa9\x05...' reprs
+    if isinstance(v, str) and v.startswith(("b'", 'b"')):
+        v = ast.literal_eval(v)
+    if isinstance(v, (bytes, bytearray)):
+        v = "0x" + bytes(v).hex()
+    return (v or "")[:10]
+
+def _legacy_recipient(r):
+    # CSVs written before the recipient column: only plain value transfers
+    # pay tx.to; for token transfers the payee is unknown
+    return (r.get("to") or "") if _method_id(r.get("method_id")) in ("", "0x") else ""
+
+def columns_from_rows(rows, timestamps=None):
+    """rows: dicts as produced by gas_fees_base.build_row; timestamps: block -> unix time."""
+    timestamps = timestamps or {}
+    n = len(rows)
+    cols = {k: np.zeros(n, dtype=t) for k, t in SCHEMA.items()}
+    for i, r in enumerate(rows):
+        block = int(r["block"])
+        gas, price = int(r["gas_used"]), int(r["effective_gas_price_wei"])
+        cols["tx_hash"][i] = r["tx_hash"]
+        cols["block"][i] = block
+        cols["timestamp"][i] = timestamps.get(block, 0)
+        cols["status"][i] = int(r["status"])
+        cols["from"][i] = r.get("from") or ""
+        cols["to"][i] = r.get("to") or ""
+        cols["recipient"][i] = r.get("recipient") or _legacy_recipient(r)
+        cols["method_id"][i] = _method_id(r.get("method_id"))
+        cols["gas_used"][i] = gas
+        cols["effective_gas_price_wei"][i] = price
+        cols["fee_wei"][i] = gas * price
+    return cols
+
+def columns_from_csv(path):
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        rows = [r for r in csv.DictReader(f) if r.get("tx_hash")]  # spreadsheet edits leave blank rows
+    return columns_from_rows(rows)
+
+def write_columns(path, cols):
+    if path.endswith(".parquet"):
+        import pyarrow as pa, pyarrow.parquet as pq
+        arrays = {}
+        for k, t in SCHEMA.items():
+            v = cols[k]
+            arrays[k] = pa.array(v.astype(str)) if t.startswith("S") else pa.array(v)
+        pq.write_table(pa.table(arrays), path, compression="zstd")
+    else:
+        np.savez_compressed(path, **{k: cols[k] for k in SCHEMA})
+    print(f"Saved: {path} ({len(cols['block'])} rows, columnar)")
+
+def append_columns(path, cols):
+    # Parquet/npz files are immutable: read, concatenate, drop repeated tx hashes, rewrite
+    if os.path.exists(path):
+        old = read_columns(path)
+        cols = {k: np.concatenate((old[k], cols[k].astype(old[k].dtype))) for k in SCHEMA}
+        _, first = np.unique(cols["tx_hash"], return_index=True)
+        keep = np.sort(first)
+        cols = {k: v[keep] for k, v in cols.items()}
+    write_columns(path, cols)
+
+def read_columns(path, names=None):
+    names = list(names or SCHEMA)
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        table = pq.read_table(path, columns=[k for k in names if k in pq.read_schema(path).names])
+        cols = {k: table.column(k).to_numpy().astype(SCHEMA[k]) for k in table.column_names}
+    else:
+        with np.load(path, allow_pickle=False) as z:
+            cols = {k: z[k] for k in names if k in z.files}
+    # files written before a column existed (e.g. recipient) read it as empty
+    n = len(next(iter(cols.values()))) if cols else 0
+    for k in names:
+        if k not in cols:
+            cols[k] = np.zeros(n, dtype=SCHEMA[k])
+    return cols
+
+# ----- vectorized group-by -----
+def group_keys(cols, by):
+    if by == "day":
+        return cols["timestamp"] // 86400
+    if by == "method":
+        return cols["method_id"]
+    if by == "recipient":
+        return cols["recipient"]
+    raise ValueError(f"unknown grouping {by!r}")
+
+def exact_sums(values, inverse, groups):
+    # uint64 sums can overflow over millions of rows and float weights lose
+    # wei: split into high and low gwei parts, sum each per group in int64
+    # (np.add.at is unbuffered), recombine as Python ints
+    hi = np.zeros(groups, dtype=np.int64)
+    lo = np.zeros(groups, dtype=np.int64)
+    np.add.at(hi, inverse, (values // GWEI).astype(np.int64))
+    np.add.at(lo, inverse, (values % GWEI).astype(np.int64))
+    return [int(h) * GWEI + int(l) for h, l in zip(hi, lo)]
+
+def sorted_percentiles(values, inverse, starts, counts, qs):
+    # sort by (group, value) once; each percentile is then a single gather.
+    # When both fit, pack group and value into one uint64 and sort that
+    # directly, which is several times faster than lexsort
+    vbits = int(values.max()).bit_length() if len(values) else 0
+    gbits = int(len(counts)).bit_length()
+    if vbits + gbits <= 64:
+        packed = (inverse.astype(np.uint64) << np.uint64(vbits)) | values.astype(np.uint64)
+        packed.sort()
+        s = packed & np.uint64((1 << vbits) - 1)
+    else:
+        s = values[np.lexsort((values, inverse))]
+    idx = starts + np.minimum(counts - 1, (np.multiply.outer(qs, counts - 1) + 0.5).astype(np.int64))
+    return {q: s[idx[i]] for i, q in enumerate(qs)}
+
+def _factorize(keys):
+    # np.unique on fixed-width byte strings sorts with memcmp and is the slowest
+    # step by far; hash each string to a uint64 (FNV-1a over the byte columns,
+    # one vectorized pass per byte) and group on the integers instead
+    if keys.dtype.kind != "S":
+        return np.unique(keys, return_inverse=True, return_counts=True)
+    b = keys.view(np.uint8).reshape(len(keys), keys.dtype.itemsize)
+    h = np.full(len(keys), 14695981039346656037, dtype=np.uint64)
+    prime = np.uint64(1099511628211)
+    for j in range(b.shape[1]):
+        h = (h ^ b[:, j]) * prime
+    _, first, inverse, counts = np.unique(h, return_index=True, return_inverse=True, return_counts=True)
+    return keys[first], inverse, counts
+
+def aggregate(cols, by):
+    keys, inverse, counts = _factorize(group_keys(cols, by))
+    inverse = inverse.ravel()
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    fees = exact_sums(cols["fee_wei"], inverse, len(counts))
+    gas_total = exact_sums(cols["gas_used"], inverse, len(counts))
+    gas_p = sorted_percentiles(cols["gas_used"], inverse, starts, counts, PERCENTILES)
+    price_p = sorted_percentiles(cols["effective_gas_price_wei"], inverse, starts, counts, (0.5,))
+    failed = np.bincount(inverse, weights=(cols["status"] == 0), minlength=len(keys))
+    out = []
+    for i, k in enumerate(keys):
+        out.append({
+            by: label(by, k),
+            "txs": int(counts[i]),
+            "failed": int(failed[i]),
+            "fee_eth": str(Decimal(fees[i]) / Decimal(10**18)),
+            "gas_used": gas_total[i],
+            **{f"gas_p{int(q * 100)}": int(gas_p[q][i]) for q in PERCENTILES},
+            "gas_price_p50_gwei": str(Decimal(int(price_p[0.5][i])) / Decimal(GWEI)),
+        })
+    out.sort(key=lambda r: Decimal(r["fee_eth"]), reverse=True)
+    return out
+
+def label(by, k):
+    if by == "day":
+        return "unknown" if k == 0 else str(np.datetime64(int(k), "D"))
+    s = k.decode() if isinstance(k, bytes) else str(k)
+    return s or "(none)"
+
+def print_table(by, groups):
+    print(f"\nBy {by} ({len(groups)} groups, top {min(TOP, len(groups))} by fee):")
+    cols = [by, "txs", "failed", "fee_eth", "gas_p50", "gas_p95", "gas_p99", "gas_price_p50_gwei"]
+    for r in groups[:TOP]:
+        print("  " + " | ".join(f"{c} {r[c]}" if c != by else f"{r[c]:<42}" for c in cols))
+
+def report(path, groupings, as_json=False):
+    cols = read_columns(path)
+    n = len(cols["block"])
+    total = exact_sums(cols["fee_wei"], np.zeros(n, dtype=np.int64), 1)[0] if n else 0
+    result = {"rows": n, "fee_eth": str(Decimal(total) / Decimal(10**18))}
+    for by in groupings:
+        if by == "day" and n and not cols["timestamp"].any():
+            print("[skip] no block timestamps in this file; per-day report unavailable", file=sys.stderr)
+            continue
+        result[by] = aggregate(cols, by) if n else []
+    if as_json:
+        print(json.dumps(result, indent=2))
+        return result
+    print(f"{path}: {n} txs, total fees {result['fee_eth']} ETH")
+    for by in groupings:
+        if by in result:
+            print_table(by, result[by])
+    return result
+
+def main():
+    argv = sys.argv[1:]
+    groupings = GROUPINGS
+    if "--by" in argv:
+        i = argv.index("--by")
+        groupings = tuple(argv[i + 1].split(","))
+        del argv[i:i + 2]
+    args = [a for a in argv if not a.startswith("--")]
+    if "--convert" in argv:
+        if len(args) != 2:
+            raise SystemExit("Usage: gas_report.py --convert gas_fees.csv gas_fees.(parquet|npz)")
+        write_columns(args[1], columns_from_csv(args[0]))
+        return
+    path = args[0] if args else default_path()
+    if not os.path.exists(path):
+        raise SystemExit(f"No such file: {path} (write one with gas_fees_base.py --columnar)")
+    report(path, groupings, as_json="--json" in argv)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+# nonce_manager.py
+# Local nonce bookkeeping for the sender scripts.
+# Every signed tx is written to a per-account state file *before* it is
+# broadcast, so a crashed batch resumes without reusing or skipping nonces.
+# check() resyncs with the chain, rebroadcasts txs the node forgot, fills
+# nonce gaps that would block later txs, and replaces txs stuck longer than
+# STUCK_AFTER with a bumped maxPriorityFeePerGas.
+# With a confirm_tracker.ConfirmationTracker attached, receipt()/wait() take
+# receipts from its shared head follower instead of polling per hash.
+import os, json, time, threading
+from concurrent.futures import wait as wait_futures, FIRST_COMPLETED
+from web3 import Web3
+
+# ----- Config -----
+STATE_DIR = os.getenv("NONCE_STATE_DIR", ".")
+STUCK_AFTER = 90         # seconds a tx may sit unmined before it is replaced
+BUMP = 1.25              # replacement fee multiplier (nodes require >= +10%)
+MAX_TIP_GWEI = 20        # never bump maxPriorityFeePerGas past this
+RECEIPT_POLL = 2.0       # seconds between receipt checks in wait()
+# -------------------
+
+class NonceManager:
+    def __init__(self, w3: Web3, acct, path=None, tracker=None):
+        self.w3 = w3
+        self.acct = acct
+        self.tracker = tracker
+        self.path = path or os.path.join(STATE_DIR, f"nonces_{acct.address.lower()}.json")
+        self.lock = threading.RLock()
+        self.pending = {}   # nonce -> {"tx": {...}, "raw": "0x..", "hashes": [...], "sent_at": ts}
+        self.free = set()   # nonces handed out but never broadcast
+        self.settled = {}   # nonce -> hashes, for entries sync() saw mined (in memory only)
+        self.reserved = set()  # handed out by reserve(), not yet recorded or released
+        self.watching = {}  # nonce -> {hash: tracker future}, kept across receipt() polls
+        self.next = None
+        self.replacements = 0
+        self.gap_fills = 0
+        self._load()
+        self.sync()
+
+    # ----- persistence -----
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        self.pending = {int(n): e for n, e in state.get("pending", {}).items()}
+        self.free = set(state.get("free", []))
+        self.next = state.get("next")
+
+    def _save(self):
+        state = {"address": self.acct.address, "next": self.next,
+                 "free": sorted(self.free), "pending": {str(n): e for n, e in self.pending.items()}}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    # ----- chain sync -----
+    def sync(self):
+        addr = self.acct.address
+        mined = self.w3.eth.get_transaction_count(addr, "latest")
+        in_pool = self.w3.eth.get_transaction_count(addr, "pending")
+        dropped = []
+        with self.lock:
+            for n in [n for n in self.pending if n < mined]:
+                self.settled[n] = self.pending.pop(n)["hashes"]
+            self.free = {n for n in self.free if n >= mined}
+            top = max([mined, in_pool] + [n + 1 for n in self.pending] + [n + 1 for n in self.free])
+            self.next = top if self.next is None else max(self.next, top)
+            for n in range(max(mined, in_pool), self.next):
+                if n in self.reserved:
+                    continue
+                if n not in self.pending:
+                    self.free.add(n)   # gap: nothing of ours holds this nonce
+                else:
+                    dropped.append(n)  # ours, but the node no longer counts it
+            self._save()
+        for n in dropped:
+            self._rebroadcast(n)
+        return mined
+
+    def _rebroadcast(self, n):
+        entry = self.pending.get(n)
+        if not entry:
+            return
+        try:
+            self.w3.eth.send_raw_transaction(entry["raw"])
+        except Exception as e:
+            # "already known" / "nonce too low" both mean there is nothing to do
+            print(f"[nonce] rebroadcast of {n} rejected: {e}")
+
+    # ----- allocation -----
+    def reserve(self):
+        with self.lock:
+            if self.free:
+                n = min(self.free)
+                self.free.remove(n)
+            else:
+                n = self.next
+                self.next += 1
+            self.reserved.add(n)
+            self._save()
+            return n
+
+    def release(self, n):
+        # broadcast failed; the nonce is unused and goes back to the pool
+        with self.lock:
+            self.pending.pop(n, None)
+            self.reserved.discard(n)
+            self.free.add(n)
+            self._save()
+
+    def record(self, n, tx, raw):
+        # call before send_raw_transaction; returns the locally computed tx hash
+        raw_hex = Web3.to_hex(raw)
+        txh = Web3.to_hex(Web3.keccak(hexstr=raw_hex))
+        with self.lock:
+            entry = self.pending.setdefault(n, {"tx": None, "raw": None, "hashes": []})
+            entry.update({"tx": dict(tx), "raw": raw_hex, "sent_at": time.time()})
+            entry["hashes"].append(txh)
+            self.reserved.discard(n)
+            self.free.discard(n)
+            self._save()
+        return txh
+
+    def hashes(self, n):
+        with self.lock:
+            if n in self.settled:
+                return list(self.settled[n])
+            return list(self.pending.get(n, {}).get("hashes", []))
+
+    def siblings(self, h):
+        # every hash recorded for h's nonce (h, then speed-ups / replacements);
+        # [h] if the state file doesn't know it
+        h = h.lower()
+        with self.lock:
+            entries = list(self.settled.values()) + [e.get("hashes", []) for e in self.pending.values()]
+        for hashes in entries:
+            if h in (x.lower() for x in hashes):
+                return list(hashes)
+        return [h]
+
+    def mined(self, n):
+        with self.lock:
+            self.pending.pop(n, None)
+            self.settled.pop(n, None)
+            self._save()
+
+    # ----- stuck txs and gaps -----
+    def _sign_and_send(self, n, tx):
+        signed = self.acct.sign_transaction(tx)
+        raw = getattr(signed, "rawTransaction", None) or getattr(signed, "raw_transaction")
+        txh = self.record(n, tx, raw)
+        self.w3.eth.send_raw_transaction(raw)
+        return txh
+
+    def replace(self, n):
+        with self.lock:
+            entry = self.pending.get(n)
+            if not entry or not entry.get("tx"):
+                return None
+            tx = dict(entry["tx"])
+        cap = self.w3.to_wei(MAX_TIP_GWEI, "gwei")
+        tip = min(int(tx["maxPriorityFeePerGas"] * BUMP), cap)
+        if tip <= tx["maxPriorityFeePerGas"]:
+            return None  # already at the cap
+        tx["maxPriorityFeePerGas"] = tip
+        tx["maxFeePerGas"] = max(int(tx["maxFeePerGas"] * BUMP), tip)
+        try:
+            txh = self._sign_and_send(n, tx)
+        except Exception as e:
+            print(f"[nonce] replacement for {n} rejected: {e}")
+            return None
+        self.replacements += 1
+        print(f"[nonce] replaced stuck nonce {n} (tip {Web3.from_wei(tip, 'gwei')} gwei): {txh}")
+        return txh
+
+    def fill_gap(self, n):
+        # 0-value self-transfer so later nonces can be mined
+        latest = self.w3.eth.get_block("latest")
+        tip = self.w3.to_wei(1, "gwei")
+        tx = {"to": self.acct.address, "value": 0, "nonce": n, "gas": 21000, "type": 2,
+              "chainId": self.w3.eth.chain_id, "maxPriorityFeePerGas": tip,
+              "maxFeePerGas": latest.get("baseFeePerGas", self.w3.eth.gas_price) + 2*tip}
+        try:
+            txh = self._sign_and_send(n, tx)
+        except Exception as e:
+            self.release(n)
+            print(f"[nonce] gap fill for {n} rejected: {e}")
+            return None
+        self.gap_fills += 1
+        print(f"[nonce] filled gap at nonce {n}: {txh}")
+        return txh
+
+    def check(self):
+        self.sync()
+        now = time.time()
+        with self.lock:
+            top = max(self.pending) if self.pending else None
+            gaps = sorted(n for n in self.free if top is not None and n < top)
+            stuck = [n for n, e in self.pending.items()
+                     if e.get("tx") and now - e.get("sent_at", now) > STUCK_AFTER]
+            for n in gaps:
+                self.free.discard(n)
+        for n in gaps:
+            self.fill_gap(n)
+        for n in sorted(stuck):
+            self.replace(n)
+
+    def _tracked(self, n, timeout=0):
+        # every hash of nonce n (replacements included) is watched; first one mined wins
+        # futures are kept between calls: one resolved between two polls is still seen
+        with self.lock:
+            watched = self.watching.setdefault(n, {})
+            for h in self.hashes(n):
+                if h not in watched or watched[h].cancelled():
+                    watched[h] = self.tracker.watch(h)
+            futs = {f: h for h, f in watched.items()}
+        if not futs:
+            time.sleep(timeout)
+            return None
+        done, _ = wait_futures(futs, timeout=timeout, return_when=FIRST_COMPLETED)
+        for f in done:
+            if f.cancelled() or f.exception() is not None:
+                continue
+            for h in futs.values():
+                self.tracker.forget(h)
+            with self.lock:
+                self.watching.pop(n, None)
+            self.mined(n)
+            return futs[f], f.result()
+        return None
+
+    def receipt(self, n):
+        # receipt for whichever of this nonce's txs got mined, else None
+        if self.tracker:
+            return self._tracked(n)
+        for h in self.hashes(n):
+            try:
+                rcpt = self.w3.eth.get_transaction_receipt(h)
+            except Exception:
+                continue
+            self.mined(n)
+            return h, rcpt
+        return None
+
+    def wait(self, n, timeout=None):
+        # like wait_for_transaction_receipt, but follows replacements of nonce n
+        start = time.time()
+        while True:
+            # tracked: block on the futures (woken by the head follower), not a poll
+            found = self._tracked(n, RECEIPT_POLL) if self.tracker else self.receipt(n)
+            if found:
+                return found
+            if timeout is not None and time.time() - start > timeout:
+                raise TimeoutError(f"nonce {n} not mined after {timeout}s")
+            if time.time() - self.pending.get(n, {}).get("sent_at", time.time()) > STUCK_AFTER:
+                self.check()
+            if not self.tracker:
+                time.sleep(RECEIPT_POLL)
+
+    def stats(self):
+        return f"nonces: {len(self.pending)} pending, {self.replacements} replaced, {self.gap_fills} gaps filled"
@@ -0,0 +1,495 @@
+# payout_daemon.py
+# Long-lived sender for send_veronica.py-style transfers. Looping over
+# send_veronica.py pays web3/eth_account imports, provider setup, decimals()
+# and a nonce sync on every call; the daemon does that once and keeps the
+# provider, token decimals, fee quotes, nonce state and a head follower warm.
+# Jobs land in a SQLite queue (PAYOUTD_DB), either through the Unix socket
+# (PAYOUTD_SOCKET) or by inserting rows directly:
+#   sqlite3 payoutd.sqlite3 "INSERT INTO jobs (to_addr, amount) VALUES ('0x..', '12.5')"
+# The sender thread takes up to SEND_BATCH queued jobs at a time, signs them
+# with consecutive nonces and broadcasts them in one eth_sendRawTransaction
+# batch, with at most IN_FLIGHT txs unconfirmed. Receipts come from one
+# confirm_tracker head follower. Stuck txs and nonce gaps are handled by
+# nonce_manager as in the batch sender.
+# Usage:
+#   python payout_daemon.py serve
+#   python payout_daemon.py send 0xTO 18 [--wait] [--ref invoice-42]
+#   python payout_daemon.py send - [--wait] < payouts.csv     # to,amount[,ref] CSV, one connection
+#   python payout_daemon.py status 17 | --ref invoice-42
+#   python payout_daemon.py stats
+# Client commands use the standard library only, so they start in milliseconds.
+# Only the first key of PRIVATE_KEYS sends; AUTO_SPLIT_OVER_50K does not apply
+# (amounts over send_veronica.MAX_PER_TX are rejected).
+# Protocol: one JSON object per line each way; replies come back in request order.
+#   {"op": "send", "to": "0x..", "amount": "12.5", "ref": "..", "wait": false}
+#     -> {"job": 17, "status": "sent", "hash": "0x..", ...} once broadcast (after the receipt with "wait")
+#   {"op": "status", "job": 17} / {"op": "status", "ref": ".."}    {"op": "stats"}
+# A "sent" job whose nonce was mined by a tx the daemon can't find ends as
+# "review": look at the account's history before sending it again.
+import os, re, sys, csv, json, time, queue, socket, argparse, threading
+
+# ----- Config -----
+SOCKET_PATH = os.getenv("PAYOUTD_SOCKET", "payoutd.sock")
+DB_PATH = os.getenv("PAYOUTD_DB", "payoutd.sqlite3")
+SEND_BATCH = 50          # queued jobs signed and broadcast per eth_sendRawTransaction batch
+IN_FLIGHT = 64           # max broadcast-but-unconfirmed txs; the queue waits beyond that
+QUEUE_POLL = 1.0         # seconds between checks for rows inserted straight into SQLite
+RECEIPT_POLL = 0.5       # seconds between checks of the head follower's results
+NONCE_CHECK_EVERY = 15   # seconds between stuck-tx / nonce-gap checks while txs are in flight
+WAIT_TIMEOUT = 180       # "wait" replies give up (status still "sent") after this many seconds
+# -------------------
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ref TEXT UNIQUE,
+    to_addr TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',   -- queued, sent, confirmed, reverted, error, review
+    nonce INTEGER, tx_hash TEXT, raw TEXT, tx TEXT,
+    block INTEGER, gas_used INTEGER, fee_eth TEXT, error TEXT,
+    created REAL DEFAULT (strftime('%s', 'now')), updated REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+FINAL = ("confirmed", "reverted", "error", "review")
+COLUMNS = ("id", "ref", "to_addr", "amount", "status", "nonce", "tx_hash", "block", "gas_used", "fee_eth", "error")
+ADDRESS = re.compile(r"^0x[0-9a-fA-F]{40}$")
+
+class PayoutDaemon:
+    def __init__(self, db_path=DB_PATH):
+        # web3 & co. are imported here only: the client commands stay at stdlib import cost
+        global Decimal, Web3, receipt_columns, transfer_tx, MAX_PER_TX
+        import sqlite3
+        from decimal import Decimal
+        from web3 import Web3
+        from fee_oracle import FeeOracle
+        from nonce_manager import NonceManager
+        from confirm_tracker import ConfirmationTracker
+        from erc20_fast import transfer_tx
+        from send_veronica import TOKEN_ADDR, MAX_PER_TX, safe_decimals, ensure_contract, ERC20_ABI
+        from send_veronica_batch import load_env_and_web3, receipt_columns
+
+        self.w3, accts, self.pool = load_env_and_web3()
+        self.acct = accts[0]
+        self.chain_id = int(os.getenv("CHAIN_ID", "8453"))
+        token_addr = Web3.to_checksum_address(TOKEN_ADDR)
+        ensure_contract(self.w3, token_addr)
+        self.token = token_addr
+        self.decimals = safe_decimals(self.w3.eth.contract(token_addr, abi=ERC20_ABI))
+        self.oracle = FeeOracle(self.w3)
+        self.tracker = ConfirmationTracker(self.pool).start()
+        self.nm = NonceManager(self.w3, self.acct, tracker=self.tracker)
+
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")  # direct inserts from other processes don't block us
+        self.db.execute("PRAGMA busy_timeout=5000")
+        self.db.executescript(SCHEMA)
+        self.lock = threading.RLock()
+        self.cond = threading.Condition(self.lock)
+        self.live = {}       # job -> status, for queued/sent jobs known to this process
+        self.inflight = {}   # job -> nonce, broadcast and not yet mined
+        self.wake = threading.Event()
+        self.closed = threading.Event()
+        self.sent = self.failed = self.batches = 0
+        self._recover()
+
+    # ----- startup -----
+    def _recover(self):
+        # jobs marked "sent" by a previous run: make sure the nonce file knows
+        # their tx (the job row is committed before nm.record) and watch them
+        mined = self.w3.eth.get_transaction_count(self.acct.address, "latest")
+        rows = self.db.execute("SELECT id, nonce, tx_hash, raw, tx FROM jobs WHERE status = 'sent'").fetchall()
+        missing = 0
+        for job, n, h, raw, tx in rows:
+            if n < mined and not self.nm.hashes(n):
+                # mined, and the nonce file has nothing to watch: settle it now or
+                # it would hold an IN_FLIGHT slot forever
+                self._settle_mined(job, n, h)
+                continue
+            if n >= mined and h not in self.nm.hashes(n):
+                self.nm.record(n, json.loads(tx), Web3.to_bytes(hexstr=raw))
+                missing += 1
+            self.inflight[job] = n
+            self.live[job] = "sent"
+        if missing:
+            self.nm.sync()  # rebroadcasts the ones the node doesn't hold
+        if rows:
+            print(f"Recovered {len(rows)} unconfirmed jobs ({missing} re-recorded in the nonce file)")
+
+    def _settle_mined(self, job, n, h):
+        from web3.exceptions import TransactionNotFound
+        try:
+            rcpt = self.w3.eth.get_transaction_receipt(h)
+        except TransactionNotFound:
+            # a replacement we lost track of, or a tx from elsewhere: only a human can tell
+            self._finish(job, status="review", error=f"nonce {n} was mined, but not by {h}; "
+                                                     f"check the account's txs before resending")
+            print(f"[warn] job {job}: nonce {n} mined by an unknown tx; marked for review")
+            return
+        block, gas, fee, status = receipt_columns(self.w3, rcpt)
+        self._finish(job, status=status, block=block, gas_used=gas, fee_eth=fee)
+        print(f"✓ job {job} | {status} in block {block}")
+
+    # ----- submissions -----
+    def submit(self, to, amount, ref=None):
+        to, amount = self._check(to, amount)
+        with self.lock:
+            if ref is not None:
+                row = self.db.execute("SELECT id FROM jobs WHERE ref = ?", (ref,)).fetchone()
+                if row:
+                    return row[0]  # idempotent resubmission of the same ref
+            cur = self.db.execute("INSERT INTO jobs (ref, to_addr, amount, updated) VALUES (?, ?, ?, ?)",
+                                  (ref, to, str(amount), time.time()))
+            self.db.commit()
+            self.live[cur.lastrowid] = "queued"
+        self.wake.set()
+        return cur.lastrowid
+
+    def _check(self, to, amount):
+        if not isinstance(to, str) or not ADDRESS.match(to):
+            raise ValueError(f"bad recipient address: {to!r}")
+        try:
+            amount = Decimal(str(amount))
+        except Exception:
+            raise ValueError(f"bad amount: {amount!r}") from None
+        if not amount.is_finite() or amount <= 0:
+            raise ValueError(f"bad amount: {amount}")
+        if amount > MAX_PER_TX:
+            raise ValueError(f"refusing > {MAX_PER_TX} in one tx (requested {amount})")
+        return Web3.to_checksum_address(to), amount
+
+    def _finish(self, job, **cols):
+        cols["updated"] = time.time()
+        with self.lock:
+            self.db.execute(f"UPDATE jobs SET {', '.join(k + ' = ?' for k in cols)} WHERE id = ?",
+                            list(cols.values()) + [job])
+            self.db.commit()
+            self.inflight.pop(job, None)
+            self.live.pop(job, None)
+            self.cond.notify_all()
+
+    # ----- sender -----
+    def _send_loop(self):
+        while not self.closed.is_set():
+            self.wake.wait(QUEUE_POLL)
+            self.wake.clear()
+            while not self.closed.is_set():
+                room = IN_FLIGHT - len(self.inflight)
+                if room <= 0:
+                    break  # the confirm loop wakes us when a slot frees up
+                with self.lock:
+                    rows = self.db.execute("SELECT id, to_addr, amount FROM jobs WHERE status = 'queued' "
+                                           "ORDER BY id LIMIT ?", (min(room, SEND_BATCH),)).fetchall()
+                if not rows:
+                    break
+                try:
+                    self._send_batch(rows)
+                except Exception as e:
+                    print(f"[err] send batch failed: {e!r}")
+                    self.closed.wait(QUEUE_POLL)
+
+    def _send_batch(self, rows):
+        fee = self.oracle.fees()
+        signed = []
+        for job, to, amount in rows:
+            try:
+                to, amount = self._check(to, amount)
+            except ValueError as e:
+                self.failed += 1
+                self._finish(job, status="error", error=str(e))
+                continue
+            nonce = self.nm.reserve()
+            try:
+                tx = transfer_tx(self.chain_id, self.acct.address, self.token, to, int(amount * (10 ** self.decimals)),
+                                 nonce, fee["maxFeePerGas"], fee["maxPriorityFeePerGas"])
+                tx["gas"] = self.oracle.gas_for(tx, self.token, "transfer", to)
+                s = self.acct.sign_transaction(tx)
+            except Exception as e:
+                self.nm.release(nonce)
+                self.failed += 1
+                self._finish(job, status="error", error=repr(e))
+                continue
+            raw = Web3.to_hex(getattr(s, "rawTransaction", None) or getattr(s, "raw_transaction"))
+            signed.append((job, nonce, tx, raw, Web3.to_hex(s.hash), to, amount))
+        if not signed:
+            return
+
+        # job rows first, then the nonce file, then the network: a crash anywhere
+        # leaves either a queued job or a "sent" one that _recover() can finish
+        now = time.time()
+        with self.lock:
+            self.db.executemany("UPDATE jobs SET status = 'sent', nonce = ?, tx_hash = ?, raw = ?, tx = ?, updated = ? "
+                                "WHERE id = ?", [(n, h, raw, json.dumps(tx), now, job)
+                                                 for job, n, tx, raw, h, _, _ in signed])
+            self.db.commit()
+            for job, n, *_ in signed:
+                self.inflight[job] = n
+                self.live[job] = "sent"
+        for job, n, tx, raw, *_ in signed:
+            self.nm.record(n, tx, Web3.to_bytes(hexstr=raw))
+
+        payload = [{"jsonrpc": "2.0", "id": i, "method": "eth_sendRawTransaction", "params": [s[3]]}
+                   for i, s in enumerate(signed)]
+        try:
+            resp = self.pool.send_raw(payload)
+        except Exception as e:
+            # outcome unknown: the txs stay "sent" and the nonce check rebroadcasts any the node lacks
+            print(f"[warn] broadcast of {len(signed)} txs failed ({e!r}); leaving them to the nonce check")
+            resp = None
+        if resp is not None and not isinstance(resp, list):
+            resp = [self._send_one(s[3], i) for i, s in enumerate(signed)]  # node without batch support
+        self.batches += 1
+        by_id = {item.get("id"): item for item in resp or []}
+        rejected = False
+        for i, (job, n, _, _, h, to, amount) in enumerate(signed):
+            err = by_id.get(i, {}).get("error")
+            if err and "already known" not in str(err).lower():
+                rejected = True
+                self.nm.release(n)
+                self.failed += 1
+                self._finish(job, status="error", error=str(err.get("message", err) if isinstance(err, dict) else err))
+                print(f"[err] job {job} -> {to}: {err}")
+                continue
+            self.sent += 1
+            print(f"→ {to} | {amount} | {h}")
+        if rejected:
+            self.nm.sync()  # "nonce too low" and friends: resync before the next batch
+        with self.lock:
+            self.cond.notify_all()
+
+    def _send_one(self, raw, i):
+        try:
+            self.w3.eth.send_raw_transaction(raw)
+            return {"id": i, "result": True}
+        except Exception as e:
+            return {"id": i, "error": repr(e)}
+
+    # ----- confirmations -----
+    def _confirm_loop(self):
+        last_check = time.time()
+        while not self.closed.wait(RECEIPT_POLL):
+            with self.lock:
+                jobs = list(self.inflight.items())
+            if not jobs:
+                continue
+            if time.time() - last_check > NONCE_CHECK_EVERY:
+                last_check = time.time()
+                try:
+                    self.nm.check()
+                except Exception as e:
+                    print(f"[warn] nonce check failed: {e!r}")
+            freed = False
+            for job, n in jobs:
+                try:
+                    found = self.nm.receipt(n)  # resolved by the tracker's head follower; no RPC here
+                except Exception as e:
+                    print(f"[warn] receipt for nonce {n} failed: {e!r}")
+                    continue
+                if found is None:
+                    continue
+                h, rcpt = found
+                block, gas, fee, status = receipt_columns(self.w3, rcpt)
+                self._finish(job, status=status, tx_hash=h, block=block, gas_used=gas, fee_eth=fee)
+                print(f"✓ job {job} | {status} in block {block}")
+                freed = True
+            if freed:
+                self.wake.set()
+
+    # ----- queries -----
+    def job(self, job=None, ref=None):
+        with self.lock:
+            where, arg = ("ref = ?", ref) if job is None else ("id = ?", job)
+            row = self.db.execute(f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE {where}", (arg,)).fetchone()
+        if row is None:
+            return {"error": f"no such job: {ref if job is None else job}"}
+        out = dict(zip(COLUMNS, row))
+        out["job"], out["to"], out["hash"] = out.pop("id"), out.pop("to_addr"), out.pop("tx_hash")
+        return out
+
+    def _status(self, job):
+        s = self.live.get(job)
+        if s is None:
+            row = self.db.execute("SELECT status FROM jobs WHERE id = ?", (job,)).fetchone()
+            s = row[0] if row else "error"
+        return s
+
+    def reply(self, job, wait):
+        # blocks until the job is broadcast (or mined, with wait); replies in request order
+        done = FINAL if wait else FINAL + ("sent",)
+        with self.cond:
+            self.cond.wait_for(lambda: self.closed.is_set() or self._status(job) in done,
+                               WAIT_TIMEOUT if wait else None)
+        return self.job(job)
+
+    def stats(self):
+        with self.lock:
+            counts = dict(self.db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {"jobs": counts, "in_flight": len(self.inflight), "sent": self.sent, "failed": self.failed,
+                "batches": self.batches, "nonces": self.nm.stats(), "confirmations": self.tracker.stats(),
+                "fees": self.oracle.stats(), "rpc": self.pool.stats()}
+
+    def handle(self, req):
+        # returns the reply, or a callable producing it once the job gets there
+        op = req.get("op")
+        if op == "send":
+            try:
+                job = self.submit(req.get("to"), req.get("amount"), req.get("ref"))
+            except ValueError as e:
+                return {"error": str(e)}
+            return lambda: self.reply(job, bool(req.get("wait")))
+        if op == "status":
+            return self.job(req.get("job"), req.get("ref"))
+        if op == "stats":
+            return self.stats()
+        return {"error": f"unknown op: {op!r}"}
+
+    # ----- lifecycle -----
+    def serve(self, path=SOCKET_PATH):
+        import signal, socketserver
+        payouts = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                # requests are read (and queued) as fast as the client writes them,
+                # so a pipelined client fills whole send batches
+                replies = queue.Queue()
+                writer = threading.Thread(target=self.write_replies, args=(replies,), daemon=True)
+                writer.start()
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    try:
+                        req = json.loads(line)
+                        out = payouts.handle(req)
+                    except Exception as e:
+                        req, out = {}, {"error": repr(e)}
+                    replies.put((req.get("id") if isinstance(req, dict) else None, out))
+                replies.put(None)
+                writer.join()
+
+            def write_replies(self, replies):
+                while True:
+                    item = replies.get()
+                    if item is None:
+                        return
+                    rid, out = item
+                    if callable(out):
+                        out = out()
+                    if rid is not None:
+                        out = dict(out, id=rid)
+                    try:
+                        self.wfile.write((json.dumps(out) + "\n").encode())
+                        self.wfile.flush()
+                    except OSError:
+                        return  # client went away; its jobs carry on
+
+        if os.path.exists(path):
+            os.unlink(path)
+        server = socketserver.ThreadingUnixStreamServer(path, Handler)
+        server.daemon_threads = True
+        threads = [threading.Thread(target=server.serve_forever, daemon=True),
+                   threading.Thread(target=self._send_loop, daemon=True),
+                   threading.Thread(target=self._confirm_loop, daemon=True)]
+        for t in threads:
+            t.start()
+        self.wake.set()  # rows queued while we were down
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: self.closed.set())
+        print(f"Listening on {path} | queue {DB_PATH}")
+        self.closed.wait()
+
+        print("Shutting down...")
+        server.shutdown()
+        server.server_close()
+        os.unlink(path)
+        with self.cond:
+            self.cond.notify_all()
+        for t in threads[1:]:
+            t.join(timeout=QUEUE_POLL + 5)
+        print(self.tracker.stats())
+        self.tracker.close()
+        print(self.oracle.stats())
+        self.oracle.close()
+        print(self.nm.stats())
+        print(self.pool.stats())
+        self.db.close()
+
+# ----- client -----
+def request(reqs, path=SOCKET_PATH):
+    # sends every request before reading, so the daemon can batch them; yields replies in order
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(path)
+        except OSError as e:
+            raise SystemExit(f"payout daemon not reachable at {path} ({e}); start it with: python payout_daemon.py serve")
+        s.sendall(b"".join((json.dumps(r) + "\n").encode() for r in reqs))
+        s.shutdown(socket.SHUT_WR)
+        with s.makefile("r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+def print_job(r):
+    if "status" not in r:
+        print(f"[err] {r['error']}")
+    elif r["status"] in ("error", "review"):
+        print(f"[err] job {r['job']} -> {r['to']}: {r['error']}")
+    elif r["status"] == "sent":
+        print(f"→ Sent {r['amount']} tokens | tx: {r['hash']} (job {r['job']})")
+    else:
+        print(f"   {r['status'].capitalize()} in block: {r['block']} (tx {r['hash']}, job {r['job']})")
+
+def read_jobs(f):
+    # payout CSV (to,amount headers like send_veronica_batch.py; an optional "ref" column is the idempotency key)
+    reader = csv.DictReader(f)
+    if "to" not in (reader.fieldnames or []) or "amount" not in reader.fieldnames:
+        raise SystemExit("CSV must have headers: to,amount")
+    for row in reader:
+        if (row.get("to") or "").strip():
+            yield {"op": "send", "to": row["to"].strip(), "amount": (row.get("amount") or "").strip(),
+                   "ref": (row.get("ref") or "").strip() or None}
+
+def main():
+    p = argparse.ArgumentParser(description="Warm payout daemon and its client")
+    p.add_argument("--socket", default=SOCKET_PATH)
+    sub = p.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("serve", help="run the daemon")
+    s = sub.add_parser("send", help="queue a transfer and print its tx hash")
+    s.add_argument("to", help="recipient, or - for a to,amount[,ref] CSV on stdin")
+    s.add_argument("amount", nargs="?")
+    s.add_argument("--ref", help="idempotency key: resubmitting it returns the existing job")
+    s.add_argument("--wait", action="store_true", help="reply once mined instead of once broadcast")
+    st = sub.add_parser("status", help="show a job")
+    st.add_argument("job", nargs="?", type=int)
+    st.add_argument("--ref")
+    sub.add_parser("stats", help="daemon counters")
+    args = p.parse_args()
+
+    if args.cmd == "serve":
+        PayoutDaemon().serve(args.socket)
+        return
+    if args.cmd == "send":
+        if args.to == "-":
+            reqs = list(read_jobs(sys.stdin))
+        elif args.amount is None:
+            raise SystemExit("usage: payout_daemon.py send 0xTO AMOUNT")
+        else:
+            reqs = [{"op": "send", "to": args.to, "amount": args.amount, "ref": args.ref}]
+        for r in reqs:
+            r["wait"] = args.wait
+        failed = 0
+        for r in request(reqs, args.socket):
+            print_job(r)
+            failed += "status" not in r or r["status"] in ("error", "reverted", "review")
+        sys.exit(1 if failed else 0)
+    if args.cmd == "status":
+        if args.job is None and args.ref is None:
+            raise SystemExit("usage: payout_daemon.py status JOB | --ref REF")
+        for r in request([{"op": "status", "job": args.job, "ref": args.ref}], args.socket):
+            print(json.dumps(r, indent=1))
+    elif args.cmd == "stats":
+        for r in request([{"op": "stats"}], args.socket):
+            print(json.dumps(r, indent=1))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# payout_journal.py
+# Write-ahead journal for send_veronica_batch.py.
+# Every broadcast is appended (and fsynced) here *before* the raw tx leaves
+# the process, and every CHECKPOINT_EVERY rows a checkpoint records how far
+# the output CSV is complete: the input byte offset of the next row and the
+# output file size at that point. After a crash the batch seeks straight to
+# the checkpoint, truncates the partial output tail and replays only the tx
+# records after it, so recovery costs O(unsent rows), not a re-scan.
+# A broadcast that fails is followed by an abort record cancelling its intent.
+# The journal is compacted to checkpoint + open rows as it grows, so it stays
+# O(in-flight rows) on disk and in memory.
+import os, csv, json, threading
+
+# ----- Config -----
+CHECKPOINT_EVERY = 100   # rows written between checkpoints (each one fsyncs the output CSV)
+COMPACT_EVERY = 10_000   # journal lines before it is rewritten down to the open rows
+# -------------------
+
+class PayoutJournal:
+    def __init__(self, path, input_path):
+        self.path = path
+        self.input = os.path.abspath(input_path)
+        self.row = 0          # first row not yet durably in the output CSV
+        self.in_offset = None
+        self.out_offset = None
+        self.open = {}        # row -> [tx records] for rows at/after the checkpoint
+        self.lines = 0
+        self.f = None
+        self.lock = threading.Lock()  # shards record intents concurrently
+
+    # ----- startup -----
+    def resume(self, output_path):
+        # True if a journal for this input exists and the output still matches it
+        if not os.path.exists(self.path) or not os.path.exists(output_path):
+            return False
+        hdr = None
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    break  # torn final line from a crash mid-append
+                t = rec.get("t")
+                if t == "hdr":
+                    hdr = rec
+                elif t == "ckpt":
+                    self.row, self.in_offset, self.out_offset = rec["row"], rec["in"], rec["out"]
+                    self.open = {r: v for r, v in self.open.items() if r >= self.row}
+                elif t == "tx" and rec["row"] >= self.row:
+                    self.open.setdefault(rec["row"], []).append(rec)
+                elif t == "abort":
+                    self._drop(rec)
+        if not hdr or hdr.get("input") != self.input or self.in_offset is None:
+            self.row, self.in_offset, self.out_offset, self.open = 0, None, None, {}
+            return False
+        if os.path.getsize(output_path) < self.out_offset:
+            raise SystemExit(f"{output_path} is shorter than journal checkpoint; "
+                             f"delete {self.path} to start over")
+        self._compact()
+        return True
+
+    def start(self, in_offset, out_offset):
+        # fresh run: new journal with a row-0 checkpoint after the CSV headers
+        self.row, self.open = 0, {}
+        self.in_offset, self.out_offset = in_offset, out_offset
+        self._compact()
+
+    # ----- records -----
+    def _append(self, rec, sync):
+        self.f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+        self.f.flush()
+        if sync:
+            os.fsync(self.f.fileno())
+        self.lines += 1
+
+    def intent(self, row, chunk, of, sender, nonce, txh, covers_all=False):
+        # must return before the raw tx is broadcast; covers_all: one tx pays every chunk (Disperse)
+        rec = {"t": "tx", "row": row, "chunk": chunk, "of": of, "from": sender, "nonce": nonce, "hash": txh}
+        if covers_all:
+            rec["all"] = True
+        with self.lock:
+            self.open.setdefault(row, []).append(rec)
+            self._append(rec, sync=True)
+
+    def abort(self, row, chunk, txh):
+        # the broadcast of an intent failed: the tx never left, so resume must not trust it
+        rec = {"t": "abort", "row": row, "chunk": chunk, "hash": txh}
+        with self.lock:
+            self._drop(rec)
+            self._append(rec, sync=True)
+
+    def _drop(self, abort):
+        recs = [r for r in self.open.get(abort["row"], [])
+                if not (r["chunk"] == abort["chunk"] and r["hash"] == abort["hash"])]
+        if recs:
+            self.open[abort["row"]] = recs
+        else:
+            self.open.pop(abort["row"], None)
+
+    def checkpoint(self, row, in_offset, out_offset):
+        # caller has fsynced the output CSV up to out_offset
+        with self.lock:
+            self.row, self.in_offset, self.out_offset = row, in_offset, out_offset
+            self.open = {r: v for r, v in self.open.items() if r >= row}
+            if self.lines >= COMPACT_EVERY:
+                self._compact()
+            else:
+                self._append({"t": "ckpt", "row": row, "in": in_offset, "out": out_offset}, sync=True)
+
+    def _compact(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"t": "hdr", "input": self.input}) + "\n")
+            f.write(json.dumps({"t": "ckpt", "row": self.row, "in": self.in_offset, "out": self.out_offset}) + "\n")
+            for recs in self.open.values():
+                for rec in recs:
+                    f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if self.f:
+            self.f.close()
+        os.replace(tmp, self.path)
+        self.f = open(self.path, "a", encoding="utf-8")
+        self.lines = 2 + sum(len(v) for v in self.open.values())
+
+    def apply(self, row, fields):
+        # Rows broadcast before a crash come back as "sent" with their hashes,
+        # so prepare_row() resolves their receipts instead of sending again;
+        # it also tries any replacement the NonceManager recorded for that nonce
+        with self.lock:
+            recs = list(self.open.get(row, []))
+        if not recs:
+            return fields
+        by_chunk = {}
+        for rec in recs:
+            by_chunk[rec["chunk"]] = rec["hash"]  # later records are replacements
+        out = dict(fields, tx_hashes=";".join(by_chunk[c] for c in sorted(by_chunk)))
+        of = recs[-1]["of"]
+        if len(by_chunk) < of and not any(rec.get("all") for rec in recs):
+            out.update({"status": "error", "error": f"interrupted: {len(by_chunk)} of {of} chunks broadcast"})
+        else:
+            out["status"] = "sent"
+        return out
+
+    def close(self):
+        if self.f:
+            self.f.close()
+            self.f = None
+
+class OffsetReader:
+    # csv.DictReader over a binary file that knows the byte offset of every
+    # row, so checkpoints can point into the input and resume can seek()
+    def __init__(self, f):
+        self.f = f
+        header = next(csv.reader([self._record()]), [])
+        self.fieldnames = [h.lstrip("\ufeff") for h in header]
+        self.header_end = f.tell()
+        self.starts = {}   # row -> byte offset, pruned as rows are checkpointed
+        self.pos = self.header_end
+        self.lock = threading.Lock()
+
+    def _record(self):
+        # one CSV record; quoted fields may span lines
+        text = ""
+        while True:
+            line = self.f.readline()
+            if not line:
+                return text
+            text += line.decode("utf-8")
+            if text.count('"') % 2 == 0:
+                return text
+
+    def rows(self, start_row=0, offset=None):
+        if offset is not None:
+            self.f.seek(offset)
+        idx = start_row
+        while True:
+            start = self.f.tell()
+            text = self._record()
+            with self.lock:
+                self.pos = self.f.tell()
+                if not text:
+                    return
+                if not text.strip():
+                    continue
+                self.starts[idx] = start
+            values = next(csv.reader([text]))
+            yield idx, dict(zip(self.fieldnames, values + [""] * (len(self.fieldnames) - len(values))))
+            idx += 1
+
+    def offset_of(self, row):
+        # byte offset where `row` starts (or where the next read begins if it has not been read yet)
+        with self.lock:
+            for r in [r for r in self.starts if r < row]:
+                del self.starts[r]
+            return self.starts.get(row, self.pos)
@@ -0,0 +1,537 @@
+# pine_signals.py
+# Offline port of advanced_trading_signals_v6.pine: indicators, BUY/SELL
+# signals and the SL/TP levels, computed with NumPy over whole OHLCV arrays,
+# plus a backtester and grid/random parameter sweeps across processes.
+# Usage:
+#   python pine_signals.py ohlcv.csv                          # Pine defaults, metrics
+#   python pine_signals.py ohlcv.csv --set sl_multiplier=2 --trades
+#   python pine_signals.py --convert ohlcv.csv ohlcv.npy      # memory-mappable copy
+#   python pine_signals.py ohlcv.npy --param fast_ema_len=5,9,13 --param slow_ema_len=21,34
+#   python pine_signals.py ohlcv.npy --random 500 --param sl_multiplier=1:3 --param tp_multiplier=1.5:4
+#   python pine_signals.py --bench [--bars 1000000]          # bars/sec
+# CSV needs open/high/low/close (volume optional) columns; other columns are
+# ignored. .npy files hold a (5, bars) float64 OHLCV array and are opened with
+# mmap_mode="r", so sweep workers share one copy through the page cache.
+# Semantics follow Pine on confirmed (historical) bars: EMA/RMA are seeded
+# with an SMA, na compares false, and SL/TP exits trigger on close, like the
+# script's auto-clear. Parabolic SAR and the cooldown/flip gates are
+# inherently sequential; SAR is a plain loop (cached per parameter triple)
+# and the gates only visit bars where every other condition already holds.
+import os, csv, time, random, argparse, itertools
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# ----- Config -----
+SCAN_EPS = 1e-18         # EMA/RMA scans stop once decay^window drops below this
+CACHE_ENTRIES = 64       # indicator arrays kept per process (keyed by their own inputs)
+SWEEP_CHUNK = 16         # parameter sets per task sent to a worker
+COST_BPS = 0.0           # round-trip cost per trade in basis points
+TOP = 20                 # sweep results printed
+SORT_BY = "total_return"
+# -------------------
+
+# input.* defaults from the Pine script (display options left out)
+DEFAULTS = {
+    "fast_ema_len": 9,
+    "slow_ema_len": 21,
+    "trend_sma_len": 50,
+    "long_sma_len": 100,
+    "rsi_length": 14,
+    "rsi_overbought": 70,
+    "rsi_oversold": 30,
+    "macd_fast": 12,
+    "macd_slow": 26,
+    "macd_signal": 9,
+    "sar_start": 0.02,
+    "sar_increment": 0.02,
+    "sar_maximum": 0.2,
+    "use_sar_filter": True,
+    "volume_ma_len": 20,
+    "volume_threshold": 0.8,
+    "atr_length": 14,
+    "sl_multiplier": 1.5,
+    "tp_multiplier": 2.5,
+    "min_trend_strength": 0.5,
+    "signal_cooldown": 10,
+    "min_bars_between_flip": 15,
+    "require_all_confirmations": False,
+    "use_price_action_filter": False,
+    "use_momentum_filter": False,
+    "use_trend_quality_filter": False,
+    "min_volume_multiplier": 0.8,
+    "require_candle_close_confirmation": False,
+    "min_risk_reward": 0.5,
+}
+# Inputs the v6 script computes filters from but never feeds into
+# final_buy_signal / final_sell_signal; sweeping them changes nothing
+UNUSED = {"long_sma_len", "volume_ma_len", "volume_threshold", "require_all_confirmations",
+          "use_price_action_filter", "use_momentum_filter", "use_trend_quality_filter",
+          "min_volume_multiplier", "require_candle_close_confirmation"}
+COLUMNS = ("open", "high", "low", "close", "volume")
+
+# ----- data -----
+def load_ohlcv(path):
+    if path.endswith(".npy"):
+        arr = np.load(path, mmap_mode="r")
+        if arr.ndim != 2 or arr.shape[0] != 5:
+            raise SystemExit(f"{path}: expected a (5, bars) OHLCV array, got {arr.shape}")
+        return dict(zip(COLUMNS, arr))
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        header = [h.strip().lower() for h in next(csv.reader(f))]
+    missing = [c for c in COLUMNS[:4] if c not in header]
+    if missing:
+        raise SystemExit(f"{path}: missing column(s) {', '.join(missing)}")
+    names = [c for c in COLUMNS if c in header]
+    arr = np.loadtxt(path, delimiter=",", skiprows=1, usecols=[header.index(c) for c in names],
+                     dtype=np.float64, ndmin=2)
+    data = {c: np.ascontiguousarray(arr[:, i]) for i, c in enumerate(names)}
+    data.setdefault("volume", np.zeros(len(arr)))
+    return data
+
+def save_ohlcv(path, data):
+    np.save(path, np.stack([np.asarray(data[c], dtype=np.float64) for c in COLUMNS]))
+    print(f"Saved: {path} ({len(data['close'])} bars)")
+
+def synthetic(bars, seed=1):
+    # geometric random walk with regime-switching drift, so crosses and trends occur
+    rng = np.random.default_rng(seed)
+    drift = np.repeat(rng.normal(0, 0.002, bars // 500 + 1), 500)[:bars]
+    close = 100 * np.exp(np.cumsum(drift + rng.normal(0, 0.01, bars)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    wick = np.abs(rng.normal(0, 0.004, (2, bars))) * close
+    return {"open": open_, "high": np.maximum(open_, close) + wick[0],
+            "low": np.minimum(open_, close) - wick[1], "close": close,
+            "volume": rng.lognormal(10, 1, bars)}
+
+# ----- indicators -----
+def prev(x, k=1):
+    # x[k] in Pine: shifted right, na (NaN) for the first k bars
+    out = np.empty(len(x))
+    out[:k] = np.nan
+    out[k:] = x[:-k]
+    return out
+
+def _scan(b, d):
+    # y[t] = d * y[t-1] + b[t] with y[-1] = 0, as a log-step prefix scan: after
+    # the pass with shift s each y[t] holds 2s terms, and terms older than
+    # d**window are below float precision, so the pass count is fixed by d
+    y = np.array(b, dtype=np.float64)
+    s, w = 1, d
+    while s < len(y) and w > SCAN_EPS:
+        y[s:] = y[s:] + w * y[:-s]
+        s, w = 2 * s, w * w
+    return y
+
+def _smooth(x, alpha, length):
+    # Pine ta.ema / ta.rma: na until `length` valid values, then seeded with their SMA
+    out = np.full(len(x), np.nan)
+    valid = np.flatnonzero(~np.isnan(x))
+    if len(valid) == 0 or valid[0] + length > len(x):
+        return out
+    seed = valid[0] + length - 1
+    b = alpha * x[seed:]
+    b[0] = x[valid[0]:seed + 1].mean()
+    out[seed:] = _scan(b, 1.0 - alpha)
+    return out
+
+def ema(x, length):
+    return _smooth(x, 2.0 / (length + 1), length)
+
+def rma(x, length):
+    return _smooth(x, 1.0 / length, length)
+
+def sma(x, length):
+    out = np.full(len(x), np.nan)
+    if length <= len(x):
+        c = np.cumsum(np.concatenate(([0.0], x)))
+        out[length - 1:] = (c[length:] - c[:-length]) / length
+    return out
+
+def rsi(x, length):
+    ch = x - prev(x)
+    up = rma(np.where(np.isnan(ch), np.nan, np.maximum(ch, 0)), length)
+    down = rma(np.where(np.isnan(ch), np.nan, np.maximum(-ch, 0)), length)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100 - 100 / (1 + up / down)
+    out[down == 0] = 100.0
+    out[(up == 0) & (down != 0)] = 0.0
+    return out
+
+def macd(x, fast, slow, signal):
+    line = ema(x, fast) - ema(x, slow)
+    sig = ema(line, signal)
+    return line, sig, line - sig
+
+def atr(high, low, close, length):
+    pc = prev(close)
+    tr = np.fmax(high - low, np.fmax(np.abs(high - pc), np.abs(low - pc)))  # fmax: bar 0 is high - low
+    return rma(tr, length)
+
+def sar(high, low, close, start, inc, maximum):
+    # ta.sar, bar by bar (each value depends on the previous trend state)
+    h, l, c = high.tolist(), low.tolist(), close.tolist()
+    n = len(c)
+    out = [float("nan")] * n
+    if n < 2:
+        return np.array(out)
+    below = c[1] > c[0]
+    mm, res = (h[1], l[0]) if below else (l[1], h[0])
+    acc = start
+    for i in range(1, n):
+        first = i == 1
+        res = res + acc * (mm - res)
+        if below:
+            if res > l[i]:
+                first, below = True, False
+                res, mm, acc = max(h[i], mm), l[i], start
+        elif res < h[i]:
+            first, below = True, True
+            res, mm, acc = min(l[i], mm), h[i], start
+        if not first:
+            if below:
+                if h[i] > mm:
+                    mm, acc = h[i], min(acc + inc, maximum)
+            elif l[i] < mm:
+                mm, acc = l[i], min(acc + inc, maximum)
+        if below:
+            res = min(res, l[i - 1], l[i - 2]) if i > 1 else min(res, l[i - 1])
+        else:
+            res = max(res, h[i - 1], h[i - 2]) if i > 1 else max(res, h[i - 1])
+        out[i] = res
+    return np.array(out)
+
+_cache = OrderedDict()
+_cache_src = None   # (high, low, close) arrays the cached indicators were computed from
+
+def bind_cache(data):
+    # the cache holds one input series at a time; another symbol or a reloaded
+    # file clears it. The arrays are held, so their identity can't be reused.
+    global _cache_src
+    src = (data["high"], data["low"], data["close"])
+    if _cache_src is None or any(a is not b for a, b in zip(src, _cache_src)):
+        _cache.clear()
+        _cache_src = src
+
+def cached(key, fn, *args):
+    # indicator arrays keyed by (name, inputs); sweeps mostly vary gates and
+    # multipliers, so most parameter sets reuse every indicator
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+    val = _cache[key] = fn(*args)
+    if len(_cache) > CACHE_ENTRIES:
+        _cache.popitem(last=False)
+    return val
+
+def indicators(data, p):
+    h, l, c = data["high"], data["low"], data["close"]
+    bind_cache(data)
+    ind = {
+        "ema_fast": cached(("ema", p["fast_ema_len"]), ema, c, p["fast_ema_len"]),
+        "ema_slow": cached(("ema", p["slow_ema_len"]), ema, c, p["slow_ema_len"]),
+        "sma_trend": cached(("sma", p["trend_sma_len"]), sma, c, p["trend_sma_len"]),
+        "rsi": cached(("rsi", p["rsi_length"]), rsi, c, p["rsi_length"]),
+        "atr": cached(("atr", p["atr_length"]), atr, h, l, c, p["atr_length"]),
+    }
+    ind["macd"], ind["signal"], ind["hist"] = cached(
+        ("macd", p["macd_fast"], p["macd_slow"], p["macd_signal"]),
+        macd, c, p["macd_fast"], p["macd_slow"], p["macd_signal"])
+    if p["use_sar_filter"]:
+        ind["sar"] = cached(("sar", p["sar_start"], p["sar_increment"], p["sar_maximum"]),
+                            sar, h, l, c, p["sar_start"], p["sar_increment"], p["sar_maximum"])
+    return ind
+
+# ----- signals -----
+def crossover(a, b):
+    return (a > b) & (prev(a) <= prev(b))
+
+def candidates(data, ind, p):
+    # every final_buy/final_sell condition except the cooldown and flip gates
+    o, c = data["open"], data["close"]
+    ef, es, st, r, a = ind["ema_fast"], ind["ema_slow"], ind["sma_trend"], ind["rsi"], ind["atr"]
+    line, sig, hist = ind["macd"], ind["signal"], ind["hist"]
+    hist_up, hist_down = hist > prev(hist), hist < prev(hist)
+    c5 = prev(c, 5)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dist = np.where(~np.isnan(st) & (st != 0), np.abs((c - st) / st) * 100, 0.0)
+        risk = c - (c - a * p["sl_multiplier"])
+        reward = (c + a * p["tp_multiplier"]) - c
+        buy_rr = np.where(risk > 0, reward / risk, 0.0)
+        s_risk = (c + a * p["sl_multiplier"]) - c
+        s_reward = c - (c - a * p["tp_multiplier"])
+        sell_rr = np.where(s_risk > 0, s_reward / s_risk, 0.0)
+    trend_ok = dist >= p["min_trend_strength"]
+
+    buy = (crossover(ef, es)
+           & (((line > sig) & hist_up) | (crossover(line, sig) & (hist > 0)))
+           & (r > 35) & (r < 70) & (c > c5) & (c > o)
+           & (ef > es) & (c > st)
+           & (r < p["rsi_overbought"]) & (buy_rr >= p["min_risk_reward"]) & trend_ok)
+    sell = (crossover(es, ef)
+            & (((line < sig) & hist_down) | (crossover(sig, line) & (hist < 0)))
+            & (r < 65) & (r > 30) & (c < c5) & (c < o)
+            & (ef < es) & (c < st)
+            & (r > p["rsi_oversold"]) & (sell_rr >= p["min_risk_reward"]) & trend_ok)
+    if p["use_sar_filter"]:
+        buy &= c > ind["sar"]
+        sell &= c < ind["sar"]
+    return buy, sell
+
+def gate(buy, sell, cooldown, flip):
+    # bars_since_* start at 999 and tick before the checks, i.e. 1000 + bar_index
+    # until the first signal. Returns (bar, +1 buy / -1 sell) pairs in order.
+    last = last_buy = last_sell = -1000
+    out = []
+    b = buy.tolist()
+    for i in np.flatnonzero(buy | sell).tolist():
+        if b[i] and i - last >= cooldown and i - last_sell >= flip:
+            out.append((i, 1))
+            last = last_buy = i
+        elif not b[i] and i - last >= cooldown and i - last_buy >= flip:
+            out.append((i, -1))
+            last = last_sell = i
+    return out
+
+def signals(data, p, ind=None):
+    ind = ind or indicators(data, p)
+    buy, sell = candidates(data, ind, p)
+    return gate(buy, sell, p["signal_cooldown"], p["min_bars_between_flip"]), ind
+
+# ----- backtest -----
+def backtest(data, ind, sigs, p):
+    # One position at a time. A signal opens at its close with ATR levels; the
+    # position ends when close reaches TP or SL (the script's auto-clear) or
+    # when the next signal replaces it. Still-open trades are marked at the last close.
+    c, a = data["close"], ind["atr"]
+    n = len(c)
+    trades = []
+    for k, (i, d) in enumerate(sigs):
+        end = sigs[k + 1][0] if k + 1 < len(sigs) else n
+        entry = float(c[i])
+        tp = entry + d * a[i] * p["tp_multiplier"]
+        sl = entry - d * a[i] * p["sl_multiplier"]
+        seg = c[i + 1:end]
+        hit = np.flatnonzero((seg >= tp) | (seg <= sl) if d > 0 else (seg <= tp) | (seg >= sl))
+        if len(hit):
+            j = i + 1 + int(hit[0])
+            reason = "tp" if (c[j] >= tp if d > 0 else c[j] <= tp) else "sl"
+        elif end < n:
+            j, reason = end, "replaced"
+        else:
+            j, reason = n - 1, "open"
+        ret = d * (float(c[j]) - entry) / entry - COST_BPS / 1e4
+        trades.append({"bar": i, "side": "buy" if d > 0 else "sell", "entry": entry,
+                       "exit_bar": j, "exit": float(c[j]), "reason": reason, "return": ret})
+    return trades
+
+def metrics(trades):
+    r = np.array([t["return"] for t in trades])
+    if not len(r):
+        return {"trades": 0, "win_rate": 0.0, "total_return": 0.0, "profit_factor": 0.0,
+                "max_drawdown": 0.0, "avg_bars": 0.0}
+    equity = np.cumprod(1 + r)
+    peak = np.maximum.accumulate(np.concatenate(([1.0], equity)))[1:]
+    gains, losses = r[r > 0].sum(), -r[r < 0].sum()
+    return {
+        "trades": len(r),
+        "win_rate": round(float((r > 0).mean()), 4),
+        "total_return": round(float(equity[-1] - 1), 6),
+        "profit_factor": round(float(gains / losses), 4) if losses else float("inf"),
+        "max_drawdown": round(float((1 - equity / peak).max()), 6),
+        "avg_bars": round(float(np.mean([t["exit_bar"] - t["bar"] for t in trades])), 2),
+    }
+
+def evaluate(data, p):
+    sigs, ind = signals(data, p)
+    return metrics(backtest(data, ind, sigs, p))
+
+# ----- sweeps -----
+def parse_value(name, v):
+    base = DEFAULTS[name]
+    if isinstance(base, bool):
+        return v.lower() in {"1", "true", "yes", "on"}
+    return int(v) if isinstance(base, int) else float(v)
+
+def parse_params(specs):
+    # name=v1,v2,...  |  name=lo:hi[:step]  (random mode samples lo..hi uniformly)
+    out = {}
+    for spec in specs:
+        name, _, v = spec.partition("=")
+        if name not in DEFAULTS:
+            raise SystemExit(f"unknown parameter {name!r}")
+        if name in UNUSED:
+            print(f"[warn] {name} does not affect final signals in the v6 script")
+        if ":" in v:
+            lo, hi, *step = [parse_value(name, x) for x in v.split(":")]
+            out[name] = ("range", lo, hi, step[0] if step else None)
+        else:
+            out[name] = ("list", [parse_value(name, x) for x in v.split(",")])
+    return out
+
+def valid(p):
+    return p["fast_ema_len"] < p["slow_ema_len"] and p["macd_fast"] < p["macd_slow"]
+
+def grid(space, base):
+    axes = []
+    for name, spec in space.items():
+        if spec[0] == "list":
+            axes.append([(name, v) for v in spec[1]])
+        else:
+            _, lo, hi, step = spec
+            step = step or (1 if isinstance(lo, int) else (hi - lo) / 10)
+            vals = np.arange(lo, hi + step / 2, step)
+            axes.append([(name, int(v) if isinstance(lo, int) else round(float(v), 10)) for v in vals])
+    for combo in itertools.product(*axes):
+        p = dict(base, **dict(combo))
+        if valid(p):
+            yield p
+
+def sample(space, base, count, seed):
+    rng = random.Random(seed)
+    drawn = tries = 0
+    while drawn < count and tries < count * 20:
+        tries += 1
+        p = dict(base)
+        for name, spec in space.items():
+            if spec[0] == "list":
+                p[name] = rng.choice(spec[1])
+            elif isinstance(spec[1], int):
+                p[name] = rng.randint(spec[1], spec[2])
+            else:
+                p[name] = rng.uniform(spec[1], spec[2])
+        if valid(p):
+            drawn += 1
+            yield p
+
+_data = None
+
+def _init_worker(source):
+    # source: .npy path (memory-mapped per worker) or the OHLCV dict itself
+    global _data
+    _data = load_ohlcv(source) if isinstance(source, str) else source
+    _data = {k: np.ascontiguousarray(v) for k, v in _data.items()}
+
+def run_chunk(params):
+    return [dict(p, **evaluate(_data, p)) for p in params]
+
+def indicator_key(p):
+    return tuple(p[k] for k in ("fast_ema_len", "slow_ema_len", "trend_sma_len", "rsi_length", "atr_length",
+                                "macd_fast", "macd_slow", "macd_signal", "use_sar_filter",
+                                "sar_start", "sar_increment", "sar_maximum"))
+
+def sweep(source, param_sets, workers):
+    # sets that share indicators go to the same task so worker caches hit
+    param_sets = sorted(param_sets, key=lambda p: tuple(map(float, indicator_key(p))))
+    chunks = [param_sets[i:i + SWEEP_CHUNK] for i in range(0, len(param_sets), SWEEP_CHUNK)]
+    if workers <= 0:
+        _init_worker(source)
+        return [r for ch in chunks for r in run_chunk(ch)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(source,)) as ex:
+        return [r for res in ex.map(run_chunk, chunks) for r in res]
+
+def print_results(results, sort_by, varied):
+    results.sort(key=lambda r: r[sort_by], reverse=sort_by != "max_drawdown")
+    print(f"\nTop {min(TOP, len(results))} of {len(results)} by {sort_by}:")
+    for r in results[:TOP]:
+        params = " ".join(f"{k}={r[k]:.4g}" if isinstance(r[k], float) else f"{k}={r[k]}" for k in varied)
+        print(f"  {params} | trades {r['trades']} | win {r['win_rate']:.2%} | return {r['total_return']:+.2%}"
+              f" | pf {r['profit_factor']} | dd {r['max_drawdown']:.2%}")
+
+def write_results(path, results):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(results[0]))
+        w.writeheader()
+        w.writerows(results)
+    print(f"Saved: {path} ({len(results)} rows)")
+
+# ----- benchmark -----
+def bench(args):
+    data = synthetic(args.bars)
+    p = dict(DEFAULTS)
+    n = args.bars
+    print(f"{n} synthetic bars")
+    t0 = time.perf_counter()
+    ind = indicators(data, p)
+    t1 = time.perf_counter()
+    sigs, _ = signals(data, p, ind)
+    trades = backtest(data, ind, sigs, p)
+    t2 = time.perf_counter()
+    print(f"  indicators (cold):      {n / (t1 - t0):12,.0f} bars/s  ({t1 - t0:.3f}s, SAR loop included)")
+    print(f"  signals + backtest:     {n / (t2 - t1):12,.0f} bars/s  ({t2 - t1:.3f}s, {len(trades)} trades)")
+    print(f"  full evaluation:        {n / (t2 - t0):12,.0f} bars/s")
+
+    space = {"signal_cooldown": ("list", [5, 10, 20]), "sl_multiplier": ("list", [1.0, 1.5, 2.0]),
+             "tp_multiplier": ("list", [2.0, 3.0]), "fast_ema_len": ("list", [7, 9, 12])}
+    sets = list(grid(space, DEFAULTS))
+    cores = os.cpu_count() or 1
+    print(f"Sweep of {len(sets)} parameter sets, {cores} CPUs")
+    base = None
+    for w in [0] + sorted({1, 2, 4, 8, 16, 32, cores} & set(range(1, cores + 1))):
+        _cache.clear()
+        t0 = time.perf_counter()
+        sweep(data, sets, w)
+        rate = len(sets) * n / (time.perf_counter() - t0)
+        base = base or rate
+        label = "in-process" if w == 0 else f"{w} workers"
+        print(f"  {label:>12}: {rate:14,.0f} bars/s  (x{rate / base:.2f})")
+
+def main():
+    p = argparse.ArgumentParser(description="Backtest / sweep advanced_trading_signals_v6 offline")
+    p.add_argument("data", nargs="?", help="OHLCV .csv or .npy")
+    p.add_argument("--set", action="append", default=[], metavar="NAME=VALUE", help="override a Pine input")
+    p.add_argument("--param", action="append", default=[], metavar="NAME=SPEC",
+                   help="sweep axis: v1,v2,... or lo:hi[:step]")
+    p.add_argument("--random", type=int, metavar="N", help="sample N parameter sets instead of the full grid")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="sweep processes (0 = in-process)")
+    p.add_argument("--sort", default=SORT_BY, help="metric to rank sweep results by")
+    p.add_argument("--out", help="write all sweep results to this CSV")
+    p.add_argument("--trades", action="store_true", help="print every trade")
+    p.add_argument("--convert", nargs=2, metavar=("CSV", "NPY"), help="write a memory-mappable .npy copy")
+    p.add_argument("--bench", action="store_true", help="measure bars/sec on synthetic data")
+    p.add_argument("--bars", type=int, default=1_000_000, help="bars for --bench")
+    args = p.parse_args()
+
+    if args.bench:
+        return bench(args)
+    if args.convert:
+        return save_ohlcv(args.convert[1], load_ohlcv(args.convert[0]))
+    if not args.data:
+        p.error("OHLCV file required")
+    base = dict(DEFAULTS)
+    for s in args.set:
+        name, _, v = s.partition("=")
+        if name not in DEFAULTS:
+            raise SystemExit(f"unknown parameter {name!r}")
+        base[name] = parse_value(name, v)
+
+    data = load_ohlcv(args.data)
+    print(f"{args.data}: {len(data['close'])} bars")
+    if not args.param:
+        sigs, ind = signals(data, base)
+        trades = backtest(data, ind, sigs, base)
+        if args.trades:
+            for t in trades:
+                print(f"  {t['side']:<4} bar {t['bar']} @ {t['entry']:.6g} -> bar {t['exit_bar']} "
+                      f"@ {t['exit']:.6g} ({t['reason']}) {t['return']:+.2%}")
+        print(metrics(trades))
+        return
+
+    space = parse_params(args.param)
+    sets = list(sample(space, base, args.random, args.seed) if args.random else grid(space, base))
+    if not sets:
+        raise SystemExit("no valid parameter sets (fast lengths must be below slow lengths)")
+    # workers memory-map .npy inputs themselves; anything else is shipped once per worker
+    source = args.data if args.data.endswith(".npy") else data
+    t0 = time.perf_counter()
+    results = sweep(source, sets, args.workers)
+    dt = time.perf_counter() - t0
+    print(f"Evaluated {len(results)} sets in {dt:.2f}s ({len(results) * len(data['close']) / dt:,.0f} bars/s)")
+    print_results(results, args.sort, list(space))
+    if args.out:
+        write_results(args.out, results)
+
+if __name__ == "__main__":
+    main()
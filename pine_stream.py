@@ -0,0 +1,397 @@
+# pine_stream.py
+# Live counterpart of pine_signals.py: advanced_trading_signals_v6 evaluated
+# one bar at a time. Every indicator keeps only the state its next value
+# needs (running SMA ring buffers, EMA/RMA accumulators, the SAR trend
+# state, a few previous values), so a new candle costs O(1) per symbol no
+# matter how much history came before. Per-symbol state lives in __slots__
+# objects (a few hundred bytes each plus the SMA rings), so one process can
+# follow thousands of symbols from a single asyncio feed.
+# Usage:
+#   some_feed | python pine_stream.py                 # JSON lines in, events out
+#   python pine_stream.py --warmup BTC=btc.npy --warmup ETH=eth.csv < live.jsonl
+#   python pine_stream.py --replay bars.csv           # CSV with a symbol column
+#   python pine_stream.py --bench [--symbols 5000 --bars 200]
+# Input lines: {"symbol": "BTC", "open": .., "high": .., "low": .., "close": .., "volume": ..}
+# Output lines: {"symbol": .., "bar": n, "event": "buy"|"sell", "close": .., "sl": .., "tp": ..}
+#               {"symbol": .., "bar": n, "event": "exit", "reason": "tp"|"sl", "close": ..}
+# Bars must be closed candles (the script only fires on barstate.isconfirmed).
+import sys, csv, json, math, time, asyncio, argparse
+from array import array
+from collections import deque
+from pine_signals import DEFAULTS, load_ohlcv, synthetic, signals, parse_value
+
+NAN = float("nan")
+
+# ----- indicators (one value in, one value out) -----
+class Sma:
+    __slots__ = ("length", "ring", "i", "count", "total")
+
+    def __init__(self, length):
+        self.length = length
+        self.ring = array("d", bytes(8 * length))
+        self.i = self.count = 0
+        self.total = 0.0
+
+    def update(self, x):
+        self.total += x - self.ring[self.i]
+        self.ring[self.i] = x
+        self.i = (self.i + 1) % self.length
+        if self.count < self.length:
+            self.count += 1
+            if self.count < self.length:
+                return NAN
+        return self.total / self.length
+
+class Smooth:
+    # ta.ema (alpha = 2 / (n + 1)) and ta.rma (alpha = 1 / n): na until n
+    # values have been seen, then seeded with their SMA
+    __slots__ = ("length", "alpha", "count", "value")
+
+    def __init__(self, length, alpha):
+        self.length, self.alpha = length, alpha
+        self.count = 0
+        self.value = 0.0
+
+    def update(self, x):
+        if x != x:  # na in, na out (leading MACD / RSI bars)
+            return self.value if self.count >= self.length else NAN
+        if self.count < self.length:
+            self.count += 1
+            self.value += x
+            if self.count < self.length:
+                return NAN
+            self.value /= self.length
+            return self.value
+        self.value = self.alpha * x + (1.0 - self.alpha) * self.value
+        return self.value
+
+def Ema(length):
+    return Smooth(length, 2.0 / (length + 1))
+
+def Rma(length):
+    return Smooth(length, 1.0 / length)
+
+class Rsi:
+    __slots__ = ("prev", "up", "down")
+
+    def __init__(self, length):
+        self.prev = NAN
+        self.up, self.down = Rma(length), Rma(length)
+
+    def update(self, x):
+        ch = x - self.prev
+        self.prev = x
+        u = self.up.update(max(ch, 0.0) if ch == ch else NAN)
+        d = self.down.update(max(-ch, 0.0) if ch == ch else NAN)
+        if d == 0:
+            return 100.0
+        if u == 0:
+            return 0.0
+        return 100 - 100 / (1 + u / d)
+
+class Macd:
+    __slots__ = ("fast", "slow", "signal")
+
+    def __init__(self, fast, slow, signal):
+        self.fast, self.slow, self.signal = Ema(fast), Ema(slow), Ema(signal)
+
+    def update(self, x):
+        line = self.fast.update(x) - self.slow.update(x)
+        sig = self.signal.update(line)
+        return line, sig, line - sig
+
+class Atr:
+    __slots__ = ("prev", "rma")
+
+    def __init__(self, length):
+        self.prev = NAN
+        self.rma = Rma(length)
+
+    def update(self, h, l, c):
+        pc = self.prev
+        self.prev = c
+        tr = h - l if pc != pc else max(h - l, abs(h - pc), abs(l - pc))
+        return self.rma.update(tr)
+
+class Sar:
+    # ta.sar state machine; same steps as pine_signals.sar()
+    __slots__ = ("start", "inc", "maximum", "bar", "below", "mm", "res", "acc", "h1", "h2", "l1", "l2", "c1")
+
+    def __init__(self, start, inc, maximum):
+        self.start, self.inc, self.maximum = start, inc, maximum
+        self.bar = 0
+        self.below = False
+        self.mm = self.res = self.acc = NAN
+        self.h1 = self.h2 = self.l1 = self.l2 = self.c1 = NAN
+
+    def update(self, h, l, c):
+        i = self.bar
+        self.bar += 1
+        out = NAN
+        if i >= 1:
+            first = i == 1
+            if first:
+                self.below = c > self.c1
+                self.mm, self.res = (h, self.l1) if self.below else (l, self.h1)
+                self.acc = self.start
+            res = self.res + self.acc * (self.mm - self.res)
+            if self.below:
+                if res > l:
+                    first, self.below = True, False
+                    res, self.mm, self.acc = max(h, self.mm), l, self.start
+            elif res < h:
+                first, self.below = True, True
+                res, self.mm, self.acc = min(l, self.mm), h, self.start
+            if not first:
+                if self.below:
+                    if h > self.mm:
+                        self.mm, self.acc = h, min(self.acc + self.inc, self.maximum)
+                elif l < self.mm:
+                    self.mm, self.acc = l, min(self.acc + self.inc, self.maximum)
+            if self.below:
+                res = min(res, self.l1, self.l2) if i > 1 else min(res, self.l1)
+            else:
+                res = max(res, self.h1, self.h2) if i > 1 else max(res, self.h1)
+            self.res = out = res
+        self.h2, self.h1, self.l2, self.l1, self.c1 = self.h1, h, self.l1, l, c
+        return out
+
+# ----- per-symbol strategy state -----
+class SymbolState:
+    __slots__ = ("p", "bar", "ema_fast", "ema_slow", "sma_trend", "rsi", "macd", "sar", "atr", "volume_ma",
+                 "closes", "prev_fast", "prev_slow", "prev_line", "prev_sig", "prev_hist",
+                 "since_signal", "since_buy", "since_sell", "side", "entry", "sl", "tp", "volume_spike")
+
+    def __init__(self, p):
+        self.p = p  # shared parameter dict, not copied per symbol
+        self.bar = -1
+        self.ema_fast, self.ema_slow = Ema(p["fast_ema_len"]), Ema(p["slow_ema_len"])
+        self.sma_trend = Sma(p["trend_sma_len"])
+        self.rsi = Rsi(p["rsi_length"])
+        self.macd = Macd(p["macd_fast"], p["macd_slow"], p["macd_signal"])
+        self.sar = Sar(p["sar_start"], p["sar_increment"], p["sar_maximum"]) if p["use_sar_filter"] else None
+        self.atr = Atr(p["atr_length"])
+        self.volume_ma = Sma(p["volume_ma_len"])
+        self.closes = deque([NAN] * 5, maxlen=5)  # close[5] .. close[1]
+        self.prev_fast = self.prev_slow = self.prev_line = self.prev_sig = self.prev_hist = NAN
+        self.since_signal = self.since_buy = self.since_sell = 999
+        self.side = 0
+        self.entry = self.sl = self.tp = NAN
+        self.volume_spike = False
+
+    def update(self, o, h, l, c, v):
+        # returns a list of events for this bar (usually empty)
+        p = self.p
+        self.bar += 1
+        ef, es = self.ema_fast.update(c), self.ema_slow.update(c)
+        st = self.sma_trend.update(c)
+        r = self.rsi.update(c)
+        line, sig, hist = self.macd.update(c)
+        a = self.atr.update(h, l, c)
+        s = self.sar.update(h, l, c) if self.sar else NAN
+        vma = self.volume_ma.update(v)
+        self.volume_spike = v > vma * p["volume_threshold"]  # shown in alerts only; not a v6 gate
+        c5 = self.closes[0]
+
+        self.since_signal += 1
+        self.since_buy += 1
+        self.since_sell += 1
+
+        trend_ok = (abs((c - st) / st) * 100 if st == st and st != 0 else 0.0) >= p["min_trend_strength"]
+        risk = c - (c - a * p["sl_multiplier"])
+        buy_rr = ((c + a * p["tp_multiplier"]) - c) / risk if risk > 0 else 0.0
+        s_risk = (c + a * p["sl_multiplier"]) - c
+        sell_rr = (c - (c - a * p["tp_multiplier"])) / s_risk if s_risk > 0 else 0.0
+        gates_ok = self.since_signal >= p["signal_cooldown"]
+
+        buy = (gates_ok and self.since_sell >= p["min_bars_between_flip"]
+               and ef > es and self.prev_fast <= self.prev_slow
+               and ((line > sig and hist > self.prev_hist)
+                    or (line > sig and self.prev_line <= self.prev_sig and hist > 0))
+               and 35 < r < 70 and c > c5 and c > o and c > st
+               and r < p["rsi_overbought"] and buy_rr >= p["min_risk_reward"] and trend_ok
+               and (self.sar is None or c > s))
+        sell = (not buy and gates_ok and self.since_buy >= p["min_bars_between_flip"]
+                and ef < es and self.prev_fast >= self.prev_slow
+                and ((line < sig and hist < self.prev_hist)
+                     or (line < sig and self.prev_line >= self.prev_sig and hist < 0))
+                and 30 < r < 65 and c < c5 and c < o and c < st
+                and r > p["rsi_oversold"] and sell_rr >= p["min_risk_reward"] and trend_ok
+                and (self.sar is None or c < s))
+
+        self.closes.append(c)
+        self.prev_fast, self.prev_slow = ef, es
+        self.prev_line, self.prev_sig, self.prev_hist = line, sig, hist
+
+        events = []
+        if buy or sell:
+            d = 1 if buy else -1
+            self.since_signal = 0
+            if buy:
+                self.since_buy = 0
+            else:
+                self.since_sell = 0
+            self.side, self.entry = d, c
+            self.sl = c - d * a * p["sl_multiplier"]
+            self.tp = c + d * a * p["tp_multiplier"]
+            events.append({"bar": self.bar, "event": "buy" if buy else "sell", "close": c,
+                           "sl": self.sl, "tp": self.tp})
+        # auto-clear on close, after the signal update like the script
+        if self.side:
+            d = self.side
+            if d * (c - self.tp) >= 0 or d * (c - self.sl) <= 0:
+                events.append({"bar": self.bar, "event": "exit", "close": c,
+                               "reason": "tp" if d * (c - self.tp) >= 0 else "sl"})
+                self.side = 0
+                self.entry = self.sl = self.tp = NAN
+        return events
+
+class StreamEvaluator:
+    def __init__(self, params=None):
+        self.params = dict(DEFAULTS, **(params or {}))
+        self.symbols = {}
+        self.bars = 0
+
+    def state(self, symbol):
+        st = self.symbols.get(symbol)
+        if st is None:
+            st = self.symbols[symbol] = SymbolState(self.params)
+        return st
+
+    def on_bar(self, symbol, o, h, l, c, v=0.0):
+        self.bars += 1
+        events = self.state(symbol).update(o, h, l, c, v)
+        for e in events:
+            e["symbol"] = symbol
+        return events
+
+    def warmup(self, symbol, data):
+        # replay history (pine_signals.load_ohlcv dict); events are discarded
+        st = self.state(symbol)
+        cols = [data[k].tolist() for k in ("open", "high", "low", "close", "volume")]
+        for bar in zip(*cols):
+            st.update(*bar)
+
+    async def run(self, feed, emit):
+        # feed: async iterator of bar dicts; emit: callback for each event
+        # a malformed bar is skipped, not fatal: the rest of the feed keeps going
+        async for bar in feed:
+            try:
+                symbol = bar["symbol"]
+                ohlcv = (float(bar["open"]), float(bar["high"]), float(bar["low"]),
+                         float(bar["close"]), float(bar.get("volume") or 0))
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                print(f"[skip] bad bar {str(bar)[:80]!r}: {e!r}", file=sys.stderr)
+                continue
+            if not all(map(math.isfinite, ohlcv)):
+                # one NaN/inf would stay in the Sma running totals for good
+                print(f"[skip] non-finite bar for {symbol}: {ohlcv}", file=sys.stderr)
+                continue
+            for e in self.on_bar(symbol, *ohlcv):
+                emit(e)
+
+# ----- feeds -----
+async def stdin_lines():
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=1 << 20)
+    try:
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    except ValueError:  # redirected from a regular file: nothing to wait on
+        for i, line in enumerate(sys.stdin):
+            yield line
+            if i % 1000 == 999:
+                await asyncio.sleep(0)
+        return
+    async for line in reader:
+        yield line.decode("utf-8", "replace")
+
+async def stdin_feed():
+    async for line in stdin_lines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            print(f"[skip] bad input line: {line[:80]!r}", file=sys.stderr)
+
+async def csv_feed(path):
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        for i, row in enumerate(csv.DictReader(f)):
+            yield {k.strip().lower(): v for k, v in row.items()}
+            if i % 1000 == 999:
+                await asyncio.sleep(0)  # let other tasks run during long replays
+
+def emit_json(e):
+    print(json.dumps(e), flush=True)
+
+# ----- benchmark -----
+def bench(args):
+    # 1) streaming must reproduce the vectorized engine's signals on one long series
+    data = synthetic(50_000, seed=7)
+    ev = StreamEvaluator()
+    cols = [data[k].tolist() for k in ("open", "high", "low", "close", "volume")]
+    streamed = [(e["bar"], 1 if e["event"] == "buy" else -1)
+                for bar in zip(*cols) for e in ev.on_bar("X", *bar) if e["event"] != "exit"]
+    batch, _ = signals(data, dict(DEFAULTS))
+    assert streamed == batch, f"stream/batch mismatch: {len(streamed)} vs {len(batch)} signals"
+    print(f"Stream matches batch engine: {len(batch)} signals over 50000 bars")
+
+    # 2) many symbols, interleaved like a live feed
+    n, bars = args.symbols, args.bars
+    series = synthetic(n * bars, seed=11)
+    ev = StreamEvaluator()
+    cols = [series[k].reshape(n, bars) for k in ("open", "high", "low", "close", "volume")]
+    names = [f"SYM{i}" for i in range(n)]
+    ticks = [[(names[s], *(float(col[s, b]) for col in cols)) for s in range(n)] for b in range(bars)]
+
+    async def feed():
+        for step in ticks:
+            for t in step:
+                yield t
+
+    async def run():
+        events = 0
+        async for t in feed():
+            events += len(ev.on_bar(*t))
+        return events
+
+    t0 = time.perf_counter()
+    events = asyncio.run(run())
+    dt = time.perf_counter() - t0
+    print(f"{n} symbols x {bars} bars: {n * bars / dt:,.0f} bar updates/s "
+          f"({dt / (n * bars) * 1e6:.1f} µs per bar, {events} events)")
+
+def main():
+    p = argparse.ArgumentParser(description="Streaming advanced_trading_signals_v6 evaluator")
+    p.add_argument("--set", action="append", default=[], metavar="NAME=VALUE", help="override a Pine input")
+    p.add_argument("--warmup", action="append", default=[], metavar="SYMBOL=FILE",
+                   help="replay history (.csv/.npy OHLCV) before the live feed")
+    p.add_argument("--replay", metavar="CSV", help="read bars from a CSV with a symbol column instead of stdin")
+    p.add_argument("--bench", action="store_true")
+    p.add_argument("--symbols", type=int, default=5000)
+    p.add_argument("--bars", type=int, default=200)
+    args = p.parse_args()
+    if args.bench:
+        return bench(args)
+
+    params = {}
+    for s in args.set:
+        name, _, v = s.partition("=")
+        if name not in DEFAULTS:
+            raise SystemExit(f"unknown parameter {name!r}")
+        params[name] = parse_value(name, v)
+    ev = StreamEvaluator(params)
+    for w in args.warmup:
+        symbol, _, path = w.partition("=")
+        ev.warmup(symbol, load_ohlcv(path))
+        print(f"[warmup] {symbol}: {ev.symbols[symbol].bar + 1} bars", file=sys.stderr)
+    feed = csv_feed(args.replay) if args.replay else stdin_feed()
+    try:
+        asyncio.run(ev.run(feed, emit_json))
+    except KeyboardInterrupt:
+        pass
+    print(f"{ev.bars} bars, {len(ev.symbols)} symbols", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
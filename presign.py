@@ -0,0 +1,189 @@
+# presign.py
+# Pre-sign a whole payout CSV across CPU cores, broadcast it later.
+# Usage:
+#   python presign.py payouts.csv signed.jsonl [--workers 8] [--nonce 123]
+#   python presign.py --broadcast signed.jsonl
+#   python presign.py --bench [--count 20000]       # signs/sec for 1..cpu_count workers
+# Nonces are assigned up front from the sender's pending count (or --nonce), so
+# do not run send_veronica_batch.py for the same account until the file is out.
+# Fees are fixed at signing time with FEE_HEADROOM over the current base fee.
+# Output: one JSON object per tx, in nonce order:
+#   {"row": 0, "chunk": 0, "to": "0x..", "amount": "12.5", "nonce": 7, "hash": "0x..", "raw": "0x.."}
+import os, csv, json, time, argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from web3 import Web3
+from eth_account import Account
+from fee_oracle import FeeOracle
+from rpc_pool import RpcPool, urls_from_env
+from send_veronica_batch import TOKEN_ADDR, load_env_and_web3, get_decimals, prepare_row, ERC20_ABI
+from erc20_fast import transfer_data, transfer_tx
+
+# ----- Config -----
+SIGN_CHUNK = 256         # txs per task sent to a worker process (amortizes pickling)
+FEE_HEADROOM = 2         # maxFeePerGas = FEE_HEADROOM * base + tip; signed txs can't be re-priced later
+BROADCAST_BATCH = 50     # raw txs per JSON-RPC batch in --broadcast
+# -------------------
+
+# ----- worker processes -----
+_acct = None
+
+def _init_worker(key):
+    global _acct
+    _acct = Account.from_key(key)
+
+def sign_chunk(txs):
+    out = []
+    for tx in txs:
+        signed = _acct.sign_transaction(tx)
+        raw = getattr(signed, "rawTransaction", None) or getattr(signed, "raw_transaction")
+        out.append((Web3.to_hex(signed.hash), Web3.to_hex(raw)))
+    return out
+
+def sign_all(key, items, workers):
+    # items: iterable of (meta, tx). Yields (meta, hash, raw) in input order with
+    # at most 2 * workers chunks in flight, so memory stays flat for any file size.
+    def chunks():
+        buf = []
+        for item in items:
+            buf.append(item)
+            if len(buf) == SIGN_CHUNK:
+                yield buf
+                buf = []
+        if buf:
+            yield buf
+
+    if workers <= 0:  # in-process, for comparison
+        _init_worker(key)
+        for chunk in chunks():
+            for (meta, _), (h, raw) in zip(chunk, sign_chunk([tx for _, tx in chunk])):
+                yield meta, h, raw
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(key,)) as ex:
+        inflight = deque()
+        for chunk in chunks():
+            inflight.append((chunk, ex.submit(sign_chunk, [tx for _, tx in chunk])))
+            while len(inflight) >= 2 * workers:
+                done, fut = inflight.popleft()
+                for (meta, _), (h, raw) in zip(done, fut.result()):
+                    yield meta, h, raw
+        while inflight:
+            done, fut = inflight.popleft()
+            for (meta, _), (h, raw) in zip(done, fut.result()):
+                yield meta, h, raw
+
+# ----- build -----
+def build_txs(w3, acct, token, rows, decimals, oracle, nonce, chain_id):
+    fees = oracle.fees()
+    base = fees["maxFeePerGas"] - 2 * fees["maxPriorityFeePerGas"]
+    max_fee = FEE_HEADROOM * base + fees["maxPriorityFeePerGas"]
+    for idx, row in enumerate(rows):
+        if (row.get("status", "").lower() in {"confirmed", "sent"}) and row.get("tx_hashes"):
+            continue
+        out, to, chunks = prepare_row(row, w3, None, lambda: None)
+        if to is None:
+            print(f"[skip] row {idx}: {out.get('error') or out.get('status')}")
+            continue
+        for i, c in enumerate(chunks):
+            value = int(c * (10 ** decimals))
+            tx = transfer_tx(chain_id, acct.address, token.address, to, value, nonce,
+                             max_fee, fees["maxPriorityFeePerGas"])
+            tx["gas"] = oracle.gas_for(tx, token.address, "transfer", to)
+            del tx["from"]
+            yield {"row": idx, "chunk": i, "to": to, "amount": str(c), "nonce": nonce}, tx
+            nonce += 1
+
+def presign(args):
+    w3, accts, pool = load_env_and_web3()
+    acct = accts[0]
+    key = (os.getenv("PRIVATE_KEYS") or os.getenv("PRIVATE_KEY")).split(",")[0].strip()
+    token = w3.eth.contract(Web3.to_checksum_address(TOKEN_ADDR), abi=ERC20_ABI)
+    decimals = get_decimals(token)
+    oracle = FeeOracle(w3, background=False)
+    nonce = args.nonce if args.nonce is not None else w3.eth.get_transaction_count(acct.address, "pending")
+    chain_id = int(os.getenv("CHAIN_ID", "8453"))
+    print(f"From: {acct.address} | first nonce {nonce} | {args.workers} workers")
+
+    t0 = time.perf_counter()
+    n = 0
+    with open(args.input, "r", newline="", encoding="utf-8-sig") as f_in, \
+         open(args.output, "w", encoding="utf-8") as f_out:
+        items = build_txs(w3, acct, token, csv.DictReader(f_in), decimals, oracle, nonce, chain_id)
+        for meta, h, raw in sign_all(key, items, args.workers):
+            f_out.write(json.dumps(dict(meta, hash=h, raw=raw)) + "\n")
+            n += 1
+    dt = time.perf_counter() - t0
+    print(f"Signed {n} txs in {dt:.2f}s ({n / dt if dt else 0:.0f}/s) -> {args.output}")
+    print(oracle.stats())
+
+# ----- broadcast -----
+def broadcast(args):
+    pool = RpcPool(urls_from_env("https://base-mainnet.g.alchemy.com/v2/YOUR_KEY"))
+    ok = failed = 0
+
+    def flush(batch):
+        nonlocal ok, failed
+        payload = [{"jsonrpc": "2.0", "id": i, "method": "eth_sendRawTransaction", "params": [r["raw"]]}
+                   for i, r in enumerate(batch)]
+        resp = pool.send_raw(payload)
+        by_id = {item.get("id"): item for item in resp} if isinstance(resp, list) else {}
+        for i, r in enumerate(batch):
+            item = by_id.get(i) or {"error": resp}
+            if "error" in item:
+                failed += 1
+                print(f"[err] nonce {r['nonce']} row {r['row']}: {item['error']}")
+            else:
+                ok += 1
+                print(f"→ {r['to']} | {r['amount']} | {r['hash']}")
+
+    with open(args.broadcast, "r", encoding="utf-8") as f:
+        batch = []
+        for line in f:
+            batch.append(json.loads(line))
+            if len(batch) == BROADCAST_BATCH:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    print(f"Broadcast {ok} txs, {failed} rejected")
+    print(pool.stats())
+
+# ----- benchmark -----
+def bench(args):
+    acct = Account.create()
+    tx0 = {"chainId": 8453, "to": Web3.to_checksum_address(TOKEN_ADDR), "value": 0, "type": 2,
+           "gas": 80000, "maxFeePerGas": 10**9, "maxPriorityFeePerGas": 10**8}
+    items = lambda: (({"nonce": i}, dict(tx0, nonce=i, data=transfer_data(acct.address, i)))
+                     for i in range(args.count))
+    cores = os.cpu_count() or 1
+    counts = [0] + sorted({1, 2, 4, 8, 16, 32, cores} & set(range(1, cores + 1)))
+    print(f"Signing {args.count} ERC-20 transfers, {cores} CPUs")
+    base = None
+    for w in counts:
+        t0 = time.perf_counter()
+        n = sum(1 for _ in sign_all(acct.key, items(), w))
+        rate = n / (time.perf_counter() - t0)
+        base = base or rate
+        label = "in-process" if w == 0 else f"{w} workers"
+        print(f"  {label:>12}: {rate:8.0f} signs/s  (x{rate / base:.2f})")
+
+def main():
+    p = argparse.ArgumentParser(description="Pre-sign payouts across processes / broadcast a signed file")
+    p.add_argument("input", nargs="?", default="payouts.csv")
+    p.add_argument("output", nargs="?", default="signed.jsonl")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="signing processes (0 = in-process)")
+    p.add_argument("--nonce", type=int, help="first nonce (default: sender's pending count)")
+    p.add_argument("--broadcast", metavar="SIGNED_JSONL", help="send a pre-signed file instead of signing")
+    p.add_argument("--bench", action="store_true", help="measure signs/sec against worker count")
+    p.add_argument("--count", type=int, default=20000, help="txs to sign in --bench")
+    args = p.parse_args()
+    if args.bench:
+        bench(args)
+    elif args.broadcast:
+        broadcast(args)
+    else:
+        presign(args)
+
+if __name__ == "__main__":
+    main()
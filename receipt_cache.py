@@ -0,0 +1,93 @@
+# receipt_cache.py
+# Shared on-disk cache for mined receipts, transactions and block headers.
+# A receipt never changes once it is buried deep enough, so anything past
+# CONFIRMATIONS blocks is stored in SQLite and served from disk on reruns.
+import os, json, sqlite3
+from web3 import Web3
+from web3.datastructures import AttributeDict
+
+# ----- Config -----
+DEFAULT_PATH  = os.getenv("RECEIPT_CACHE", "receipt_cache.sqlite3")
+CONFIRMATIONS = int(os.getenv("CACHE_CONFIRMATIONS", "12"))  # only cache results this deep
+# -------------------
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS receipts (hash TEXT PRIMARY KEY, block INTEGER, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS txs      (hash TEXT PRIMARY KEY, block INTEGER, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS blocks   (number INTEGER PRIMARY KEY, hash TEXT, data TEXT NOT NULL);
+"""
+
+def _key(h):
+    if isinstance(h, (bytes, bytearray)):
+        h = "0x" + bytes(h).hex()
+    h = h.lower()
+    return h if h.startswith("0x") else "0x" + h
+
+def _dump(obj):
+    # Web3.to_json knows how to serialize AttributeDict/HexBytes
+    return Web3.to_json(obj)
+
+def _load(data):
+    return AttributeDict.recursive(json.loads(data))
+
+class ReceiptCache:
+    def __init__(self, path=DEFAULT_PATH, confirmations=CONFIRMATIONS):
+        self.path = path
+        self.confirmations = confirmations
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self.db.close()
+
+    def is_final(self, block_number, head):
+        if block_number is None or head is None:
+            return False
+        return head - int(block_number) >= self.confirmations
+
+    def _get(self, sql, key):
+        row = self.db.execute(sql, (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return _load(row[0])
+
+    def get_receipt(self, h):
+        return self._get("SELECT data FROM receipts WHERE hash = ?", _key(h))
+
+    def get_tx(self, h):
+        return self._get("SELECT data FROM txs WHERE hash = ?", _key(h))
+
+    def get_block(self, number):
+        return self._get("SELECT data FROM blocks WHERE number = ?", int(number))
+
+    # put_* return True if the item was deep enough to be stored
+    def put_receipt(self, h, rcpt, head):
+        if not self.is_final(rcpt.get("blockNumber"), head):
+            return False
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO receipts VALUES (?, ?, ?)",
+                            (_key(h), int(rcpt["blockNumber"]), _dump(rcpt)))
+        return True
+
+    def put_tx(self, h, tx, head):
+        if not self.is_final(tx.get("blockNumber"), head):
+            return False
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO txs VALUES (?, ?, ?)",
+                            (_key(h), int(tx["blockNumber"]), _dump(tx)))
+        return True
+
+    def put_block(self, block, head):
+        if not self.is_final(block.get("number"), head):
+            return False
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO blocks VALUES (?, ?, ?)",
+                            (int(block["number"]), _key(block["hash"]), _dump(block)))
+        return True
+
+    def stats(self):
+        return f"cache {self.path}: {self.hits} hits, {self.misses} misses"
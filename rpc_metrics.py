@@ -0,0 +1,280 @@
+# rpc_metrics.py
+# Process-wide counters and latency histograms for outgoing RPC / HTTP calls.
+# rpc_pool.RpcPool records every JSON-RPC post here (per method; batches as
+# "<method>[batch]"), instrument_provider() covers other web3 providers
+# (sync or async) and instrument_session() a requests.Session (venice.py).
+# Per (component, method): calls, errors, retries, hedges, bytes out/in and a
+# fixed-bucket latency histogram.
+# Output:
+#   summary table on stderr at exit        (METRICS_SUMMARY=0 to silence)
+#   METRICS_JSON=path   JSON snapshot, rewritten every METRICS_INTERVAL s and at exit
+#   METRICS_PORT=9464   Prometheus text on http://METRICS_HOST:PORT/metrics (JSON on /metrics.json)
+#   METRICS_HOST        bind address for that endpoint (default 127.0.0.1; 0.0.0.0 to expose it)
+import os, sys, json, time, atexit, bisect, asyncio, threading
+from urllib.parse import urlsplit
+
+# ----- Config -----
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # seconds; +Inf implied
+SUMMARY_AT_EXIT = os.getenv("METRICS_SUMMARY", "1") != "0"
+JSON_PATH = os.getenv("METRICS_JSON", "")
+PROM_PORT = int(os.getenv("METRICS_PORT", "0") or 0)
+PROM_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+INTERVAL = float(os.getenv("METRICS_INTERVAL", "10"))
+# -------------------
+
+class Series:
+    __slots__ = ("calls", "errors", "retries", "hedges", "bytes_out", "bytes_in", "seconds", "max", "buckets")
+
+    def __init__(self):
+        self.calls = self.errors = self.retries = self.hedges = self.bytes_out = self.bytes_in = 0
+        self.seconds = self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def quantile(self, q):
+        # upper bound of the bucket holding the q-th call (histograms can't do better)
+        rank, seen = q * self.calls, 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return 0.0
+
+    def snapshot(self):
+        return {"calls": self.calls, "errors": self.errors, "retries": self.retries, "hedges": self.hedges,
+                "bytes_out": self.bytes_out, "bytes_in": self.bytes_in, "seconds": round(self.seconds, 6),
+                "max_s": round(self.max, 6), "p50_s": self.quantile(0.5), "p95_s": self.quantile(0.95),
+                "p99_s": self.quantile(0.99),
+                "buckets": {str(b): n for b, n in zip(BUCKETS + ("+Inf",), self.buckets)}}
+
+class Metrics:
+    def __init__(self):
+        self.series = {}   # (component, method) -> Series
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self._exporting = False
+
+    def _get(self, component, method):
+        key = (component, method)
+        s = self.series.get(key)
+        if s is None:
+            s = self.series[key] = Series()
+            if not self._exporting:
+                self._exporting = True
+                start_exporters(self)
+        return s
+
+    def observe(self, component, method, seconds, bytes_out=0, bytes_in=0, ok=True):
+        with self.lock:
+            s = self._get(component, method)
+            s.calls += 1
+            s.errors += not ok
+            s.bytes_out += bytes_out
+            s.bytes_in += bytes_in
+            s.seconds += seconds
+            s.max = max(s.max, seconds)
+            s.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def error(self, component, method):
+        # a call already observed as ok whose answer turned out to be an error (JSON-RPC "error")
+        with self.lock:
+            self._get(component, method).errors += 1
+
+    def retry(self, component, method, hedge=False):
+        with self.lock:
+            s = self._get(component, method)
+            if hedge:
+                s.hedges += 1
+            else:
+                s.retries += 1
+
+    def snapshot(self):
+        with self.lock:
+            series = {f"{c}:{m}": s.snapshot() for (c, m), s in sorted(self.series.items())}
+        return {"since": self.started, "uptime_s": round(time.time() - self.started, 3), "series": series}
+
+    def summary(self):
+        with self.lock:
+            items = sorted(self.series.items(), key=lambda kv: kv[1].seconds, reverse=True)
+            if not items:
+                return ""
+            w = max(len(c) + len(m) + 1 for c, m in self.series)
+            lines = [f"Call metrics ({time.time() - self.started:.1f}s):",
+                     f"  {'component:method':<{w}} {'calls':>7} {'err':>5} {'retry':>5} {'total':>9} "
+                     f"{'mean':>8} {'p50<=':>7} {'p95<=':>7} {'max':>8} {'out':>9} {'in':>9}"]
+            for (c, m), s in items:
+                lines.append(f"  {c + ':' + m:<{w}} {s.calls:>7} {s.errors:>5} {s.retries + s.hedges:>5} "
+                             f"{s.seconds:>8.2f}s {_ms(s.seconds / s.calls if s.calls else 0):>8} "
+                             f"{_ms(s.quantile(0.5)):>7} {_ms(s.quantile(0.95)):>7} {_ms(s.max):>8} "
+                             f"{_kb(s.bytes_out):>9} {_kb(s.bytes_in):>9}")
+        return "\n".join(lines)
+
+    def prometheus(self):
+        out = []
+        def family(name, kind, help_):
+            out.append(f"# HELP {name} {help_}")
+            out.append(f"# TYPE {name} {kind}")
+        with self.lock:
+            items = sorted(self.series.items())
+            for name, attr, help_ in (("rpc_calls_total", "calls", "Requests issued"),
+                                      ("rpc_errors_total", "errors", "Requests that failed or returned an error status"),
+                                      ("rpc_retries_total", "retries", "Retries and failovers"),
+                                      ("rpc_hedges_total", "hedges", "Hedged duplicate requests"),
+                                      ("rpc_request_bytes_total", "bytes_out", "Request body bytes"),
+                                      ("rpc_response_bytes_total", "bytes_in", "Response body bytes")):
+                family(name, "counter", help_)
+                for (c, m), s in items:
+                    out.append(f'{name}{{component="{c}",method="{_esc(m)}"}} {getattr(s, attr)}')
+            family("rpc_request_seconds", "histogram", "Request latency")
+            for (c, m), s in items:
+                lbl = f'component="{c}",method="{_esc(m)}"'
+                acc = 0
+                for b, n in zip(BUCKETS + ("+Inf",), s.buckets):
+                    acc += n
+                    out.append(f'rpc_request_seconds_bucket{{{lbl},le="{b}"}} {acc}')
+                out.append(f"rpc_request_seconds_sum{{{lbl}}} {s.seconds}")
+                out.append(f"rpc_request_seconds_count{{{lbl}}} {s.calls}")
+        return "\n".join(out) + "\n"
+
+    def write_json(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=1)
+        os.replace(tmp, path)
+
+def _ms(s):
+    return f"{s * 1000:.0f}ms" if s < 10 else f"{s:.1f}s"
+
+def _kb(n):
+    return f"{n / 1024:.1f}K" if n < 1 << 20 else f"{n / (1 << 20):.1f}M"
+
+def _esc(s):
+    return s.replace("\\", "\\\\").replace('"', '\\"')
+
+METRICS = Metrics()
+
+# ----- labels -----
+def batch_label(methods):
+    return "+".join(sorted(set(methods))) + "[batch]"
+
+def rpc_label(payload):
+    # JSON-RPC method name for a request dict, "<m1>+<m2>[batch]" for a batch
+    if isinstance(payload, dict):
+        return payload.get("method", "?")
+    if isinstance(payload, list) and payload:
+        return batch_label(p.get("method", "?") for p in payload if isinstance(p, dict))
+    return "?"
+
+# ----- hooks -----
+def instrument_provider(provider, component="rpc"):
+    # wraps provider.make_request (sync or async web3 provider) in place
+    inner = provider.make_request
+    if asyncio.iscoroutinefunction(inner):
+        async def make_request(method, params):
+            t0 = time.perf_counter()
+            ok = False
+            try:
+                resp = await inner(method, params)
+                ok = "error" not in resp
+                return resp
+            finally:
+                METRICS.observe(component, str(method), time.perf_counter() - t0, ok=ok)
+    else:
+        def make_request(method, params):
+            t0 = time.perf_counter()
+            ok = False
+            try:
+                resp = inner(method, params)
+                ok = "error" not in resp
+                return resp
+            finally:
+                METRICS.observe(component, str(method), time.perf_counter() - t0, ok=ok)
+    provider.make_request = make_request
+    return provider
+
+def instrument_session(session, component="http"):
+    # wraps session.request; method label is "POST /path". Streamed responses
+    # (stream=True) are recorded when closed, so latency and bytes_in cover the
+    # whole body, not just the headers.
+    inner = session.request
+
+    def request(method, url, *args, **kwargs):
+        label = f"{method.upper()} {urlsplit(url).path}"
+        t0 = time.perf_counter()
+        try:
+            resp = inner(method, url, *args, **kwargs)
+        except Exception:
+            METRICS.observe(component, label, time.perf_counter() - t0, ok=False)
+            raise
+        sent = len(resp.request.body or b"")
+        ok = resp.status_code < 400
+        if not kwargs.get("stream"):
+            METRICS.observe(component, label, time.perf_counter() - t0, sent, len(resp.content), ok=ok)
+            return resp
+        close, iter_content = resp.close, resp.iter_content
+        received = [0]   # chunked bodies have no length; count what the caller reads
+        recorded = []
+
+        def counting_iter_content(*a, **kw):
+            for chunk in iter_content(*a, **kw):
+                received[0] += len(chunk)
+                yield chunk
+
+        def close_and_record():
+            if not recorded:
+                recorded.append(True)
+                METRICS.observe(component, label, time.perf_counter() - t0, sent, received[0], ok=ok)
+            close()
+        resp.iter_content = counting_iter_content  # iter_lines() reads through this too
+        resp.close = close_and_record
+        return resp
+
+    session.request = request
+    return session
+
+# ----- exporters -----
+def start_exporters(m):
+    if SUMMARY_AT_EXIT:
+        atexit.register(lambda: print(m.summary(), file=sys.stderr) if m.series else None)
+    if JSON_PATH:
+        atexit.register(m.write_json, JSON_PATH)
+
+        def flush():
+            while True:
+                time.sleep(INTERVAL)
+                try:
+                    m.write_json(JSON_PATH)
+                except OSError as e:
+                    print(f"[warn] metrics write failed: {e!r}", file=sys.stderr)
+        threading.Thread(target=flush, daemon=True).start()
+    if PROM_PORT:
+        serve_prometheus(m, PROM_PORT, PROM_HOST)
+
+def serve_prometheus(m, port, host="127.0.0.1"):
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *a):
+            pass
+
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                data, ctype = json.dumps(m.snapshot()).encode(), "application/json"
+            elif self.path.startswith("/metrics"):
+                data, ctype = m.prometheus().encode(), "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        print(f"[warn] metrics endpoint on {host}:{port} unavailable: {e!r}", file=sys.stderr)
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics: http://{host}:{port}/metrics", file=sys.stderr)
+    return server
@@ -0,0 +1,241 @@
+# rpc_pool.py
+# Health-scored pool of JSON-RPC endpoints shared by the scripts.
+# - per-endpoint EWMA latency and error rate; calls go to the healthiest node
+# - reads are hedged: if the first node is slower than its own p95, the same
+#   request is fired at the next-best node and the first answer wins
+# - writes and pending-nonce reads stick to one node (the last one to accept a
+#   write), so a lagging mempool elsewhere can't hand out a stale nonce
+# - one keep-alive requests.Session per endpoint
+# Use it as a web3 provider: Web3(RpcPool(urls)), or post raw JSON-RPC
+# bodies (e.g. batches) with pool.post(payload).
+# Every request is recorded per method in rpc_metrics (latency histogram,
+# bytes, errors, failovers, hedges).
+import os, json, time, threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+from web3.providers.base import JSONBaseProvider
+from rpc_metrics import METRICS, rpc_label
+
+# ----- Config -----
+TIMEOUT = 20             # per-request HTTP timeout (seconds)
+EWMA_ALPHA = 0.2         # weight of the newest sample
+ERROR_PENALTY = 5.0      # score = latency * (1 + ERROR_PENALTY * error_rate)
+HEDGE_MIN_DELAY = 0.25   # never hedge sooner than this (seconds)
+HEDGE_DEFAULT = 1.0      # hedge delay until an endpoint has P95_MIN_SAMPLES
+P95_MIN_SAMPLES = 20
+POOL_CONNECTIONS = 16    # keep-alive connections per endpoint
+# Never hedged (still failed over to the next node if one is down)
+WRITE_METHODS = {"eth_sendRawTransaction", "eth_sendTransaction"}
+# After a failover these answers mean the first node took the tx before it failed
+ALREADY_SENT = ("already known", "known transaction", "already imported", "nonce too low")
+# -------------------
+
+class EndpointError(Exception):
+    pass
+
+class Endpoint:
+    def __init__(self, url):
+        self.url = url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_CONNECTIONS)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.latency = None     # EWMA seconds
+        self.error_rate = 0.0   # EWMA of 0/1 failures
+        self.samples = deque(maxlen=200)
+        self.calls = 0
+        self.errors = 0
+        self.hedges_won = 0
+        self.lock = threading.Lock()
+
+    def score(self):
+        lat = self.latency if self.latency is not None else HEDGE_DEFAULT / 2
+        return lat * (1 + ERROR_PENALTY * self.error_rate)
+
+    def p95(self):
+        with self.lock:
+            if len(self.samples) < P95_MIN_SAMPLES:
+                return HEDGE_DEFAULT
+            s = sorted(self.samples)
+        return max(HEDGE_MIN_DELAY, s[int(0.95 * (len(s) - 1))])
+
+    def observe(self, seconds, ok):
+        with self.lock:
+            self.calls += 1
+            if ok:
+                self.samples.append(seconds)
+                self.latency = seconds if self.latency is None else \
+                    EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * self.latency
+            else:
+                self.errors += 1
+            self.error_rate = EWMA_ALPHA * (0.0 if ok else 1.0) + (1 - EWMA_ALPHA) * self.error_rate
+
+    def post(self, body: bytes, label="?"):
+        t0 = time.perf_counter()
+        try:
+            resp = self.session.post(self.url, data=body, timeout=TIMEOUT,
+                                     headers={"Content-Type": "application/json"})
+        except requests.RequestException as e:
+            self.observe(time.perf_counter() - t0, False)
+            METRICS.observe("rpc", label, time.perf_counter() - t0, len(body), 0, ok=False)
+            raise EndpointError(f"{self.url}: {e!r}") from e
+        # rate limits and server errors count against the node; anything else
+        # (including JSON-RPC errors like "execution reverted") is an answer
+        ok = resp.status_code != 429 and resp.status_code < 500
+        dt = time.perf_counter() - t0
+        self.observe(dt, ok)
+        METRICS.observe("rpc", label, dt, len(body), len(resp.content), ok=ok)
+        if not ok:
+            raise EndpointError(f"{self.url}: HTTP {resp.status_code}")
+        return resp
+
+class RpcPool(JSONBaseProvider):
+    def __init__(self, urls, hedge=True):
+        super().__init__()
+        urls = [u for u in dict.fromkeys(urls) if u]
+        if not urls:
+            raise ValueError("RpcPool needs at least one endpoint URL")
+        self.endpoints = [Endpoint(u) for u in urls]
+        self.hedge = hedge and len(self.endpoints) > 1
+        self.primary = self.endpoints[0]  # writes and "pending" nonce reads go here first
+        self.executor = ThreadPoolExecutor(max_workers=4 * len(self.endpoints))
+
+    def __str__(self):
+        return f"RpcPool({', '.join(e.url for e in self.endpoints)})"
+
+    def ranked(self):
+        return sorted(self.endpoints, key=lambda e: e.score())
+
+    def post(self, payload, hedge=True, label=None):
+        # payload: JSON-serializable dict/list or pre-encoded bytes; returns the requests.Response
+        label = label or rpc_label(payload)
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        order = self.ranked()
+        last_err = None
+        i = 0
+        while i < len(order):
+            first = order[i]
+            if not (hedge and self.hedge) or i + 1 >= len(order):
+                try:
+                    return first.post(body, label)
+                except EndpointError as e:
+                    last_err = e
+                    i += 1
+                    if i < len(order):
+                        METRICS.retry("rpc", label)  # failover to the next node
+                    continue
+            # hedged read: give the best node until its p95, then race the next one
+            second = order[i + 1]
+            futs = {self.executor.submit(first.post, body, label): first}
+            hedge_at = time.monotonic() + first.p95()
+            hedged = False
+            while futs:
+                timeout = None if hedged else max(0.0, hedge_at - time.monotonic())
+                done, _ = wait(futs, timeout=timeout, return_when=FIRST_COMPLETED)
+                for f in done:
+                    ep = futs.pop(f)
+                    try:
+                        resp = f.result()
+                    except EndpointError as e:
+                        last_err = e
+                        continue
+                    if ep is second:
+                        second.hedges_won += 1
+                    return resp
+                # first node too slow (or already failed): bring in the second
+                if not hedged and (not done or not futs):
+                    futs[self.executor.submit(second.post, body, label)] = second
+                    METRICS.retry("rpc", label, hedge=bool(not done))  # slow first node: hedge; failed: failover
+                    hedged = True
+            i += 2
+            if i < len(order):
+                METRICS.retry("rpc", label)
+        raise last_err or EndpointError("no endpoints")
+
+    def pinned(self, body, label):
+        # primary first, the rest by health; only fails over when a node is down.
+        # Returns (response, endpoint that answered, failed over?)
+        order = [self.primary] + [e for e in self.ranked() if e is not self.primary]
+        last_err = None
+        for i, ep in enumerate(order):
+            try:
+                return ep.post(body, label), ep, i > 0
+            except EndpointError as e:
+                last_err = e
+                if i + 1 < len(order):
+                    METRICS.retry("rpc", label)
+        raise last_err or EndpointError("no endpoints")
+
+    def send_raw(self, payload):
+        # eth_sendRawTransaction request or batch (dicts), pinned to the primary.
+        # Returns the decoded body; see settle_write() for answers after a failover.
+        resp, ep, failed_over = self.pinned(json.dumps(payload).encode(), rpc_label(payload))
+        body = resp.json()
+        items = body if isinstance(body, list) else [body]
+        reqs = {r.get("id"): r for r in (payload if isinstance(payload, list) else [payload])}
+        if any("error" not in item for item in items if isinstance(item, dict)):
+            self.primary = ep
+        out = [self.settle_write(item, reqs.get(item.get("id"), {}).get("params", []), failed_over, ep)
+               if isinstance(item, dict) else item for item in items]
+        return out if isinstance(body, list) else out[0]
+
+    def settle_write(self, item, params, failed_over, ep):
+        # the node that failed mid-request may have taken the tx already: then the
+        # next node's "already known" / "nonce too low" is the resend, not an error
+        if not (failed_over and "error" in item and params and already_sent(item["error"])):
+            return item
+        self.primary = ep
+        raw = params[0] if isinstance(params[0], str) else Web3.to_hex(params[0])
+        return {"jsonrpc": "2.0", "id": item.get("id"), "result": Web3.to_hex(Web3.keccak(hexstr=raw))}
+
+    # ----- web3 provider interface -----
+    def make_request(self, method, params):
+        body = self.encode_rpc_request(method, params)
+        if method in WRITE_METHODS:
+            resp, ep, failed_over = self.pinned(body, str(method))
+            decoded = self.decode_rpc_response(resp.content)
+            if "error" not in decoded:
+                self.primary = ep
+            elif method == "eth_sendRawTransaction":
+                decoded = self.settle_write(decoded, params, failed_over, ep)
+        elif method == "eth_getTransactionCount" and params and params[-1] == "pending":
+            decoded = self.decode_rpc_response(self.pinned(body, str(method))[0].content)
+        else:
+            decoded = self.decode_rpc_response(self.post(body, label=str(method)).content)
+        if "error" in decoded:
+            METRICS.error("rpc", str(method))
+        return decoded
+
+    def is_connected(self, show_traceback=False):
+        try:
+            resp = self.make_request("web3_clientVersion", [])
+        except Exception:
+            if show_traceback:
+                raise
+            return False
+        return "error" not in resp
+
+    def stats(self):
+        lines = []
+        for e in self.ranked():
+            lat = "-" if e.latency is None else f"{e.latency * 1000:.0f}ms"
+            lines.append(f"  {e.url}: {e.calls} calls, {e.errors} errors, ewma {lat}, "
+                         f"p95 {e.p95() * 1000:.0f}ms, hedges won {e.hedges_won}")
+        return "RPC pool:\n" + "\n".join(lines)
+
+def already_sent(error):
+    msg = (error.get("message") if isinstance(error, dict) else str(error)) or ""
+    return any(s in msg.lower() for s in ALREADY_SENT)
+
+def urls_from_env(default=None):
+    # RPC_URLS (comma separated) wins; else RPC_URL; else the caller's default(s)
+    if os.getenv("RPC_URLS"):
+        return [u.strip() for u in os.getenv("RPC_URLS").split(",") if u.strip()]
+    if os.getenv("RPC_URL"):
+        return [os.getenv("RPC_URL")]
+    if isinstance(default, str):
+        return [default]
+    return list(default or [])
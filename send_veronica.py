@@ -3,6 +3,11 @@ from decimal import Decimal
 from dotenv import load_dotenv
 from web3 import Web3
 from eth_account import Account
+from fee_oracle import FeeOracle
+from nonce_manager import NonceManager
+from rpc_pool import RpcPool, urls_from_env
+from erc20_fast import call_decimals, call_balance_of, transfer_tx
+from confirm_tracker import ConfirmationTracker
 
 # ====== EDIT THESE ======
 TOKEN_ADDR = "0x164239FA94aec9c4e437Bf6890ea8602b759fd74"  # VERONICA proxy on Base
@@ -22,22 +27,16 @@ ERC20_ABI = [
     {"name":"transfer","outputs":[{"type":"bool"}],"inputs":[{"name":"to","type":"address"},{"name":"value","type":"uint256"}],"stateMutability":"nonpayable","type":"function"},
 ]
 
-def fees(w3: Web3):
-    latest = w3.eth.get_block("latest")
-    base = latest.get("baseFeePerGas", w3.eth.gas_price)
-    tip  = w3.to_wei(1, "gwei")
-    return {"maxFeePerGas": base + 2*tip, "maxPriorityFeePerGas": tip, "type": 2}
-
 def safe_decimals(token):
     try:
-        return token.functions.decimals().call()
+        return call_decimals(token.w3, token.address)
     except Exception:
         print(f"[warn] decimals() failed; assuming {ASSUME_DECIMALS_IF_FAIL}")
         return ASSUME_DECIMALS_IF_FAIL
 
 def safe_balance(token, addr):
     try:
-        return token.functions.balanceOf(addr).call()
+        return call_balance_of(token.w3, token.address, addr)
     except Exception:
         if SKIP_BALANCE_CHECK_IF_FAIL:
             print("[warn] balanceOf() failed; SKIPPING balance check.")
@@ -49,31 +48,29 @@ def ensure_contract(w3, addr):
     if not code or len(code) == 0:
         print("[warn] get_code returned empty; continuing (some public RPCs are flaky).")
 
-def send_chunk(w3, acct, token, to, human_amount, decimals, nonce):
+def send_chunk(w3, acct, token, to, human_amount, decimals, nm, oracle):
     if Decimal(human_amount) > MAX_PER_TX:
         raise SystemExit(f"Refusing > {MAX_PER_TX} in one tx (requested {human_amount}).")
     value = int(Decimal(human_amount) * (10 ** decimals))
-    fee = fees(w3)
-    tx = token.functions.transfer(to, value).build_transaction({
-        "chainId": int(os.getenv("CHAIN_ID", "8453")),
-        "from": acct.address,
-        "nonce": nonce,
-        "maxFeePerGas": fee["maxFeePerGas"],
-        "maxPriorityFeePerGas": fee["maxPriorityFeePerGas"],
-    })
-    try:
-        tx["gas"] = w3.eth.estimate_gas(tx)
-    except Exception:
-        tx["gas"] = 120_000
-    tx["type"] = 2
+    nonce = nm.reserve()
+    fee = oracle.fees()
+    tx = transfer_tx(int(os.getenv("CHAIN_ID", "8453")), acct.address, token.address, to, value, nonce,
+                     fee["maxFeePerGas"], fee["maxPriorityFeePerGas"])
+    tx["gas"] = oracle.gas_for(tx, token.address, "transfer", to)  # memoized estimate
     signed = acct.sign_transaction(tx)
     # works on both v5 and v6
     raw = getattr(signed, "rawTransaction", None) or getattr(signed, "raw_transaction")
-    txh = w3.eth.send_raw_transaction(raw)
+    txh = nm.record(nonce, tx, raw)  # persisted before broadcast
+    try:
+        w3.eth.send_raw_transaction(raw)
+    except Exception:
+        nm.release(nonce)
+        raise
 
-    print(f"→ Sent {human_amount} tokens | tx: {txh.hex()}")
-    rec = w3.eth.wait_for_transaction_receipt(txh)
-    print("   Confirmed in block:", rec.blockNumber)
+    print(f"→ Sent {human_amount} tokens | tx: {txh}")
+    # replaces the tx with a higher tip if it sits unmined past nonce_manager.STUCK_AFTER
+    txh, rec = nm.wait(nonce)
+    print("   Confirmed in block:", rec.blockNumber, f"(tx {txh})")
 
 def main():
     # optional CLI override: python script.py 0xTO 12345.67
@@ -81,16 +78,17 @@ def main():
     amt_arg = sys.argv[2] if len(sys.argv) > 2 else AMOUNT_TOKENS
 
     load_dotenv()
-    RPC_URL = os.getenv("RPC_URL", "https://base-mainnet.g.alchemy.com/v2/YOUR_KEY")  # use a reliable RPC
+    # use a reliable RPC; RPC_URLS=url1,url2,... spreads reads over several nodes
+    pool = RpcPool(urls_from_env("https://base-mainnet.g.alchemy.com/v2/YOUR_KEY"))
     CHAIN_ID = int(os.getenv("CHAIN_ID", "8453"))
     PK = os.getenv("PRIVATE_KEY") or sys.exit("Missing PRIVATE_KEY in .env")
 
-    w3 = Web3(Web3.HTTPProvider(RPC_URL))
+    w3 = Web3(pool)
     acct = Account.from_key(PK)
     token_addr = Web3.to_checksum_address(TOKEN_ADDR)
     to = Web3.to_checksum_address(to_arg)
 
-    print("Using RPC:", RPC_URL)
+    print("Using RPC:", pool)
     print("From:", acct.address)
     print("To:  ", to)
 
@@ -119,12 +117,18 @@ def main():
         remaining -= send_amt
         if not AUTO_SPLIT_OVER_50K: break
 
-    nonce = w3.eth.get_transaction_count(acct.address)
+    # one-shot sends: no poller thread, quotes refresh lazily once per block time
+    oracle = FeeOracle(w3, background=False)
+    # receipts come from one head follower (newHeads over WS_URL, else head polling)
+    tracker = ConfirmationTracker(pool).start()
+    nm = NonceManager(w3, acct, tracker=tracker)
     for amt in chunks:
-        send_chunk(w3, acct, token, to, amt, decimals, nonce)
-        nonce += 1
+        send_chunk(w3, acct, token, to, amt, decimals, nm, oracle)
         time.sleep(0.2)
+    tracker.close()
     print("All done.")
+    print(tracker.stats())
+    print(pool.stats())
 
 if __name__ == "__main__":
     main()
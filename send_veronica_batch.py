@@ -1,8 +1,15 @@
-import os, sys, csv, time, math
+import os, sys, csv, time, math, queue, threading
 from decimal import Decimal
 from dotenv import load_dotenv
 from web3 import Web3
 from eth_account import Account
+from receipt_cache import ReceiptCache
+from fee_oracle import FeeOracle, GAS_MARGIN
+from nonce_manager import NonceManager
+from rpc_pool import RpcPool, urls_from_env
+from payout_journal import PayoutJournal, OffsetReader, CHECKPOINT_EVERY
+from erc20_fast import call_decimals, transfer_tx
+from confirm_tracker import ConfirmationTracker
 
 # ====== SETTINGS ======
 INPUT_CSV  = sys.argv[1] if len(sys.argv) > 1 else "payouts.csv"
@@ -14,85 +21,619 @@ AUTO_SPLIT_OVER_50K = False          # True => split large amounts into <=50k ch
 ASSUME_DECIMALS_IF_FAIL = 18         # fallback if decimals() fails
 WAIT_FOR_RECEIPT = True              # False => just broadcast; faster, but no fee/block
 SLEEP_BETWEEN = 0.2                  # seconds between txs to keep mempool happy
+USE_RECEIPT_CACHE = True             # resolve "sent" rows from receipt_cache.py before hitting RPC
+PIPELINED = False                    # True => sign ahead, keep IN_FLIGHT txs broadcast, confirm in a watcher thread
+IN_FLIGHT = 16                       # max broadcast-but-unconfirmed txs in pipelined mode
+RECEIPT_POLL = 1.0                   # seconds between receipt-watcher sweeps
+CONFIRM_VIA_HEADS = True             # one newHeads/head-poll follower resolves every receipt (WS_URL, RECEIPT_CONFIRMATIONS; see confirm_tracker.py)
+RECEIPT_TIMEOUT = 180                # pipelined: leave a row as "sent" if not mined by then (rerun resolves it)
+NONCE_CHECK_EVERY = 15               # pipelined: seconds between stuck-tx / nonce-gap checks
+JOURNAL = True                       # write-ahead journal (OUTPUT_CSV + ".journal"): a rerun after a crash resumes mid-file
+SHARD_QUEUE = 64                     # PRIVATE_KEYS=k1,k2,...: rows queued ahead of each sender's worker
+DISPERSE = False                     # True => pack rows into Disperse.disperseToken calls, one tx per batch (first sender only)
+DISPERSE_ADDR = os.getenv("DISPERSE_ADDR", "0xD152f549545093347A162Dce210e7293f1452150")  # disperse.app; set for dev chains
+DISPERSE_MAX_ROWS = 200              # rows per disperse tx, upper bound
+DISPERSE_GAS_CAP = 8_000_000         # a batch whose estimate exceeds this is split in half until it fits
+DISPERSE_ALLOWANCE = None            # tokens to approve when allowance runs short; None => exactly the batch total
+# Dev-chain test: `anvil --fork-url https://mainnet.base.org` keeps Disperse and the token, then
+# RPC_URL=http://127.0.0.1:8545 CHAIN_ID=8453; or deploy Disperse.sol locally and set DISPERSE_ADDR
+# (tests/test_send_disperse.py does the latter on eth-tester)
 # ======================
 
 ERC20_ABI = [
     {"name":"decimals","outputs":[{"type":"uint8"}],"inputs":[],"stateMutability":"view","type":"function"},
     {"name":"balanceOf","outputs":[{"type":"uint256"}],"inputs":[{"name":"a","type":"address"}],"stateMutability":"view","type":"function"},
     {"name":"transfer","outputs":[{"type":"bool"}],"inputs":[{"name":"to","type":"address"},{"name":"value","type":"uint256"}],"stateMutability":"nonpayable","type":"function"},
+    {"name":"approve","outputs":[{"type":"bool"}],"inputs":[{"name":"spender","type":"address"},{"name":"value","type":"uint256"}],"stateMutability":"nonpayable","type":"function"},
+    {"name":"allowance","outputs":[{"type":"uint256"}],"inputs":[{"name":"owner","type":"address"},{"name":"spender","type":"address"}],"stateMutability":"view","type":"function"},
 ]
 
-def fees(w3: Web3):
-    latest = w3.eth.get_block("latest")
-    base = latest.get("baseFeePerGas", w3.eth.gas_price)
-    tip  = w3.to_wei(1, "gwei")
-    return {"maxFeePerGas": base + 2*tip, "maxPriorityFeePerGas": tip}
+# Disperse (disperse.app): pulls the batch total with transferFrom, then
+# transfer()s each recipient; the whole batch succeeds or reverts together
+DISPERSE_ABI = [
+    {"name":"disperseToken","outputs":[],"inputs":[{"name":"token","type":"address"},{"name":"recipients","type":"address[]"},{"name":"values","type":"uint256[]"}],"stateMutability":"nonpayable","type":"function"},
+]
 
 def load_env_and_web3():
     load_dotenv()
-    rpc = os.getenv("RPC_URL", "https://base-mainnet.g.alchemy.com/v2/YOUR_KEY")
-    pk  = os.getenv("PRIVATE_KEY")
-    if not pk:
+    # RPC_URLS=url1,url2,... spreads reads over several nodes (see rpc_pool.py)
+    urls = urls_from_env("https://base-mainnet.g.alchemy.com/v2/YOUR_KEY")
+    # PRIVATE_KEYS=k1,k2,... shards the rows across several senders, each with its own nonces
+    keys = [k.strip() for k in (os.getenv("PRIVATE_KEYS") or os.getenv("PRIVATE_KEY") or "").split(",") if k.strip()]
+    if not keys:
         raise SystemExit("Missing PRIVATE_KEY in .env")
-    w3 = Web3(Web3.HTTPProvider(rpc, request_kwargs={"timeout": 30}))
-    acct = Account.from_key(pk)
-    return w3, acct, rpc
+    pool = RpcPool(urls)
+    w3 = Web3(pool)
+    accts = [Account.from_key(k) for k in keys]
+    return w3, accts, pool
 
 def get_decimals(token):
     try:
-        return token.functions.decimals().call()
+        return call_decimals(token.w3, token.address)
     except Exception:
         print(f"[warn] decimals() failed; assuming {ASSUME_DECIMALS_IF_FAIL}")
         return ASSUME_DECIMALS_IF_FAIL
 
-def send_one(w3, acct, token, to, human_amount: Decimal, decimals: int, nonce: int):
+def sign_one(w3, acct, token, to, human_amount: Decimal, decimals: int, nonce: int, oracle: FeeOracle):
     if human_amount > MAX_PER_TX:
         raise SystemExit(f"Refusing > {MAX_PER_TX} in one tx (requested {human_amount}).")
 
     value = int(human_amount * (10 ** decimals))
-    fee_fields = fees(w3)
+    fee_fields = oracle.fees()
+
+    # hand-encoded transfer: no per-row ABI resolution or build_transaction pipeline
+    tx = transfer_tx(int(os.getenv("CHAIN_ID", "8453")), acct.address, token.address, to, value, nonce,
+                     fee_fields["maxFeePerGas"], fee_fields["maxPriorityFeePerGas"])
+    tx["gas"] = oracle.gas_for(tx, token.address, "transfer", to)
+
+    signed = acct.sign_transaction(tx)
+    return tx, getattr(signed, "rawTransaction", None) or getattr(signed, "raw_transaction")
+
+def broadcast(w3, nm: NonceManager, nonce, tx, raw, intent=None):
+    # journal first so a crash after send_raw_transaction can't lose the nonce
+    txh = nm.record(nonce, tx, raw)
+    # fsynced payout-journal record tying the tx to its CSV row; returns its undo
+    abort = intent(nonce, txh) if intent else None
+    try:
+        w3.eth.send_raw_transaction(raw)
+    except Exception:
+        nm.release(nonce)
+        if abort:
+            abort()  # never reached the node: a resume must not mark the row as sent
+        raise
+    return txh
+
+def send_one(w3, acct, token, to, human_amount: Decimal, decimals: int, nm: NonceManager, oracle: FeeOracle,
+             intent=None):
+    nonce = nm.reserve()
+    try:
+        tx, raw = sign_one(w3, acct, token, to, human_amount, decimals, nonce, oracle)
+    except Exception:
+        nm.release(nonce)
+        raise
+    txh = broadcast(w3, nm, nonce, tx, raw, intent)
+
+    if not WAIT_FOR_RECEIPT:
+        return txh, "", "", "", "sent"
+
+    # follows speed-up replacements, so the hash may differ from the first broadcast
+    txh, rcpt = nm.wait(nonce)
+    return (txh,) + receipt_columns(w3, rcpt)
+
+def receipt_columns(w3, rcpt):
+    egp = rcpt.get("effectiveGasPrice") or getattr(rcpt, "effectiveGasPrice", None) or w3.eth.gas_price
+    fee_eth = str(Decimal(rcpt.gasUsed) * Decimal(egp) / Decimal(10**18))
+    return rcpt.blockNumber, rcpt.gasUsed, fee_eth, ("confirmed" if rcpt.status == 1 else "reverted")
+
+def sibling_hashes(nonces, accts):
+    # h -> every hash the senders' nonce files hold for h's nonce, so a row whose
+    # tx was sped up / replaced by the NonceManager resolves to the one mined
+    def siblings(h):
+        for acct in accts:
+            try:
+                hashes = nonces(acct).siblings(h)
+            except Exception as e:
+                print(f"[warn] {acct.address}: nonce state unavailable: {e!r}")
+                continue
+            if len(hashes) > 1:
+                return hashes
+        return [h]
+    return siblings
+
+def find_receipt(w3, cache, h, head):
+    rcpt = cache.get_receipt(h) if cache else None
+    if rcpt is None:
+        try:
+            rcpt = w3.eth.get_transaction_receipt(h)
+        except Exception:
+            return None
+        if cache:
+            cache.put_receipt(h, rcpt, head())
+    return rcpt
+
+def resolve_sent(w3, cache, out, head, siblings=None):
+    # Fill block/gas/fee for a row broadcast on an earlier run (status "sent").
+    # Cached receipts cost no network I/O; fresh ones are cached once deep enough.
+    hashes = [h for h in (out.get("tx_hashes") or "").split(";") if h]
+    mined, last = [], None
+    for h in hashes:
+        cand, rcpt = h, (cache.get_receipt(h) if cache else None)
+        # newest replacement first; the original may still be the one that got mined
+        for cand in ([] if rcpt is not None else reversed(siblings(h) if siblings else [h])):
+            rcpt = find_receipt(w3, cache, cand, head)
+            if rcpt is not None:
+                break
+        if rcpt is None:
+            return False  # still pending (or dropped); leave the row as "sent"
+        mined.append(cand)
+        last = rcpt
+    if last is None:
+        return False
+    block, gas, fee, status = receipt_columns(w3, last)
+    out.update({"tx_hashes": ";".join(mined), "status": status, "block": block, "gas_used": gas,
+                "fee_eth": fee, "error": ""})
+    return True
+
+def prepare_row(row, w3, cache, head, siblings=None):
+    # Returns (out, to, chunks); `to` is None when the row needs no sending
+    # (skip, validation error, or already sent on an earlier run).
+    # siblings: see sibling_hashes(); lets "sent" rows follow replaced txs.
+    out = dict(row)  # copy input columns forward
 
-    tx = token.functions.transfer(to, value).build_transaction({
+    to_raw = (row.get("to") or "").strip()
+    amt_raw = (row.get("amount") or "").strip()
+    if not to_raw or not amt_raw:
+        out.update({"status":"skip","error":"missing to/amount"})
+        return out, None, None
+
+    # Skip if already has tx_hashes/status=confirmed
+    if (row.get("status","").lower() in {"confirmed","sent"}) and row.get("tx_hashes"):
+        if row.get("status","").lower() == "sent":
+            resolve_sent(w3, cache, out, head, siblings)
+        return out, None, None
+
+    # Normalize inputs
+    try:
+        to = Web3.to_checksum_address(to_raw)
+    except Exception:
+        out.update({"status":"error","error":f"invalid address: {to_raw}"})
+        return out, None, None
+
+    try:
+        human_amt = Decimal(amt_raw)
+        if human_amt <= 0:
+            raise ValueError
+    except Exception:
+        out.update({"status":"error","error":f"invalid amount: {amt_raw}"})
+        return out, None, None
+
+    # Chunking
+    chunks = []
+    if AUTO_SPLIT_OVER_50K and human_amt > MAX_PER_TX:
+        n = math.ceil(human_amt / MAX_PER_TX)
+        for i in range(n):
+            chunks.append(min(MAX_PER_TX, human_amt - i*MAX_PER_TX))
+    else:
+        if human_amt > MAX_PER_TX:
+            out.update({"status":"error","error":f"amount>{MAX_PER_TX} and autosplit disabled"})
+            return out, None, None
+        chunks = [human_amt]
+    return out, to, chunks
+
+def journal_intent(journal, idx, chunk, of, acct):
+    if journal is None:
+        return None
+    def intent(nonce, txh):
+        journal.intent(idx, chunk, of, acct.address, nonce, txh)
+        return lambda: journal.abort(idx, chunk, txh)
+    return intent
+
+def send_row(w3, acct, token, idx, out, to, chunks, decimals, oracle, nm, journal):
+    tx_hashes = []
+    last_block = last_gas = last_fee = ""
+    try:
+        for i, c in enumerate(chunks):
+            txh, block, gas, fee, status = send_one(w3, acct, token, to, c, decimals(), nm, oracle(),
+                                                    journal_intent(journal, idx, i, len(chunks), acct))
+            tx_hashes.append(txh)
+            last_block, last_gas, last_fee = block, gas, fee
+            print(f"→ {to} | {c} | {txh}")
+            time.sleep(SLEEP_BETWEEN)
+
+        out.update({
+            "tx_hashes": ";".join(tx_hashes),
+            "status": status,
+            "block": last_block,
+            "gas_used": last_gas,
+            "fee_eth": last_fee,
+            "error": ""
+        })
+    except Exception as e:
+        out.update({"status":"error","error":repr(e)})
+        if tx_hashes:
+            out["tx_hashes"] = ";".join(tx_hashes)
+    return out
+
+def run_sequential(w3, acct, token, rows, ordered, cache, decimals, head, oracle, nonces, journal):
+    siblings = sibling_hashes(nonces, [acct])
+    for idx, row in rows:
+        out, to, chunks = prepare_row(row, w3, cache, head, siblings)
+        if to is None:
+            ordered.put(idx, out); continue
+        ordered.put(idx, send_row(w3, acct, token, idx, out, to, chunks, decimals, oracle, nonces(acct), journal))
+
+def run_sharded(w3, accts, token, rows, ordered, cache, decimals, head, oracle, nonces, journal):
+    # One worker thread per sender account, each sending its share of rows
+    # sequentially on its own nonce stream. Rows are validated (and "sent" rows
+    # resolved) on this thread; bounded queues keep memory constant.
+    siblings = sibling_hashes(nonces, accts)
+    queues = [queue.Queue(SHARD_QUEUE) for _ in accts]
+
+    def worker(acct, q):
+        while True:
+            item = q.get()
+            if item is None:
+                return
+            idx, out, to, chunks = item
+            try:
+                nm = nonces(acct)
+            except Exception as e:
+                # keep draining: a dead worker would block the producer on this shard's queue
+                print(f"[err] {acct.address}: nonce manager unavailable: {e!r}")
+                out.update({"status": "error", "error": f"nonce manager unavailable: {e!r}"})
+                ordered.put(idx, out)
+                continue
+            ordered.put(idx, send_row(w3, acct, token, idx, out, to, chunks, decimals, oracle, nm, journal))
+
+    threads = [threading.Thread(target=worker, args=(a, q), daemon=True) for a, q in zip(accts, queues)]
+    for t in threads:
+        t.start()
+    for idx, row in rows:
+        out, to, chunks = prepare_row(row, w3, cache, head, siblings)
+        if to is None:
+            ordered.put(idx, out); continue
+        queues[idx % len(accts)].put((idx, out, to, chunks))
+    for q in queues:
+        q.put(None)
+    for t in threads:
+        t.join()
+
+# ----- disperse mode -----
+def build_call(w3, acct, fn, nonce, oracle, gas):
+    tx = fn.build_transaction({
         "chainId": int(os.getenv("CHAIN_ID", "8453")),
         "from": acct.address,
         "nonce": nonce,
-        "maxFeePerGas": fee_fields["maxFeePerGas"],
-        "maxPriorityFeePerGas": fee_fields["maxPriorityFeePerGas"],
-        "type": 2,
+        **oracle.fees(),
+        "gas": gas,
     })
+    signed = acct.sign_transaction(tx)
+    return tx, getattr(signed, "rawTransaction", None) or getattr(signed, "raw_transaction")
+
+def send_call(w3, acct, fn, gas, nm, oracle, intent=None):
+    nonce = nm.reserve()
     try:
-        tx["gas"] = w3.eth.estimate_gas(tx)
+        tx, raw = build_call(w3, acct, fn, nonce, oracle, gas)
     except Exception:
-        tx["gas"] = 120_000  # safe fallback
+        nm.release(nonce)
+        raise
+    txh = broadcast(w3, nm, nonce, tx, raw, intent)
+    return nonce, txh
 
-    signed = acct.sign_transaction(tx)
-    raw = getattr(signed, "rawTransaction", None) or getattr(signed, "raw_transaction")
-    txh = w3.eth.send_raw_transaction(raw)
+def ensure_allowance(w3, acct, token, spender, needed, decimals, nm, oracle):
+    have = token.functions.allowance(acct.address, spender).call()
+    if have >= needed:
+        return
+    amount = int(DISPERSE_ALLOWANCE * (10 ** decimals)) if DISPERSE_ALLOWANCE is not None else 0
+    amount = max(amount, needed)
+    fn = token.functions.approve(spender, amount)
+    gas = int(fn.estimate_gas({"from": acct.address}) * GAS_MARGIN)
+    nonce, txh = send_call(w3, acct, fn, gas, nm, oracle)
+    print(f"approve {spender} for {Decimal(amount) / (10 ** decimals)} | {txh}")
+    _, rcpt = nm.wait(nonce, timeout=RECEIPT_TIMEOUT)
+    if rcpt.status != 1:
+        raise RuntimeError(f"approve reverted: {txh}")
 
-    if not WAIT_FOR_RECEIPT:
-        return txh.hex(), "", "", "", "sent"
+def plan_batches(w3, acct, token, disperse, batch, decimals):
+    # Split until each batch's estimate fits DISPERSE_GAS_CAP. A reverting
+    # estimate is split too, so one bad row can't sink the whole batch.
+    # Returns [(batch, gas or None, error)].
+    tos = [to for _, _, to, chunks in batch for _ in chunks]
+    values = [int(c * (10 ** decimals)) for _, _, _, chunks in batch for c in chunks]
+    try:
+        est = disperse.functions.disperseToken(token.address, tos, values).estimate_gas({"from": acct.address})
+        err = None
+    except Exception as e:
+        est, err = None, e
+    if est is not None and est * GAS_MARGIN <= DISPERSE_GAS_CAP:
+        return [(batch, int(est * GAS_MARGIN), None)]
+    if len(batch) == 1:
+        return [(batch, None, err or RuntimeError(f"row needs {est} gas, over DISPERSE_GAS_CAP"))]
+    mid = len(batch) // 2
+    return (plan_batches(w3, acct, token, disperse, batch[:mid], decimals)
+            + plan_batches(w3, acct, token, disperse, batch[mid:], decimals))
 
-    rcpt = w3.eth.wait_for_transaction_receipt(txh)
-    egp = rcpt.get("effectiveGasPrice") or getattr(rcpt, "effectiveGasPrice", None) or w3.eth.gas_price
-    fee_eth = str(Decimal(rcpt.gasUsed) * Decimal(egp) / Decimal(10**18))
-    return txh.hex(), rcpt.blockNumber, rcpt.gasUsed, fee_eth, ("confirmed" if rcpt.status == 1 else "reverted")
+def send_batch(w3, acct, token, disperse, batch, decimals, nm, oracle, journal, ordered):
+    # batch: [(idx, out, to, chunks)]; every row gets the shared tx hash and
+    # its share (by transfer count) of gas and fee
+    dec = decimals()
+    needed = sum(int(c * (10 ** dec)) for _, _, _, chunks in batch for c in chunks)
+    try:
+        ensure_allowance(w3, acct, token, disperse.address, needed, dec, nm, oracle)
+        plans = plan_batches(w3, acct, token, disperse, batch, dec)
+    except Exception as e:
+        plans = [(batch, None, e)]
+
+    for rows, gas, err in plans:
+        if err is None:
+            tos = [to for _, _, to, chunks in rows for _ in chunks]
+            values = [int(c * (10 ** dec)) for _, _, _, chunks in rows for c in chunks]
+            fn = disperse.functions.disperseToken(token.address, tos, values)
+
+            def intent(nonce, txh):
+                # one record per row covering all of its chunks: they ride in this single tx
+                if journal is None:
+                    return None
+                for idx, _, _, chunks in rows:
+                    journal.intent(idx, 0, len(chunks), acct.address, nonce, txh, covers_all=True)
+
+                def abort():
+                    for idx, _, _, _ in rows:
+                        journal.abort(idx, 0, txh)
+                return abort
+            txh = rcpt = wait_err = None
+            try:
+                nonce, txh = send_call(w3, acct, fn, gas, nm, oracle, intent)
+                print(f"⇉ {len(rows)} rows, {len(tos)} transfers | {txh}")
+            except Exception as e:
+                err = e
+            if txh is not None and WAIT_FOR_RECEIPT:
+                try:
+                    txh, rcpt = nm.wait(nonce, timeout=RECEIPT_TIMEOUT)
+                except Exception as e:
+                    # broadcast already: keep the hash so a rerun resolves it instead of paying again
+                    wait_err = e
+                    txh = (nm.hashes(nonce) or [txh])[-1]
+        for idx, out, to, chunks in rows:
+            if err is not None:
+                out.update({"status": "error", "error": repr(err)})
+            elif rcpt is None:
+                out.update({"tx_hashes": txh, "status": "sent", "block": "", "gas_used": "", "fee_eth": "",
+                            "error": repr(wait_err) if wait_err else ""})
+            else:
+                block, gas_used, fee, status = receipt_columns(w3, rcpt)
+                share = Decimal(len(chunks)) / Decimal(len(tos))
+                out.update({"tx_hashes": txh, "status": status, "block": block,
+                            "gas_used": int(gas_used * share), "fee_eth": str((Decimal(fee) * share).quantize(Decimal(10) ** -18)), "error": ""})
+            ordered.put(idx, out)
+
+def run_disperse(w3, acct, token, rows, ordered, cache, decimals, head, oracle, nonces, journal):
+    siblings = sibling_hashes(nonces, [acct])
+    disperse = w3.eth.contract(Web3.to_checksum_address(DISPERSE_ADDR), abi=DISPERSE_ABI)
+    batch = []
+    for idx, row in rows:
+        out, to, chunks = prepare_row(row, w3, cache, head, siblings)
+        if to is None:
+            ordered.put(idx, out); continue
+        batch.append((idx, out, to, chunks))
+        if len(batch) >= DISPERSE_MAX_ROWS:
+            send_batch(w3, acct, token, disperse, batch, decimals, nonces(acct), oracle(), journal, ordered)
+            batch = []
+    if batch:
+        send_batch(w3, acct, token, disperse, batch, decimals, nonces(acct), oracle(), journal, ordered)
+
+class OrderedWriter:
+    # Rows finish out of order in pipelined/sharded mode; write them back in
+    # input order and checkpoint the journal every CHECKPOINT_EVERY rows
+    def __init__(self, writer, start=0, f_out=None, journal=None, reader=None):
+        self.writer = writer
+        self.next = start
+        self.done = {}
+        self.lock = threading.Lock()
+        self.f_out = f_out
+        self.journal = journal
+        self.reader = reader
+
+    def put(self, idx, out):
+        with self.lock:
+            self.done[idx] = out
+            while self.next in self.done:
+                self.writer.writerow(self.done.pop(self.next))
+                self.next += 1
+            if self.journal and self.next - self.journal.row >= CHECKPOINT_EVERY:
+                self._checkpoint()
+
+    def checkpoint(self):
+        with self.lock:
+            if self.journal:
+                self._checkpoint()
+
+    def _checkpoint(self):
+        # output rows must be on disk before the journal says they are
+        self.f_out.flush()
+        os.fsync(self.f_out.fileno())
+        self.journal.checkpoint(self.next, self.reader.offset_of(self.next), self.f_out.tell())
+
+class ReceiptWatcher(threading.Thread):
+    # Polls receipts for every in-flight row, fills block/gas/fee columns and
+    # frees one IN_FLIGHT slot per mined (or timed-out) tx. Also drives the
+    # nonce manager's stuck-tx replacement and gap filling.
+    def __init__(self, w3, nm, writer, window):
+        super().__init__(daemon=True)
+        self.w3 = w3
+        self.nm = nm
+        self.writer = writer
+        self.window = window
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.last_check = time.time()
+
+    def add(self, idx, out, nonces):
+        with self.lock:
+            self.pending[idx] = {"out": out, "nonces": nonces, "rcpts": {},
+                                 "deadline": time.time() + RECEIPT_TIMEOUT}
+
+    def close(self):
+        self.closed.set()
+        self.join()
+
+    def run(self):
+        while True:
+            with self.lock:
+                jobs = list(self.pending.items())
+            if not jobs and self.closed.is_set():
+                return
+            if jobs and time.time() - self.last_check > NONCE_CHECK_EVERY:
+                self.last_check = time.time()
+                try:
+                    self.nm.check()
+                except Exception as e:
+                    print(f"[warn] nonce check failed: {e!r}")
+            for idx, job in jobs:
+                for n in job["nonces"]:
+                    if n in job["rcpts"]:
+                        continue
+                    found = self.nm.receipt(n)
+                    if found is None:
+                        continue  # not mined yet
+                    job["rcpts"][n] = found
+                    self.window.release()
+                finished = len(job["rcpts"]) == len(job["nonces"])
+                if not finished and time.time() < job["deadline"]:
+                    continue
+                out = job["out"]
+                if finished:
+                    out["tx_hashes"] = ";".join(job["rcpts"][n][0] for n in job["nonces"])
+                    block, gas, fee, status = receipt_columns(self.w3, job["rcpts"][job["nonces"][-1]][1])
+                    if out.get("status") == "error":
+                        status = "error"  # a later chunk failed; only the earlier ones were sent
+                    out.update({"status": status, "block": block, "gas_used": gas, "fee_eth": fee})
+                    print(f"✓ {out.get('to')} | {status} in block {block}")
+                else:
+                    # record the newest (possibly replaced) hash per nonce for the next run
+                    out["tx_hashes"] = ";".join(
+                        job["rcpts"][n][0] if n in job["rcpts"] else (self.nm.hashes(n) or [""])[-1]
+                        for n in job["nonces"])
+                    for _ in range(len(job["nonces"]) - len(job["rcpts"])):
+                        self.window.release()
+                    print(f"[warn] {out.get('to')} not mined after {RECEIPT_TIMEOUT}s; left as {out.get('status')}")
+                with self.lock:
+                    del self.pending[idx]
+                self.writer.put(idx, out)
+            time.sleep(RECEIPT_POLL)
+
+def run_pipelined(w3, acct, token, rows, ordered, cache, decimals, head, oracle, nonces, journal):
+    siblings = sibling_hashes(nonces, [acct])
+    window = threading.Semaphore(IN_FLIGHT)
+    watcher = None
+
+    for idx, row in rows:
+        out, to, chunks = prepare_row(row, w3, cache, head, siblings)
+        if to is None:
+            ordered.put(idx, out); continue
+
+        nm = nonces(acct)
+        if watcher is None:
+            watcher = ReceiptWatcher(w3, nm, ordered, window)
+            watcher.start()
+        tx_hashes, used = [], []
+        try:
+            for i, c in enumerate(chunks):
+                # sign while the window may still be full, then wait for a slot
+                nonce = nm.reserve()
+                try:
+                    tx, raw = sign_one(w3, acct, token, to, c, decimals(), nonce, oracle())
+                except Exception:
+                    nm.release(nonce)
+                    raise
+                window.acquire()
+                try:
+                    txh = broadcast(w3, nm, nonce, tx, raw, journal_intent(journal, idx, i, len(chunks), acct))
+                except Exception:
+                    window.release()
+                    raise
+                used.append(nonce)
+                tx_hashes.append(txh)
+                print(f"→ {to} | {c} | {txh}")
+        except Exception as e:
+            out.update({"status":"error","error":repr(e)})
+            if not tx_hashes:
+                ordered.put(idx, out); continue
+            # earlier chunks are on-chain already; keep them so a rerun won't
+            # resend, and hand their slots back once they are mined
+            out["tx_hashes"] = ";".join(tx_hashes)
+            if WAIT_FOR_RECEIPT:
+                watcher.add(idx, out, used)
+            else:
+                for _ in tx_hashes:
+                    window.release()
+                ordered.put(idx, out)
+            continue
+
+        out.update({"tx_hashes": ";".join(tx_hashes), "status": "sent",
+                    "block": "", "gas_used": "", "fee_eth": "", "error": ""})
+        if WAIT_FOR_RECEIPT:
+            watcher.add(idx, out, used)
+        else:
+            for _ in tx_hashes:
+                window.release()
+            ordered.put(idx, out)
+
+    if watcher:
+        watcher.close()
 
 def main():
-    w3, acct, rpc = load_env_and_web3()
+    w3, accts, pool = load_env_and_web3()
     token = w3.eth.contract(Web3.to_checksum_address(TOKEN_ADDR), abi=ERC20_ABI)
-    decimals = get_decimals(token)
+    cache = ReceiptCache() if USE_RECEIPT_CACHE else None
+    # decimals, head block, fee oracle and nonce managers are set up lazily so a
+    # rerun over a fully-confirmed file does no network I/O at all
+    lazy = {}
+    lazy_lock = threading.RLock()  # sender shards call these from their own threads
+
+    def decimals():
+        with lazy_lock:
+            if "decimals" not in lazy:
+                lazy["decimals"] = get_decimals(token)
+            return lazy["decimals"]
+
+    def oracle():
+        with lazy_lock:
+            if "oracle" not in lazy:
+                lazy["oracle"] = FeeOracle(w3)
+            return lazy["oracle"]
 
-    print("Using RPC:", rpc)
-    print("From:", acct.address)
+    def tracker():
+        with lazy_lock:
+            if "tracker" not in lazy:
+                lazy["tracker"] = ConfirmationTracker(pool).start() if CONFIRM_VIA_HEADS and WAIT_FOR_RECEIPT else None
+            return lazy["tracker"]
+
+    def nonces(acct):
+        with lazy_lock:
+            key = ("nonces", acct.address)
+            if key not in lazy:
+                lazy[key] = NonceManager(w3, acct, tracker=tracker())
+            return lazy[key]
+
+    def head():
+        with lazy_lock:
+            if "head" not in lazy:
+                lazy["head"] = w3.eth.block_number
+            return lazy["head"]
+
+    print("Using RPC:", pool)
+    print("From:", ", ".join(a.address for a in accts))
 
     # Read input CSV
     if not os.path.exists(INPUT_CSV):
         raise SystemExit(f"Input CSV not found: {INPUT_CSV}")
 
-    with open(INPUT_CSV, "r", newline="", encoding="utf-8-sig") as f_in, \
-         open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f_out:
-
-        reader = csv.DictReader(f_in)
+    journal = PayoutJournal(OUTPUT_CSV + ".journal", INPUT_CSV) if JOURNAL else None
+    with open(INPUT_CSV, "rb") as f_in:
+        # rows are streamed with their byte offsets so the journal can seek back in
+        reader = OffsetReader(f_in)
         fieldnames = list(reader.fieldnames or [])
         # Ensure expected columns
         if "to" not in fieldnames or "amount" not in fieldnames:
@@ -102,75 +643,52 @@ def main():
             if col not in fieldnames:
                 fieldnames.append(col)
 
-        writer = csv.DictWriter(f_out, fieldnames=fieldnames)
-        writer.writeheader()
-
-        nonce = w3.eth.get_transaction_count(acct.address)
+        if journal is not None and journal.resume(OUTPUT_CSV):
+            # drop rows written after the last checkpoint; they are redone from the journal
+            os.truncate(OUTPUT_CSV, journal.out_offset)
+            f_out = open(OUTPUT_CSV, "a", newline="", encoding="utf-8")
+            writer = csv.DictWriter(f_out, fieldnames=fieldnames)
+            start_row, offset = journal.row, journal.in_offset
+            print(f"Resuming at row {start_row} ({len(journal.open)} rows with journaled txs)")
+        else:
+            f_out = open(OUTPUT_CSV, "w", newline="", encoding="utf-8")
+            writer = csv.DictWriter(f_out, fieldnames=fieldnames)
+            writer.writeheader()
+            f_out.flush()
+            start_row, offset = 0, None
+            if journal is not None:
+                journal.start(reader.header_end, f_out.tell())
 
-        for row in reader:
-            out = dict(row)  # copy input columns forward
-
-            to_raw = (row.get("to") or "").strip()
-            amt_raw = (row.get("amount") or "").strip()
-            if not to_raw or not amt_raw:
-                out.update({"status":"skip","error":"missing to/amount"})
-                writer.writerow(out); continue
-
-            # Skip if already has tx_hashes/status=confirmed
-            if (row.get("status","").lower() in {"confirmed","sent"}) and row.get("tx_hashes"):
-                writer.writerow(out); continue
-
-            # Normalize inputs
-            try:
-                to = Web3.to_checksum_address(to_raw)
-            except Exception:
-                out.update({"status":"error","error":f"invalid address: {to_raw}"})
-                writer.writerow(out); continue
-
-            try:
-                human_amt = Decimal(amt_raw)
-                if human_amt <= 0:
-                    raise ValueError
-            except Exception:
-                out.update({"status":"error","error":f"invalid amount: {amt_raw}"})
-                writer.writerow(out); continue
-
-            # Chunking
-            chunks = []
-            if AUTO_SPLIT_OVER_50K and human_amt > MAX_PER_TX:
-                n = math.ceil(human_amt / MAX_PER_TX)
-                for i in range(n):
-                    chunks.append(min(MAX_PER_TX, human_amt - i*MAX_PER_TX))
+        rows = reader.rows(start_row, offset)
+        if journal is not None:
+            rows = ((idx, journal.apply(idx, row)) for idx, row in rows)
+        ordered = OrderedWriter(writer, start_row, f_out, journal, reader)
+        with f_out:
+            if DISPERSE:
+                run_disperse(w3, accts[0], token, rows, ordered, cache, decimals, head, oracle, nonces, journal)
+            elif len(accts) > 1:
+                run_sharded(w3, accts, token, rows, ordered, cache, decimals, head, oracle, nonces, journal)
             else:
-                if human_amt > MAX_PER_TX:
-                    out.update({"status":"error","error":f"amount>{MAX_PER_TX} and autosplit disabled"})
-                    writer.writerow(out); continue
-                chunks = [human_amt]
-
-            tx_hashes = []
-            last_block = last_gas = last_fee = ""
-            try:
-                for c in chunks:
-                    txh, block, gas, fee, status = send_one(w3, acct, token, to, c, decimals, nonce)
-                    nonce += 1
-                    tx_hashes.append(txh)
-                    last_block, last_gas, last_fee = block, gas, fee
-                    print(f"→ {to} | {c} | {txh}")
-                    time.sleep(SLEEP_BETWEEN)
-
-                out.update({
-                    "tx_hashes": ";".join(tx_hashes),
-                    "status": status,
-                    "block": last_block,
-                    "gas_used": last_gas,
-                    "fee_eth": last_fee,
-                    "error": ""
-                })
-            except Exception as e:
-                out.update({"status":"error","error":repr(e)})
-
-            writer.writerow(out)
+                run = run_pipelined if PIPELINED else run_sequential
+                run(w3, accts[0], token, rows, ordered, cache, decimals, head, oracle, nonces, journal)
+            ordered.checkpoint()
+    if journal is not None:
+        journal.close()
 
+    if lazy.get("tracker"):
+        print(lazy["tracker"].stats())
+        lazy["tracker"].close()
+    if "oracle" in lazy:
+        print(lazy["oracle"].stats())
+        lazy["oracle"].close()
+    for key, nm in lazy.items():
+        if isinstance(key, tuple):
+            print(f"{key[1]}: {nm.stats()}")
+    if cache:
+        print(cache.stats())
+        cache.close()
+    if any(e.calls for e in pool.endpoints):
+        print(pool.stats())
     print(f"Done. Wrote results to {OUTPUT_CSV}")
 
 if __name__ == "__main__":
@@ -0,0 +1,135 @@
+# Shared fixtures: puts the repo root on sys.path (the scripts are flat
+# modules) and runs an in-process mock JSON-RPC node for the fetch tests.
+# Run from the repo root: python -m pytest -q
+import os, sys, json, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from web3 import Web3
+
+os.environ.setdefault("METRICS_SUMMARY", "0")  # no rpc_metrics table after every run
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+SENDER = "0x4106DBe31e9cf790D4dD221E627BDe55c8de195E"
+TOKEN = "0x164239FA94aec9c4e437Bf6890ea8602b759fd74"
+PAYEE = "0x00000000000000000000000000000000000000aa"
+
+
+def tx_hash(i):
+    return "0x" + "%064x" % (i + 1)
+
+
+class MockRpc:
+    # Answers receipts/txs for any hash (index = int(hash) - 1). Knobs:
+    #   max_batch      batches with more calls get a single "batch too large" error
+    #   fail[method]   the next N requests carrying that method get HTTP 503
+    #   missing        hashes whose receipt is null (not mined)
+    #   send_error     JSON-RPC error message for eth_sendRawTransaction
+    #   nonce          eth_getTransactionCount answer
+    def __init__(self):
+        self.max_batch = 1000
+        self.fail = {}
+        self.missing = set()
+        self.send_error = None
+        self.nonce = 0
+        self.posts = []  # list of method lists, one per HTTP request
+        self.lock = threading.Lock()
+
+    def receipt(self, h):
+        i = int(h, 16) - 1
+        return {"transactionHash": h, "blockNumber": hex(1000 + i), "blockHash": tx_hash(10_000 + i),
+                "status": "0x1", "gasUsed": hex(50_000 + i), "effectiveGasPrice": hex(10**9),
+                "cumulativeGasUsed": "0x1", "logs": [], "logsBloom": "0x" + "00" * 256,
+                "from": SENDER, "to": TOKEN, "contractAddress": None, "transactionIndex": "0x0", "type": "0x2"}
+
+    def tx(self, h):
+        i = int(h, 16) - 1
+        data = "0xa9059cbb" + PAYEE[2:].rjust(64, "0") + "%064x" % (10**18)
+        return {"hash": h, "blockNumber": hex(1000 + i), "blockHash": tx_hash(10_000 + i), "from": SENDER,
+                "to": TOKEN, "input": data, "gas": hex(100_000), "nonce": hex(i), "value": "0x0",
+                "type": "0x2", "transactionIndex": "0x0", "chainId": "0x2105", "maxFeePerGas": hex(2 * 10**9),
+                "maxPriorityFeePerGas": hex(10**9), "v": "0x0", "r": "0x1", "s": "0x1", "accessList": []}
+
+    def answer(self, req):
+        m, p = req["method"], req.get("params", [])
+        if m == "eth_chainId":
+            r = "0x2105"
+        elif m == "eth_blockNumber":
+            r = hex(5000)
+        elif m == "eth_gasPrice":
+            r = hex(10**9)
+        elif m == "eth_getTransactionReceipt":
+            r = None if p[0] in self.missing else self.receipt(p[0])
+        elif m == "eth_getTransactionByHash":
+            r = self.tx(p[0])
+        elif m == "eth_getTransactionCount":
+            r = hex(self.nonce)
+        elif m == "eth_sendRawTransaction" and self.send_error:
+            return {"jsonrpc": "2.0", "id": req.get("id"), "error": {"code": -32000, "message": self.send_error}}
+        elif m == "eth_sendRawTransaction":
+            r = Web3.to_hex(Web3.keccak(hexstr=p[0]))
+        else:
+            return {"jsonrpc": "2.0", "id": req.get("id"), "error": {"code": -32601, "message": f"no {m}"}}
+        return {"jsonrpc": "2.0", "id": req.get("id"), "result": r}
+
+    def handle(self, body):
+        # returns (http status, response body)
+        reqs = body if isinstance(body, list) else [body]
+        with self.lock:
+            self.posts.append([r["method"] for r in reqs])
+            for r in reqs:
+                if self.fail.get(r["method"], 0) > 0:
+                    self.fail[r["method"]] -= 1
+                    return 503, {"error": "unavailable"}
+        if isinstance(body, list):
+            if len(body) > self.max_batch:
+                return 200, {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "batch too large"}}
+            return 200, [self.answer(r) for r in body]
+        return 200, self.answer(body)
+
+    def batch_sizes(self):
+        with self.lock:
+            return [len(p) for p in self.posts]
+
+
+def serve(rpc):
+    # run a MockRpc on a free local port; returns (rpc with .url set, server)
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *a):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            status, out = rpc.handle(body)
+            data = json.dumps(out).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    rpc.url = f"http://127.0.0.1:{server.server_address[1]}"
+    return rpc, server
+
+
+@pytest.fixture
+def make_mock_rpc():
+    servers = []
+
+    def make():
+        rpc, server = serve(MockRpc())
+        servers.append(server)
+        return rpc
+
+    yield make
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def mock_rpc(make_mock_rpc):
+    return make_mock_rpc()
@@ -0,0 +1,17 @@
+# pragma version ~=0.4.0
+# disperse.app's disperseToken: pull the total once, then pay each recipient.
+
+interface ERC20:
+    def transfer(to: address, amount: uint256) -> bool: nonpayable
+    def transferFrom(owner: address, to: address, amount: uint256) -> bool: nonpayable
+
+
+@external
+def disperseToken(token: address, recipients: DynArray[address, 256], values: DynArray[uint256, 256]):
+    assert len(recipients) == len(values)
+    total: uint256 = 0
+    for v: uint256 in values:
+        total += v
+    assert extcall ERC20(token).transferFrom(msg.sender, self, total)
+    for i: uint256 in range(len(recipients), bound=256):
+        assert extcall ERC20(token).transfer(recipients[i], values[i])
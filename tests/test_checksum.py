@@ -0,0 +1,28 @@
+# checksum.py raw probes decode eth_call results as web3 returns them (HexBytes)
+import pytest
+from hexbytes import HexBytes
+
+import checksum
+from conftest import TOKEN, SENDER
+
+
+class StubEth:
+    def __init__(self, ret):
+        self.ret = ret
+
+    def call(self, tx):
+        return self.ret
+
+
+def w3(ret):
+    return type("W3", (), {"eth": StubEth(ret)})()
+
+
+def test_raw_probes_decode_hexbytes():
+    assert checksum.raw_decimals(w3(HexBytes((18).to_bytes(32, "big"))), TOKEN) == 18
+    assert checksum.raw_balance_of(w3(HexBytes((10**21).to_bytes(32, "big"))), TOKEN, SENDER) == 10**21
+
+
+def test_raw_probe_rejects_short_results():
+    with pytest.raises(RuntimeError, match="too little data"):
+        checksum.raw_decimals(w3(HexBytes(b"")), TOKEN)
@@ -0,0 +1,122 @@
+# --async and --batch fetch paths against the in-process mock node (conftest.py)
+import csv
+import asyncio
+import pytest
+
+import gas_fees_base as gfb
+from rpc_pool import RpcPool
+from conftest import tx_hash, PAYEE
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(gfb, "BACKOFF_BASE", 0.001)
+    monkeypatch.setattr(gfb, "BACKOFF_MAX", 0.001)
+
+
+def fetch_async(rpc, hashes):
+    return asyncio.run(gfb.fetch_async_mode(rpc.url, hashes))
+
+
+def test_async_fetch_returns_every_hash_in_order(mock_rpc, monkeypatch):
+    monkeypatch.setattr(gfb, "ASYNC_CONCURRENCY", 4)
+    hashes = [tx_hash(i) for i in range(20)]
+    out = fetch_async(mock_rpc, hashes)
+    assert [h for h, _, _, _ in out] == hashes
+    assert all(err is None for _, _, _, err in out)
+    assert [rcpt["gasUsed"] for _, rcpt, _, _ in out] == [50_000 + i for i in range(20)]
+    row, fee = gfb.build_row(hashes[0], out[0][1], out[0][2], lambda: 0)
+    assert row["recipient"].lower() == PAYEE and fee == gfb.wei_to_eth(50_000 * 10**9)
+
+
+def test_async_fetch_retries_transient_errors(mock_rpc):
+    mock_rpc.fail["eth_getTransactionReceipt"] = gfb.MAX_RETRIES - 1
+    out = fetch_async(mock_rpc, [tx_hash(0)])
+    assert out[0][3] is None
+    receipts = [p for p in mock_rpc.posts if p == ["eth_getTransactionReceipt"]]
+    assert len(receipts) == gfb.MAX_RETRIES
+
+
+def test_async_fetch_reports_error_after_max_retries(mock_rpc):
+    mock_rpc.fail["eth_getTransactionReceipt"] = 100
+    out = fetch_async(mock_rpc, [tx_hash(0)])
+    assert out[0][1] is None and out[0][3] is not None
+
+
+def test_batch_fetch_shrinks_to_provider_limit_and_regrows(mock_rpc, monkeypatch):
+    monkeypatch.setattr(gfb, "BATCH_SIZE", 40)
+    mock_rpc.max_batch = 30  # 15 hashes (2 calls each)
+    hashes = [tx_hash(i) for i in range(100)]
+    out = list(gfb.fetch_batched(RpcPool([mock_rpc.url]), hashes))
+    assert [h for h, _, _, _ in out] == hashes
+    assert all(err is None for _, _, _, err in out)
+    sizes = mock_rpc.batch_sizes()
+    accepted = [s for s in sizes if s <= 30]
+    assert sum(accepted) == 2 * len(hashes)
+    # settles just under the limit instead of shrinking to the minimum
+    assert max(accepted) > 20
+    assert len(sizes) - len(accepted) < 15
+
+
+def test_batch_fetch_retries_only_at_min_size(mock_rpc, monkeypatch):
+    monkeypatch.setattr(gfb, "BATCH_SIZE", 8)
+    monkeypatch.setattr(gfb, "MIN_BATCH_SIZE", 2)
+    # four rejections: three shrinks (8 -> 4 -> 2) spend no retries, so the
+    # MAX_RETRIES - 1 failures at the minimum still leave one try that succeeds
+    mock_rpc.fail["eth_getTransactionReceipt"] = 2 + gfb.MAX_RETRIES - 1
+    out = list(gfb.fetch_batched(RpcPool([mock_rpc.url]), [tx_hash(i) for i in range(8)]))
+    assert all(err is None for _, _, _, err in out)
+    assert len(out) == 8
+
+
+def test_batch_fetch_gives_up_per_hash_after_max_retries(mock_rpc, monkeypatch):
+    monkeypatch.setattr(gfb, "BATCH_SIZE", 2)
+    monkeypatch.setattr(gfb, "MIN_BATCH_SIZE", 2)
+    mock_rpc.fail["eth_getTransactionReceipt"] = gfb.MAX_RETRIES
+    out = list(gfb.fetch_batched(RpcPool([mock_rpc.url]), [tx_hash(i) for i in range(4)]))
+    assert [err is not None for _, _, _, err in out] == [True, True, False, False]
+
+
+def test_batch_fetch_unmined_hash_is_a_row_error(mock_rpc):
+    mock_rpc.missing.add(tx_hash(1))
+    out = list(gfb.fetch_batched(RpcPool([mock_rpc.url]), [tx_hash(i) for i in range(3)]))
+    assert [err is None for _, _, _, err in out] == [True, False, True]
+    assert "not found" in str(out[1][3])
+
+
+def legacy_csv(path, extra=()):
+    # gas_fees.csv as written before the recipient column existed
+    fields = ["tx_hash", "block", "status", "from", "to", "method_id", "gas_used",
+              "effective_gas_price_wei", "effective_gas_price_gwei", "fee_eth", *extra]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.write(",".join(fields) + "\n")
+        f.write(",".join([tx_hash(0), "1000", "1", "0xa", "0xb", "0xa9059cbb", "21000", "1", "0.000000001",
+                          "0.000021"] + ["x"] * len(extra)) + "\n")
+
+
+def new_row(mock_rpc, i):
+    h = tx_hash(i)
+    rcpt, tx = gfb.decode_receipt(mock_rpc.receipt(h)), gfb.decode_tx(mock_rpc.tx(h))
+    return gfb.build_row(h, rcpt, tx, lambda: 0)[0]
+
+
+def test_resumed_append_upgrades_an_older_csv_header(mock_rpc, tmp_path, monkeypatch):
+    out = tmp_path / "gas_fees.csv"
+    monkeypatch.setattr(gfb, "OUTPUT_FILE", str(out))
+    legacy_csv(out)
+    gfb.write_rows([new_row(mock_rpc, 1)], 0, append=True)
+    with open(out, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["tx_hash"] for r in rows] == [tx_hash(0), tx_hash(1)]
+    assert rows[0]["recipient"] == "" and rows[0]["fee_eth"] == "0.000021"
+    assert rows[1]["recipient"].lower() == PAYEE and rows[1]["block"] == "1001"
+
+
+def test_resumed_append_refuses_a_csv_with_unknown_columns(mock_rpc, tmp_path, monkeypatch):
+    out = tmp_path / "gas_fees.csv"
+    monkeypatch.setattr(gfb, "OUTPUT_FILE", str(out))
+    legacy_csv(out, extra=("note",))
+    before = out.read_text()
+    with pytest.raises(SystemExit, match="note"):
+        gfb.write_rows([new_row(mock_rpc, 1)], 0, append=True)
+    assert out.read_text() == before
@@ -0,0 +1,86 @@
+# PayoutDaemon._recover on a stub chain: no node, no nonce file on disk
+import sqlite3
+import threading
+import pytest
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+import payout_daemon
+from payout_daemon import PayoutDaemon, SCHEMA
+from conftest import tx_hash, SENDER
+
+MINED = 10
+
+
+class StubEth:
+    def __init__(self, receipts):
+        self.receipts = receipts
+
+    def get_transaction_count(self, addr, block):
+        return MINED
+
+    def get_transaction_receipt(self, h):
+        if h not in self.receipts:
+            raise TransactionNotFound(h)
+        return self.receipts[h]
+
+
+class StubNonces:
+    def __init__(self, hashes):
+        self.known = hashes  # nonce -> [hash]
+
+    def hashes(self, n):
+        return self.known.get(n, [])
+
+    def record(self, n, tx, raw):
+        self.known.setdefault(n, []).append(Web3.to_hex(Web3.keccak(raw)))
+
+    def sync(self):
+        pass
+
+
+class Acct:
+    address = SENDER
+
+
+def daemon(monkeypatch, receipts, hashes, jobs):
+    monkeypatch.setattr(payout_daemon, "Web3", Web3, raising=False)
+    monkeypatch.setattr(payout_daemon, "receipt_columns",
+                        lambda w3, r: (r["blockNumber"], r["gasUsed"], "0.0001", "confirmed"), raising=False)
+    d = PayoutDaemon.__new__(PayoutDaemon)
+    d.w3 = type("W3", (), {"eth": StubEth(receipts)})()
+    d.acct, d.nm = Acct(), StubNonces(hashes)
+    d.db = sqlite3.connect(":memory:", check_same_thread=False)
+    d.db.executescript(SCHEMA)
+    d.lock = threading.RLock()
+    d.cond = threading.Condition(d.lock)
+    d.live, d.inflight = {}, {}
+    for job, (n, h) in enumerate(jobs, 1):
+        d.db.execute("INSERT INTO jobs (id, to_addr, amount, status, nonce, tx_hash, raw, tx) "
+                     "VALUES (?, ?, '1', 'sent', ?, ?, ?, '{}')", (job, SENDER, n, h, "0x" + "%02x" % job))
+    d._recover()
+    return d
+
+
+def status(d, job):
+    return d.db.execute("SELECT status, block, error FROM jobs WHERE id = ?", (job,)).fetchone()
+
+
+def test_mined_job_missing_from_the_nonce_file_is_settled(monkeypatch):
+    d = daemon(monkeypatch, {tx_hash(0): {"blockNumber": 900, "gasUsed": 21000}}, {}, [(3, tx_hash(0))])
+    assert status(d, 1)[:2] == ("confirmed", 900)
+    assert d.inflight == {} and d.live == {}
+
+
+def test_mined_nonce_with_no_receipt_for_our_hash_goes_to_review(monkeypatch):
+    d = daemon(monkeypatch, {}, {}, [(3, tx_hash(0))])
+    st, _, error = status(d, 1)
+    assert st == "review" and "nonce 3" in error
+    assert d.inflight == {}
+
+
+def test_tracked_and_pending_jobs_are_still_watched(monkeypatch):
+    d = daemon(monkeypatch, {}, {3: [tx_hash(0)]}, [(3, tx_hash(0)), (MINED, tx_hash(1))])
+    assert d.inflight == {1: 3, 2: MINED}
+    assert status(d, 1)[0] == status(d, 2)[0] == "sent"
+    assert len(d.nm.hashes(MINED)) == 1  # re-recorded for the rebroadcast
@@ -0,0 +1,36 @@
+# StreamEvaluator.run keeps going past malformed bars
+import asyncio
+import pytest
+
+pytest.importorskip("numpy")
+from pine_stream import StreamEvaluator
+
+
+def run(bars):
+    async def feed():
+        for b in bars:
+            yield b
+
+    ev = StreamEvaluator()
+    asyncio.run(ev.run(feed(), lambda e: None))
+    return ev
+
+
+def bar(symbol, close, **kw):
+    return dict({"symbol": symbol, "open": close, "high": close + 1, "low": close - 1,
+                 "close": close, "volume": 10}, **kw)
+
+
+def test_malformed_bars_are_skipped(capsys):
+    ev = run([bar("A", 1), {"symbol": "B", "open": 1}, bar("A", 2, high="x"), "junk",
+              {"open": 1}, bar("A", 3)])
+    assert ev.bars == 2 and ev.symbols["A"].bar == 1 and "B" not in ev.symbols
+    assert capsys.readouterr().err.count("[skip]") == 4
+
+
+def test_non_finite_inputs_never_reach_the_indicators(capsys):
+    ev = run([bar("A", 1), bar("A", 2, volume="nan"), bar("A", float("inf")), bar("A", 3)])
+    assert ev.bars == 2
+    vma = ev.symbols["A"].volume_ma
+    assert vma.total == 20.0 and list(vma.ring[:2]) == [10.0, 10.0]
+    assert capsys.readouterr().err.count("[skip] non-finite") == 2
@@ -0,0 +1,74 @@
+# RpcPool write handling against two mock nodes (conftest.py)
+import pytest
+from web3 import Web3
+from eth_account import Account
+
+from rpc_pool import RpcPool
+
+ACCT = Account.from_key("0x" + "22" * 32)
+
+
+def signed_raw(nonce=0):
+    tx = {"chainId": 8453, "to": ACCT.address, "value": 0, "nonce": nonce, "gas": 21000, "type": 2,
+          "maxFeePerGas": 10**9, "maxPriorityFeePerGas": 10**8}
+    signed = ACCT.sign_transaction(tx)
+    raw = getattr(signed, "rawTransaction", None) or getattr(signed, "raw_transaction")
+    return Web3.to_hex(raw), Web3.to_hex(Web3.keccak(raw))
+
+
+@pytest.fixture
+def nodes(make_mock_rpc):
+    a, b = make_mock_rpc(), make_mock_rpc()
+    return a, b, Web3(RpcPool([a.url, b.url]))
+
+
+def sends(node):
+    return sum(p.count("eth_sendRawTransaction") for p in node.posts)
+
+
+@pytest.mark.parametrize("answer", ["already known", "nonce too low: next nonce 1, tx nonce 0"])
+def test_resend_after_failover_counts_as_sent(nodes, answer):
+    a, b, w3 = nodes
+    a.fail["eth_sendRawTransaction"] = 1  # took the tx, then the request failed
+    b.send_error = answer                 # the second node has already seen it
+    raw, txh = signed_raw()
+    assert Web3.to_hex(w3.eth.send_raw_transaction(raw)) == txh
+    assert sends(a) == sends(b) == 1
+
+
+def test_same_error_without_failover_is_still_an_error(nodes):
+    a, b, w3 = nodes
+    a.send_error = "nonce too low"
+    with pytest.raises(Exception, match="nonce too low"):
+        w3.eth.send_raw_transaction(signed_raw()[0])
+    assert sends(b) == 0
+
+
+def test_batched_resends_after_failover_count_as_sent(nodes):
+    a, b, w3 = nodes
+    a.fail["eth_sendRawTransaction"] = 1
+    b.send_error = "already known"
+    txs = [signed_raw(n) for n in range(3)]
+    payload = [{"jsonrpc": "2.0", "id": i, "method": "eth_sendRawTransaction", "params": [raw]}
+               for i, (raw, _) in enumerate(txs)]
+    resp = w3.provider.send_raw(payload)
+    assert [item["result"] for item in resp] == [txh for _, txh in txs]
+
+
+def test_pending_nonce_reads_stick_to_one_node(nodes):
+    a, b, w3 = nodes
+    a.nonce, b.nonce = 7, 5  # b's mempool lags
+    for ep in w3.provider.endpoints:
+        ep.latency = 1.0 if ep.url == a.url else 0.001  # b looks healthier
+    counts = {w3.eth.get_transaction_count(ACCT.address, "pending") for _ in range(10)}
+    assert counts == {7}
+    assert not any("eth_getTransactionCount" in p for p in b.posts)
+
+
+def test_pending_nonce_follows_the_node_that_took_the_last_write(nodes):
+    a, b, w3 = nodes
+    a.nonce, b.nonce = 5, 6
+    a.fail["eth_sendRawTransaction"] = 1
+    b.send_error = "already known"
+    w3.eth.send_raw_transaction(signed_raw()[0])
+    assert w3.eth.get_transaction_count(ACCT.address, "pending") == 6
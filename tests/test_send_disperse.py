@@ -0,0 +1,98 @@
+# Disperse mode of send_veronica_batch.py on an eth-tester chain: the token and
+# Disperse contracts are compiled from tests/contracts with vyper at setup.
+import os
+from decimal import Decimal
+import pytest
+
+pytest.importorskip("eth_tester")
+vyper = pytest.importorskip("vyper")
+
+from web3 import Web3, EthereumTesterProvider
+from eth_account import Account
+import send_veronica_batch as svb
+from fee_oracle import FeeOracle
+from nonce_manager import NonceManager
+
+CONTRACTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "contracts")
+SENDER_KEY = "0x" + "00" * 31 + "01"  # eth-tester's first funded account
+PAYEES = [Web3.to_checksum_address("0x" + "%040x" % (0xB0 + i)) for i in range(3)]
+
+
+def deploy(w3, name, *args):
+    with open(os.path.join(CONTRACTS, name), encoding="utf-8") as f:
+        out = vyper.compile_code(f.read(), output_formats=["abi", "bytecode"])
+    factory = w3.eth.contract(abi=out["abi"], bytecode=out["bytecode"])
+    txh = factory.constructor(*args).transact({"from": w3.eth.accounts[0]})
+    return w3.eth.contract(w3.eth.wait_for_transaction_receipt(txh).contractAddress, abi=out["abi"])
+
+
+class Rows:
+    def __init__(self):
+        self.out = {}
+
+    def put(self, idx, out):
+        self.out[idx] = out
+
+
+@pytest.fixture
+def chain(tmp_path, monkeypatch):
+    w3 = Web3(EthereumTesterProvider())
+    acct = Account.from_key(SENDER_KEY)
+    assert acct.address == w3.eth.accounts[0]
+    token = deploy(w3, "Token.vy", 10**24)
+    disperse = deploy(w3, "Disperse.vy")
+    monkeypatch.setenv("CHAIN_ID", str(w3.eth.chain_id))
+    monkeypatch.setattr(svb, "DISPERSE_ADDR", disperse.address)
+    monkeypatch.setattr(svb, "MAX_PER_TX", Decimal("100"))
+    monkeypatch.setattr(svb, "AUTO_SPLIT_OVER_50K", True)  # 150 -> two transfers of 100 + 50
+    oracle = FeeOracle(w3, background=False)
+    nm = NonceManager(w3, acct, path=str(tmp_path / "nonces.json"))
+    token = w3.eth.contract(token.address, abi=svb.ERC20_ABI)
+
+    def run(amounts):
+        rows = Rows()
+        csv_rows = [(i, {"to": to, "amount": a}) for i, (to, a) in enumerate(zip(PAYEES, amounts))]
+        svb.run_disperse(w3, acct, token, csv_rows, rows, None, lambda: 18, None,
+                         lambda: oracle, lambda a: nm, None)
+        return rows.out
+
+    return w3, acct, token, disperse, run
+
+
+def test_disperse_pays_every_row_in_one_tx_with_gas_shares(chain):
+    w3, acct, token, disperse, run = chain
+    nonce0 = w3.eth.get_transaction_count(acct.address)
+    out = run(["10", "150", "2.5"])
+
+    # approve (exactly the batch total, all of it pulled) + one disperse tx
+    assert w3.eth.get_transaction_count(acct.address) == nonce0 + 2
+    assert token.functions.allowance(acct.address, disperse.address).call() == 0
+    assert [token.functions.balanceOf(p).call() for p in PAYEES] == \
+        [10 * 10**18, 150 * 10**18, 25 * 10**17]
+
+    assert {r["status"] for r in out.values()} == {"confirmed"}
+    hashes = {r["tx_hashes"] for r in out.values()}
+    assert len(hashes) == 1
+    rcpt = w3.eth.get_transaction_receipt(hashes.pop())
+    assert rcpt.to == disperse.address
+    assert len(rcpt.logs) == 1 + 4  # transferFrom of the total, then one Transfer per chunk
+
+    # gas and fee are split by transfer count: 1/4, 2/4, 1/4
+    gas = [out[i]["gas_used"] for i in range(3)]
+    assert gas == [rcpt.gasUsed // 4, rcpt.gasUsed // 2, rcpt.gasUsed // 4]
+    fee = Decimal(rcpt.gasUsed) * Decimal(rcpt.effectiveGasPrice) / Decimal(10**18)
+    fees = [Decimal(out[i]["fee_eth"]) for i in range(3)]
+    assert fees[1] == 2 * fees[0] == 2 * fees[2]
+    assert abs(sum(fees) - fee) <= Decimal(10) ** -17
+
+
+def test_disperse_skips_approve_when_allowance_covers_the_batch(chain, monkeypatch):
+    w3, acct, token, disperse, run = chain
+    monkeypatch.setattr(svb, "DISPERSE_ALLOWANCE", Decimal("1000"))
+    run(["1", "1", "1"])
+    assert token.functions.allowance(acct.address, disperse.address).call() == 997 * 10**18
+    nonce = w3.eth.get_transaction_count(acct.address)
+    out = run(["1", "2", "3"])
+    assert w3.eth.get_transaction_count(acct.address) == nonce + 1  # no second approve
+    assert token.functions.allowance(acct.address, disperse.address).call() == 991 * 10**18
+    assert {r["status"] for r in out.values()} == {"confirmed"}
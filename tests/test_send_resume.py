@@ -0,0 +1,79 @@
+# Resuming "sent" rows in send_veronica_batch.py when the NonceManager replaced
+# the original tx: the replacement hash lives only in the nonce state file.
+import json
+import pytest
+from web3.datastructures import AttributeDict
+from web3.exceptions import TransactionNotFound
+from eth_account import Account
+
+import send_veronica_batch as svb
+from nonce_manager import NonceManager
+from payout_journal import PayoutJournal
+
+ACCT = Account.from_key("0x" + "11" * 32)
+PAYEE = "0x00000000000000000000000000000000000000Bb"
+ORIGINAL, REPLACEMENT = "0x" + "aa" * 32, "0x" + "bb" * 32
+
+
+class FakeEth:
+    # chain where nonce 3 is mined, by the replacement tx only
+    def __init__(self):
+        self.gas_price = 10**9
+
+    def get_transaction_count(self, addr, tag="latest"):
+        return 4
+
+    def get_transaction_receipt(self, h):
+        if h != REPLACEMENT:
+            raise TransactionNotFound(h)
+        return AttributeDict({"transactionHash": h, "blockNumber": 77, "gasUsed": 50_000,
+                              "effectiveGasPrice": 2 * 10**9, "status": 1})
+
+
+class FakeWeb3:
+    eth = FakeEth()
+
+
+@pytest.fixture
+def nm(tmp_path):
+    state = {"address": ACCT.address, "next": 4, "free": [],
+             "pending": {"3": {"tx": None, "raw": "0x", "hashes": [ORIGINAL, REPLACEMENT], "sent_at": 0}}}
+    path = tmp_path / "nonces.json"
+    path.write_text(json.dumps(state))
+    return NonceManager(FakeWeb3(), ACCT, path=str(path))
+
+
+def resolve(row, nm):
+    siblings = svb.sibling_hashes(lambda acct: nm, [ACCT])
+    out, to, _ = svb.prepare_row(row, FakeWeb3(), None, lambda: 100, siblings)
+    assert to is None  # never sent again
+    return out
+
+
+def test_sent_row_resolves_through_a_replacement(nm):
+    assert nm.siblings(ORIGINAL) == [ORIGINAL, REPLACEMENT]
+    out = resolve({"to": PAYEE, "amount": "1", "status": "sent", "tx_hashes": ORIGINAL}, nm)
+    assert out["status"] == "confirmed" and out["tx_hashes"] == REPLACEMENT
+    assert out["block"] == 77 and out["fee_eth"] == str(svb.Decimal(50_000 * 2 * 10**9) / 10**18)
+
+
+def test_unknown_hash_stays_sent(nm):
+    out = resolve({"to": PAYEE, "amount": "1", "status": "sent", "tx_hashes": "0x" + "cc" * 32}, nm)
+    assert out["status"] == "sent"
+
+
+def test_journaled_row_resolves_through_a_replacement(nm, tmp_path):
+    inp, outp = tmp_path / "in.csv", tmp_path / "out.csv"
+    inp.write_text("to,amount\n")
+    outp.write_text("")
+    journal = PayoutJournal(str(tmp_path / "out.journal"), str(inp))
+    journal.start(0, 0)
+    journal.intent(0, 0, 1, ACCT.address, 3, ORIGINAL)  # crash right after the broadcast
+    journal.close()
+
+    journal = PayoutJournal(str(tmp_path / "out.journal"), str(inp))
+    assert journal.resume(str(outp))
+    row = journal.apply(0, {"to": PAYEE, "amount": "1"})
+    assert row["status"] == "sent" and row["tx_hashes"] == ORIGINAL
+    out = resolve(row, nm)
+    assert out["status"] == "confirmed" and out["tx_hashes"] == REPLACEMENT
@@ -0,0 +1,36 @@
+# venice.py bench against its built-in mock upstream: no network, no API key
+import csv
+import json
+import pytest
+
+pytest.importorskip("aiohttp")
+import venice_bench
+
+
+def bench(tmp_path, *argv):
+    js, rows = tmp_path / "bench.json", tmp_path / "bench.csv"
+    venice_bench.main(["--mock", "--json-out", str(js), "--csv-out", str(rows), *argv])
+    with open(js, encoding="utf-8") as f:
+        summary = json.load(f)
+    with open(rows, newline="", encoding="utf-8") as f:
+        return summary, list(csv.DictReader(f))
+
+
+def test_open_loop_run_counts_queueing_in_latency(tmp_path):
+    # 200 req/s offered to 2 sessions of ~50ms: most requests wait for a slot
+    summary, rows = bench(tmp_path, "--requests", "30", "--rps", "200", "--concurrency", "2", "--stream")
+    assert summary["requests"] == summary["ok"] == len(rows) == 30
+    assert summary["errors"] == {}
+    assert set(summary["queue_s"]) == {"p50", "p95", "p99"}
+    assert summary["queue_s"]["p95"] > 0.1
+    for r in rows:
+        queued, latency, ttft = float(r["queue_s"]), float(r["latency_s"]), float(r["ttft_s"])
+        assert 0 <= queued < ttft <= latency  # measured from the scheduled arrival
+        assert int(r["tokens"]) > 0
+    assert summary["latency_s"]["p95"] >= summary["queue_s"]["p95"]
+
+
+def test_closed_loop_run_has_no_queueing(tmp_path):
+    summary, rows = bench(tmp_path, "--requests", "10", "--concurrency", "5")
+    assert summary["requests"] == summary["ok"] == len(rows) == 10
+    assert all(float(r["queue_s"]) == 0 for r in rows)
@@ -0,0 +1,62 @@
+# venice_proxy.py request validation and mid-stream upstream failures,
+# against a local aiohttp upstream: no network, no API key
+import json
+import asyncio
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+import venice_proxy
+
+
+async def upstream_chat(request):
+    # streams one chunk, then drops the connection mid-body
+    resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await resp.prepare(request)
+    chunk = {"id": "up", "choices": [{"index": 0, "delta": {"content": "hello"}, "finish_reason": None}]}
+    await resp.write(f"data: {json.dumps(chunk)}\n\n".encode())
+    await asyncio.sleep(0.05)
+    request.transport.close()
+    return resp
+
+
+async def start(app):
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+
+async def post(bodies, raw=False):
+    up = web.Application()
+    up.router.add_post("/chat/completions", upstream_chat)
+    up_runner, base = await start(up)
+    runner, url = await start(venice_proxy.make_app(base, "test"))
+    out = []
+    try:
+        async with aiohttp.ClientSession() as s:
+            for body in bodies:
+                kw = {"data": body} if raw else {"json": body}
+                async with s.post(url + "/api/v1/chat/completions", **kw) as r:
+                    out.append((r.status, await r.text()))
+    finally:
+        await runner.cleanup()
+        await up_runner.cleanup()
+    return out
+
+
+@pytest.mark.parametrize("body", [[1, 2], "hi", {"messages": [], "max_tokens": "100"},
+                                  {"messages": [], "max_tokens": 1.5}, {"messages": [], "max_tokens": True}])
+def test_bad_bodies_are_a_400(body):
+    [(status, text)] = asyncio.run(post([body]))
+    assert status == 400 and json.loads(text)["error"] == "invalid_request"
+
+
+def test_upstream_failure_after_headers_ends_the_stream_with_an_error_event():
+    [(status, text)] = asyncio.run(post([{"messages": [], "stream": True, "max_tokens": 50}]))
+    assert status == 200
+    events = [json.loads(line[5:]) for line in text.split("\n\n") if line.startswith("data:")]
+    assert events[0]["choices"][0]["delta"]["content"] == "hello"
+    assert events[-1]["error"]["type"] == "proxy_error"
+    assert "[DONE]" not in text
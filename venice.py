@@ -7,6 +7,10 @@ Simple tester for Venice.ai (OpenAI-compatible) chat/completions endpoint.
 Usage:
   export VENICE_API_KEY="wvOH0kYOVHG7Nqgjd3Ft4nagJztR30fsOLgg5W2TaN"
   python3 test_venice.py --model qwen3-235b --prompt "Say hello in one line"
+  python3 test_venice.py --stream --prompt "Say hello"   # SSE, prints TTFT / tokens/sec
+  python3 test_venice.py bench --help                      # load generator (venice_bench.py)
+  python3 test_venice.py chat --session s.json --budget 2000  # multi-turn, token-budgeted (venice_session.py)
+  python3 test_venice.py --cache venice_cache.sqlite3      # reuse identical answers (venice_cache.py)
 
 Requirements:
   pip install requests
@@ -15,13 +19,167 @@ Requirements:
 import os
 import sys
 import json
+import time
 import argparse
 import requests
 
+from rpc_metrics import instrument_session
+
 DEFAULT_BASE = "https://api.venice.ai/api/v1"
 DEFAULT_MODEL = "qwen3-4b"
 
+# one keep-alive session; per-endpoint call counts / latency land in rpc_metrics
+SESSION = instrument_session(requests.Session(), "venice")
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+
+class ThinkStripper:
+    """Incrementally removes <think>...</think> spans from streamed text.
+
+    Tags may be split across chunks, so a trailing fragment that could still
+    become a tag is held back until the next feed() (or flush()).
+    """
+
+    def __init__(self):
+        self.in_think = False
+        self.pending = ""
+
+    def feed(self, chunk):
+        buf = self.pending + chunk
+        self.pending = ""
+        out = []
+        i = 0
+        while i < len(buf):
+            tag = THINK_CLOSE if self.in_think else THINK_OPEN
+            j = buf.find("<", i)
+            if j < 0:
+                if not self.in_think:
+                    out.append(buf[i:])
+                break
+            if not self.in_think:
+                out.append(buf[i:j])
+            head = buf[j:j + len(tag)]
+            if head.lower() == tag:
+                self.in_think = not self.in_think
+                i = j + len(tag)
+            elif tag.startswith(head.lower()):
+                self.pending = buf[j:]  # partial tag at end of chunk; wait for more
+                break
+            else:
+                if not self.in_think:
+                    out.append("<")
+                i = j + 1
+        return "".join(out)
+
+    def flush(self):
+        rest, self.pending = self.pending, ""
+        return "" if self.in_think else rest
+
+
+def venice_parameters(strip_thinking=False):
+    return {
+        "strip_thinking_response": strip_thinking,
+        "disable_thinking": False,
+        "include_venice_system_prompt": True
+    }
+
+
+def build_payload(args, messages=None):
+    return {
+        "model": args.model,
+        "messages": messages or [
+            {"role": "user", "content": args.prompt}
+        ],
+        "max_tokens": args.max_tokens,
+        **({"temperature": args.temperature} if getattr(args, "temperature", None) is not None else {}),
+        "venice_parameters": venice_parameters(args.strip_thinking)
+    }
+
+
+def iter_sse(resp):
+    """Yield decoded JSON objects from an OpenAI-style SSE stream until [DONE]."""
+    for line in resp.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        try:
+            yield json.loads(data)
+        except ValueError:
+            continue
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * (len(s) - 1) + 0.5))]
+
+
+def stream_chat(url, headers, payload, timeout, out=sys.stdout):
+    """POST with stream=true, print visible text as it arrives, return timing metrics."""
+    payload = dict(payload, stream=True, stream_options={"include_usage": True})
+    stripper = ThinkStripper()
+    t0 = time.perf_counter()
+    first_raw = first_visible = last = None
+    gaps = []
+    chunks = 0
+    usage = None
+    text = []
+    with SESSION.post(url, headers=headers, json=payload, timeout=timeout, stream=True) as resp:
+        if resp.status_code != 200:
+            return {"status": resp.status_code, "error": resp.text.strip()[:500]}
+        for obj in iter_sse(resp):
+            if obj.get("usage"):
+                usage = obj["usage"]
+            choices = obj.get("choices") or []
+            delta = (choices[0].get("delta") or {}).get("content") if choices else None
+            if not delta:
+                continue
+            now = time.perf_counter()
+            if first_raw is None:
+                first_raw = now
+            if last is not None:
+                gaps.append(now - last)
+            last = now
+            chunks += 1
+            visible = stripper.feed(delta)
+            if visible:
+                if first_visible is None:
+                    first_visible = now
+                text.append(visible)
+                out.write(visible)
+                out.flush()
+        text.append(stripper.flush())
+        out.write(text[-1] + "\n")
+    end = time.perf_counter()
+    tokens = (usage or {}).get("completion_tokens") or chunks
+    gen_time = (end - first_raw) if first_raw is not None else 0.0
+    return {
+        "status": 200,
+        "ttft_s": None if first_raw is None else first_raw - t0,
+        "ttft_visible_s": None if first_visible is None else first_visible - t0,
+        "itl_p50_s": percentile(gaps, 0.5),
+        "itl_p95_s": percentile(gaps, 0.95),
+        "tokens": tokens,
+        "tokens_per_s": tokens / gen_time if gen_time > 0 else 0.0,
+        "total_s": end - t0,
+        "text": "".join(text),
+        "usage": usage,
+    }
+
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        from venice_bench import main as bench_main
+        return bench_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "chat":
+        from venice_session import main as chat_main
+        return chat_main(sys.argv[2:])
+
     p = argparse.ArgumentParser(description="Test Venice (OpenAI-compatible) chat/completions")
     p.add_argument("--base", default=os.getenv("VENICE_BASE_URL", DEFAULT_BASE),
                    help=f"Venice base URL (default {DEFAULT_BASE})")
@@ -32,6 +190,12 @@ def main():
     p.add_argument("--max-tokens", type=int, default=500, help="max_tokens (increased default for better responses)")
     p.add_argument("--timeout", type=float, default=30.0, help="HTTP timeout (seconds)")
     p.add_argument("--strip-thinking", action="store_true", help="Strip thinking content from response")
+    p.add_argument("--temperature", type=float, default=None, help="Sampling temperature (omitted if unset)")
+    p.add_argument("--stream", action="store_true",
+                   help="Stream the reply (SSE), strip <think> on the fly and report TTFT / inter-token latency / tokens/sec")
+    p.add_argument("--cache", metavar="PATH",
+                   help="Answer identical requests from a response cache persisted at PATH (SQLite)")
+    p.add_argument("--cache-ttl", type=float, default=3600.0, help="Response cache TTL in seconds")
     args = p.parse_args()
 
     if not args.key:
@@ -44,36 +208,54 @@ def main():
         "Content-Type": "application/json"
     }
 
-    payload = {
-        "model": args.model,
-        "messages": [
-            {"role": "user", "content": args.prompt}
-        ],
-        "max_tokens": args.max_tokens,
-        "venice_parameters": {
-            "strip_thinking_response": args.strip_thinking,
-            "disable_thinking": False,
-            "include_venice_system_prompt": True
-        }
-    }
+    payload = build_payload(args)
 
     print(f"POST {url}")
     # don't print the key
     print(f"Using model: {args.model}; prompt: {args.prompt!r}")
 
+    if args.stream:
+        try:
+            m = stream_chat(url, headers, payload, args.timeout)
+        except requests.RequestException as e:
+            print("Network error while calling Venice:", e, file=sys.stderr)
+            sys.exit(3)
+        if m["status"] != 200:
+            print("HTTP", m["status"])
+            print(m["error"])
+            sys.exit(1)
+        fmt = lambda v: "n/a" if v is None else f"{v * 1000:.0f} ms"
+        print(f"\nTTFT: {fmt(m['ttft_s'])} (first visible token: {fmt(m['ttft_visible_s'])})")
+        print(f"Inter-token latency: p50 {fmt(m['itl_p50_s'])}, p95 {fmt(m['itl_p95_s'])}")
+        print(f"Tokens: {m['tokens']} in {m['total_s']:.2f}s -> {m['tokens_per_s']:.1f} tokens/s")
+        return
+
+    def fetch():
+        resp = SESSION.post(url, headers=headers, json=payload, timeout=args.timeout)
+        return {"status": resp.status_code, "content_type": resp.headers.get("Content-Type", ""),
+                "body": resp.text}
+
+    cache = None
+    if args.cache:
+        from venice_cache import ResponseCache
+        cache = ResponseCache(ttl=args.cache_ttl, disk_path=args.cache)
+
     try:
-        resp = requests.post(url, headers=headers, json=payload, timeout=args.timeout)
+        result = cache.get_or_fetch(payload, fetch) if cache else fetch()
     except requests.RequestException as e:
         print("Network error while calling Venice:", e, file=sys.stderr)
         sys.exit(3)
 
-    print("HTTP", resp.status_code)
+    status = result["status"]
+    print("HTTP", status)
+    if cache:
+        print("Cache:", json.dumps(cache.stats()))
     # Try to pretty-print JSON if possible
-    ct = resp.headers.get("Content-Type", "")
-    body_text = resp.text.strip()
+    ct = result["content_type"]
+    body_text = result["body"].strip()
     if "application/json" in ct or (body_text.startswith("{") or body_text.startswith("[")):
         try:
-            j = resp.json()
+            j = json.loads(body_text)
             print(json.dumps(j, indent=2, ensure_ascii=False))
         except Exception:
             print("Response not valid JSON; raw body below:\n")
@@ -83,9 +265,9 @@ def main():
         print(body_text)
 
     # Quick diagnostic: if validation error present, try to show details
-    if resp.status_code == 400:
+    if status == 400:
         try:
-            j = resp.json()
+            j = json.loads(body_text)
             # Venice often provides helpful validation messages
             if isinstance(j, dict):
                 if "errors" in j:
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+venice_bench.py
+
+Load generator for the Venice (OpenAI-compatible) chat/completions endpoint.
+Drives N concurrent sessions at a target request rate over one pooled
+aiohttp client and records latency / TTFT percentiles and error classes.
+
+Usage:
+  python3 venice.py bench --concurrency 20 --rps 10 --requests 200 --stream
+  python3 venice.py bench --prompts prompts.txt --json-out bench.json --csv-out bench.csv
+  python3 venice.py bench --mock --requests 500 --rps 100   # offline, built-in mock server
+
+Prompt files: one prompt per line, or JSONL with {"prompt": ...} or {"messages": [...]}.
+
+Requirements:
+  pip install aiohttp
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import random
+import asyncio
+import argparse
+import aiohttp
+from aiohttp import web
+
+from venice import DEFAULT_BASE, DEFAULT_MODEL, ThinkStripper, build_payload, percentile
+
+MOCK_REPLY = ["<think>", "short plan", "</think>", "Hello", " there", ",", " how", " can", " I", " help", "?"]
+
+
+def load_prompts(path, default):
+    if not path:
+        return [[{"role": "user", "content": default}]]
+    prompts = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                obj = json.loads(line)
+                prompts.append(obj.get("messages") or [{"role": "user", "content": obj["prompt"]}])
+            else:
+                prompts.append([{"role": "user", "content": line}])
+    if not prompts:
+        raise SystemExit(f"No prompts in {path}")
+    return prompts
+
+
+def error_class(exc=None, status=None):
+    if status is not None:
+        return f"http_{status // 100}xx" if status != 429 else "http_429"
+    if isinstance(exc, asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(exc, aiohttp.ClientConnectionError):
+        return "connection"
+    if isinstance(exc, (ValueError, aiohttp.ContentTypeError)):
+        return "parse"
+    return type(exc).__name__
+
+
+async def one_request(session, url, payload, timeout, t0=None):
+    # t0 is the request's scheduled arrival (perf_counter) in open-loop mode, so
+    # time spent waiting for a free session counts toward latency and TTFT
+    sent = time.perf_counter()
+    t0 = sent if t0 is None else t0
+    rec = {"start": time.time(), "status": None, "latency_s": None, "ttft_s": None,
+           "ttft_visible_s": None, "queue_s": sent - t0, "tokens": 0, "error": ""}
+    deltas = 0
+    try:
+        async with session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            rec["status"] = resp.status
+            if resp.status != 200:
+                await resp.read()
+                rec["error"] = error_class(status=resp.status)
+            elif payload.get("stream"):
+                stripper = ThinkStripper()
+                async for raw in resp.content:
+                    line = raw.decode("utf-8", "replace").strip()
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    obj = json.loads(data)
+                    if obj.get("usage"):
+                        rec["tokens"] = obj["usage"].get("completion_tokens") or 0
+                    choices = obj.get("choices") or []
+                    delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                    if not delta:
+                        continue
+                    now = time.perf_counter() - t0
+                    if rec["ttft_s"] is None:
+                        rec["ttft_s"] = now
+                    if rec["ttft_visible_s"] is None and stripper.feed(delta):
+                        rec["ttft_visible_s"] = now
+                    deltas += 1
+                rec["tokens"] = rec["tokens"] or deltas
+            else:
+                body = await resp.json(content_type=None)
+                rec["tokens"] = (body.get("usage") or {}).get("completion_tokens") or 0
+                rec["ttft_s"] = time.perf_counter() - t0  # whole body is the first token
+    except Exception as e:
+        rec["error"] = error_class(exc=e)
+    rec["latency_s"] = time.perf_counter() - t0
+    return rec
+
+
+async def run_load(args, url, headers, prompts):
+    connector = aiohttp.TCPConnector(limit=args.concurrency, keepalive_timeout=60)
+    sem = asyncio.Semaphore(args.concurrency)
+    results = []
+
+    async with aiohttp.ClientSession(headers=headers, connector=connector) as session:
+        async def fire(i, arrival):
+            # open loop: measure from the scheduled arrival, taken before waiting on
+            # the semaphore, so a backed-up server can't hide its queueing delay
+            async with sem:
+                payload = build_payload(args, prompts[i % len(prompts)])
+                if args.stream:
+                    payload["stream"] = True
+                    payload["stream_options"] = {"include_usage": True}
+                results.append(await one_request(session, url, payload, args.timeout, arrival))
+
+        t0 = time.perf_counter()
+        tasks = []
+        due = t0
+        for i in range(args.requests):
+            if args.rps > 0:
+                # open loop: Poisson arrivals at the target rate; the semaphore caps sessions.
+                # Arrivals follow a fixed schedule so a slow event loop doesn't lower the rate.
+                due += random.expovariate(args.rps)
+                await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            tasks.append(asyncio.create_task(fire(i, due if args.rps > 0 else None)))
+        await asyncio.gather(*tasks)
+        wall = time.perf_counter() - t0
+    return results, wall
+
+
+def histogram(values, buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)):
+    counts = {f"le_{b}": 0 for b in buckets}
+    counts["inf"] = 0
+    for v in values:
+        for b in buckets:
+            if v <= b:
+                counts[f"le_{b}"] += 1
+                break
+        else:
+            counts["inf"] += 1
+    return counts
+
+
+def summarize(results, wall, args):
+    ok = [r for r in results if not r["error"]]
+    lat = [r["latency_s"] for r in ok]
+    ttft = [r["ttft_s"] for r in ok if r["ttft_s"] is not None]
+    ttfv = [r["ttft_visible_s"] for r in ok if r["ttft_visible_s"] is not None]
+    queue = [r["queue_s"] for r in results]
+    errors = {}
+    for r in results:
+        if r["error"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    pct = lambda v: {"p50": percentile(v, 0.5), "p95": percentile(v, 0.95), "p99": percentile(v, 0.99)}
+    return {
+        "requests": len(results),
+        "ok": len(ok),
+        "errors": errors,
+        "concurrency": args.concurrency,
+        "target_rps": args.rps,
+        "achieved_rps": len(results) / wall if wall else 0.0,
+        "wall_s": wall,
+        "latency_s": pct(lat),
+        "latency_histogram": histogram(lat),
+        "ttft_s": pct(ttft),
+        "ttft_visible_s": pct(ttfv),
+        "queue_s": pct(queue),
+        "tokens_per_s": sum(r["tokens"] for r in ok) / wall if wall else 0.0,
+    }
+
+
+async def mock_chat(request):
+    body = await request.json()
+    await asyncio.sleep(random.uniform(0.02, 0.08))
+    if body.get("stream"):
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        for tok in MOCK_REPLY:
+            chunk = {"object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": tok}}]}
+            await resp.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await asyncio.sleep(0.005)
+        usage = {"choices": [], "usage": {"prompt_tokens": 8, "completion_tokens": len(MOCK_REPLY)}}
+        await resp.write(f"data: {json.dumps(usage)}\n\ndata: [DONE]\n\n".encode())
+        await resp.write_eof()
+        return resp
+    return web.json_response({
+        "id": "mock", "object": "chat.completion", "model": body.get("model"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(MOCK_REPLY)},
+                     "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 8, "completion_tokens": len(MOCK_REPLY)},
+    })
+
+
+async def start_mock(port=0):
+    app = web.Application()
+    app.router.add_post("/chat/completions", mock_chat)
+    app.router.add_post("/api/v1/chat/completions", mock_chat)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def amain(args):
+    runner = None
+    base = args.base
+    if args.mock:
+        runner, base = await start_mock()
+        print(f"Mock server on {base}")
+    url = base.rstrip("/") + "/chat/completions"
+    headers = {"Authorization": f"Bearer {args.key or 'mock'}", "Content-Type": "application/json"}
+    prompts = load_prompts(args.prompts, args.prompt)
+
+    print(f"POST {url} x{args.requests} | concurrency {args.concurrency} | "
+          f"rps {args.rps or 'closed-loop'} | stream {args.stream}")
+    try:
+        results, wall = await run_load(args, url, headers, prompts)
+    finally:
+        if runner:
+            await runner.cleanup()
+    return results, wall
+
+
+def write_csv(path, results):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+        w.writeheader()
+        w.writerows(sorted(results, key=lambda r: r["start"]))
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="venice.py bench", description="Load-test Venice chat/completions")
+    p.add_argument("--base", default=os.getenv("VENICE_BASE_URL", DEFAULT_BASE), help="Venice base URL")
+    p.add_argument("--key", default=os.getenv("VENICE_API_KEY"), help="Venice API key (or VENICE_API_KEY)")
+    p.add_argument("--model", default=DEFAULT_MODEL, help=f"Model id (default {DEFAULT_MODEL})")
+    p.add_argument("--prompt", default="Say hello in one line", help="Prompt used when --prompts is not given")
+    p.add_argument("--prompts", help="File with one prompt per line, or JSONL {prompt|messages}")
+    p.add_argument("--max-tokens", type=int, default=200)
+    p.add_argument("--strip-thinking", action="store_true", help="Ask Venice to strip thinking content")
+    p.add_argument("--concurrency", type=int, default=10, help="Max concurrent sessions / pooled connections")
+    p.add_argument("--rps", type=float, default=0.0, help="Target request rate; 0 = closed loop")
+    p.add_argument("--requests", type=int, default=100, help="Total requests to send")
+    p.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout (seconds)")
+    p.add_argument("--stream", action="store_true", help="Use SSE streaming (needed for real TTFT)")
+    p.add_argument("--mock", action="store_true", help="Run against a built-in local mock server")
+    p.add_argument("--json-out", help="Write the summary as JSON")
+    p.add_argument("--csv-out", help="Write per-request rows as CSV")
+    args = p.parse_args(argv)
+
+    if not args.key and not args.mock:
+        print("ERROR: No API key provided. Set VENICE_API_KEY or pass --key.", file=sys.stderr)
+        sys.exit(2)
+
+    results, wall = asyncio.run(amain(args))
+    summary = summarize(results, wall, args)
+    ms = lambda d: ", ".join(f"{k} {v * 1000:.0f}ms" for k, v in d.items())
+    print(f"\n{summary['ok']}/{summary['requests']} ok in {wall:.2f}s "
+          f"({summary['achieved_rps']:.1f} req/s, {summary['tokens_per_s']:.0f} tokens/s)")
+    print("latency:", ms(summary["latency_s"]))
+    print("ttft:   ", ms(summary["ttft_s"]))
+    if args.stream:
+        print("ttft (visible):", ms(summary["ttft_visible_s"]))
+    if args.rps > 0:
+        print("queued: ", ms(summary["queue_s"]))
+    if summary["errors"]:
+        print("errors:", summary["errors"])
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print("Saved:", args.json_out)
+    if args.csv_out and results:
+        write_csv(args.csv_out, results)
+        print("Saved:", args.csv_out)
+
+
+if __name__ == "__main__":
+    main()
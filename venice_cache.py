@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+venice_cache.py
+
+Response cache for Venice chat/completions.
+
+Identical requests (every payload field but stream, with messages
+normalized) are answered from an in-memory LRU
+with a TTL, backed by an optional SQLite tier that survives restarts.
+Concurrent identical requests are coalesced ("single flight"): only the first
+caller goes upstream, the rest wait for its result.
+
+Only successful, non-streaming responses are cached.
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import asyncio
+import threading
+from collections import OrderedDict
+
+NON_KEY_FIELDS = ("stream", "stream_options")  # transport only; every other field shapes the completion
+DEFAULT_TTL = 3600.0
+DEFAULT_MAX_ENTRIES = 1024
+
+
+def _normalize_message(m):
+    content = m.get("content")
+    if isinstance(content, str):
+        content = " ".join(content.split())  # whitespace-insensitive
+    out = {"role": m.get("role"), "content": content}
+    if m.get("name"):
+        out["name"] = m["name"]
+    return out
+
+
+def cache_key(payload):
+    """Stable sha256 over every field that determines the completion (top_p, n, stop included)."""
+    norm = {k: v for k, v in payload.items() if k not in NON_KEY_FIELDS and v is not None}
+    norm["messages"] = [_normalize_message(m) for m in norm.get("messages") or []]
+    blob = json.dumps(norm, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def cacheable(payload):
+    return not payload.get("stream")
+
+
+class ResponseCache:
+    """LRU/TTL memory tier + optional SQLite tier + single-flight coalescing.
+
+    Values are plain JSON-serializable dicts, e.g.
+    {"status": 200, "content_type": "application/json", "body": "..."}.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, disk_path=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.mem = OrderedDict()  # key -> (expires_at, value)
+        self.lock = threading.Lock()
+        self.inflight = {}        # key -> threading.Event (sync callers)
+        self.ainflight = {}       # key -> asyncio.Future (async callers)
+        self.db = None
+        if disk_path:
+            self.db = sqlite3.connect(disk_path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS responses "
+                            "(key TEXT PRIMARY KEY, expires REAL NOT NULL, value TEXT NOT NULL)")
+            self.db.commit()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+
+    # ----- tiers -----
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            item = self.mem.get(key)
+            if item and item[0] > now:
+                self.mem.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item:
+                del self.mem[key]
+            if self.db is not None:
+                row = self.db.execute("SELECT expires, value FROM responses WHERE key = ?", (key,)).fetchone()
+                if row and row[0] > now:
+                    value = json.loads(row[1])
+                    self._put_mem(key, row[0], value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+        return None
+
+    def _put_mem(self, key, expires, value):
+        self.mem[key] = (expires, value)
+        self.mem.move_to_end(key)
+        while len(self.mem) > self.max_entries:
+            self.mem.popitem(last=False)
+
+    def put(self, key, value):
+        expires = time.time() + self.ttl
+        with self.lock:
+            self._put_mem(key, expires, value)
+            if self.db is not None:
+                self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                                (key, expires, json.dumps(value)))
+                self.db.commit()
+
+    # ----- single flight -----
+    def get_or_fetch(self, payload, fetch):
+        """Thread-safe: return a cached value or call fetch() once per key."""
+        if not cacheable(payload):
+            self.upstream_calls += 1
+            return fetch()
+        key = cache_key(payload)
+        while True:
+            value = self.get(key)
+            if value is not None:
+                return value
+            with self.lock:
+                evt = self.inflight.get(key)
+                leader = evt is None
+                if leader:
+                    evt = self.inflight[key] = threading.Event()
+            if leader:
+                break
+            self.coalesced += 1
+            # the leader either stores a value (picked up on the next pass) or
+            # fails, in which case one of the waiters becomes the new leader
+            evt.wait()
+        self.misses += 1
+        try:
+            self.upstream_calls += 1
+            value = fetch()
+            if value.get("status") == 200:
+                self.put(key, value)
+            return value
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+            evt.set()
+
+    async def aget_or_fetch(self, payload, fetch):
+        """asyncio variant: `fetch` is an async callable."""
+        if not cacheable(payload):
+            self.upstream_calls += 1
+            return await fetch()
+        key = cache_key(payload)
+        value = self.get(key)
+        if value is not None:
+            return value
+        fut = self.ainflight.get(key)
+        if fut is not None:
+            self.coalesced += 1
+            return await asyncio.shield(fut)
+        fut = self.ainflight[key] = asyncio.get_running_loop().create_future()
+        self.misses += 1
+        try:
+            self.upstream_calls += 1
+            value = await fetch()
+            if value.get("status") == 200:
+                self.put(key, value)
+            fut.set_result(value)
+            return value
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                fut.cancel()
+            else:
+                fut.set_exception(e)
+                fut.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            self.ainflight.pop(key, None)
+
+    def stats(self):
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                "coalesced": self.coalesced, "upstream_calls": self.upstream_calls,
+                "entries": len(self.mem)}
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+venice_proxy.py
+
+asyncio (aiohttp) counterpart of venice-debug-proxy.js.
+
+Exposes POST /api/v1/chat/completions, forwards to Venice over one pooled
+keep-alive client session, and removes <think>...</think> content. Streaming
+requests are relayed chunk by chunk (each write awaits the client, so a slow
+caller applies backpressure upstream) with thinking stripped incrementally;
+non-streaming requests are optionally served from venice_cache.
+
+Usage:
+  export VENICE_API_KEY=...
+  python3 venice_proxy.py --port 8080 [--cache-ttl 300]
+
+Requirements:
+  pip install aiohttp
+"""
+
+import os
+import re
+import json
+import time
+import argparse
+import aiohttp
+from aiohttp import web
+
+from venice import DEFAULT_BASE, ThinkStripper, venice_parameters
+from venice_cache import ResponseCache
+
+MAX_TOKENS_CAP = 500
+UPSTREAM_CONNECTIONS = 512   # keep-alive connections to Venice per worker
+ALLOWED_KEYS = ("model", "messages", "max_tokens", "temperature", "top_p", "stream", "n", "stop")
+
+
+def sanitize_payload(body):
+    # keep only OpenAI-style keys, like sanitizePayload() in the Node proxy;
+    # ValueError for bodies the caller has to fix (answered with a 400)
+    if not isinstance(body, dict):
+        raise ValueError("body must be a JSON object")
+    payload = {k: body[k] for k in ALLOWED_KEYS if body.get(k) is not None}
+    if "max_tokens" in payload:
+        if type(payload["max_tokens"]) is not int or payload["max_tokens"] < 1:
+            raise ValueError(f"max_tokens must be a positive integer, got {payload['max_tokens']!r}")
+        payload["max_tokens"] = min(payload["max_tokens"], MAX_TOKENS_CAP)
+    payload["venice_parameters"] = venice_parameters(strip_thinking=True)
+    return payload
+
+
+def sanitize_text(raw):
+    stripper = ThinkStripper()
+    text = stripper.feed(raw or "") + stripper.flush()
+    text = text.replace("\r", "").strip()
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return re.sub(r"[ \t]{2,}", " ", text)
+
+
+def completion(model, content):
+    return {
+        "id": f"venice-proxy-{int(time.time() * 1000)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model or "unknown",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {},
+    }
+
+
+class VeniceProxy:
+    def __init__(self, base, key, cache=None):
+        self.url = base.rstrip("/") + "/chat/completions"
+        self.headers = {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
+        self.cache = cache
+        self.session = None
+
+    async def start(self, app):
+        connector = aiohttp.TCPConnector(limit=UPSTREAM_CONNECTIONS, keepalive_timeout=75)
+        self.session = aiohttp.ClientSession(headers=self.headers, connector=connector,
+                                             timeout=aiohttp.ClientTimeout(total=None, sock_read=120))
+
+    async def stop(self, app):
+        await self.session.close()
+
+    async def chat(self, request):
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.json_response({"error": "invalid_json"}, status=400)
+        try:
+            payload = sanitize_payload(body)
+        except ValueError as e:
+            return web.json_response({"error": "invalid_request", "detail": str(e)}, status=400)
+        try:
+            if payload.get("stream"):
+                return await self.relay_stream(request, payload)
+            return await self.forward_json(payload)
+        except aiohttp.ClientError as e:
+            return web.json_response({"error": "proxy_error", "detail": repr(e)}, status=502)
+
+    async def fetch_json(self, payload):
+        async with self.session.post(self.url, json=payload) as up:
+            return {"status": up.status, "content_type": up.headers.get("Content-Type", ""),
+                    "body": await up.text()}
+
+    async def forward_json(self, payload):
+        fetch = lambda: self.fetch_json(payload)
+        result = await (self.cache.aget_or_fetch(payload, fetch) if self.cache else fetch())
+        if result["status"] != 200:
+            return web.Response(status=result["status"], text=result["body"],
+                                content_type="application/json")
+        try:
+            j = json.loads(result["body"])
+            choice = (j.get("choices") or [{}])[0]
+            text = (choice.get("message") or {}).get("content") or choice.get("text") or ""
+        except ValueError:
+            text = ""
+        return web.json_response(completion(payload.get("model"), sanitize_text(text)))
+
+    async def relay_stream(self, request, payload):
+        async with self.session.post(self.url, json=payload) as up:
+            if up.status != 200:
+                return web.Response(status=up.status, text=await up.text(), content_type="application/json")
+            resp = web.StreamResponse(headers={
+                "Content-Type": "text/event-stream; charset=utf-8",
+                "Cache-Control": "no-cache",
+                "Connection": "keep-alive",
+            })
+            await resp.prepare(request)
+            try:
+                await self.relay_events(up, resp)
+            except aiohttp.ClientError as e:
+                # headers are already out: a 502 can't be sent, so end the stream with an error event
+                err = {"error": {"type": "proxy_error", "message": repr(e)}}
+                await resp.write(f"data: {json.dumps(err)}\n\n".encode())
+            await resp.write_eof()
+            return resp
+
+    async def relay_events(self, up, resp):
+        stripper = ThinkStripper()
+        started = False
+        last = None
+        async for raw in up.content:  # one SSE line at a time; nothing is buffered whole
+            line = raw.decode("utf-8", "replace").strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                obj = json.loads(data)
+            except ValueError:
+                continue
+            last = obj
+            choices = obj.get("choices") or []
+            delta = choices[0].get("delta") if choices else None
+            if delta and delta.get("content"):
+                text = stripper.feed(delta["content"])
+                if not started:
+                    text = text.lstrip()
+                if not text and not choices[0].get("finish_reason"):
+                    continue  # all thinking so far; don't send empty deltas
+                started = started or bool(text)
+                delta["content"] = text
+            # write() waits for the client socket to drain: backpressure
+            await resp.write(f"data: {json.dumps(obj)}\n\n".encode())
+        tail = stripper.flush()
+        if tail and last is not None:
+            chunk = {k: last.get(k) for k in ("id", "object", "created", "model")}
+            chunk["choices"] = [{"index": 0, "delta": {"content": tail}, "finish_reason": None}]
+            await resp.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await resp.write(b"data: [DONE]\n\n")
+
+    async def stats(self, request):
+        return web.json_response({"cache": self.cache.stats() if self.cache else None})
+
+
+def make_app(base, key, cache_ttl=0.0):
+    proxy = VeniceProxy(base, key, ResponseCache(ttl=cache_ttl) if cache_ttl > 0 else None)
+    app = web.Application(client_max_size=2 * 1024 * 1024)
+    app.on_startup.append(proxy.start)
+    app.on_cleanup.append(proxy.stop)
+    app.router.add_post("/api/v1/chat/completions", proxy.chat)
+    app.router.add_get("/stats", proxy.stats)
+    return app
+
+
+def main():
+    p = argparse.ArgumentParser(description="Async Venice proxy (OpenAI-compatible)")
+    p.add_argument("--base", default=os.getenv("VENICE_BASE_URL", DEFAULT_BASE), help="Venice base URL")
+    p.add_argument("--key", default=os.getenv("VENICE_API_KEY"), help="Venice API key (or VENICE_API_KEY)")
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=int(os.getenv("PORT", "8080")))
+    p.add_argument("--cache-ttl", type=float, default=0.0,
+                   help="Cache identical non-streaming requests for this many seconds (0 = off)")
+    args = p.parse_args()
+    if not args.key:
+        raise SystemExit("ERROR: No API key provided. Set VENICE_API_KEY or pass --key.")
+    web.run_app(make_app(args.base, args.key, args.cache_ttl), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+venice_session.py
+
+Token-budgeted multi-turn conversations for Venice chat/completions.
+
+Resending the whole `messages` array every turn makes prompt size (and with
+it latency and cost) grow without bound. A Conversation keeps the history
+locally, estimates tokens per message once when it is added, and compacts
+when the prompt would exceed the budget: the oldest turns are dropped (or
+folded into a running summary with --summarize) until the prompt is down to
+LOW_WATER of the budget. Compacting in one big step instead of sliding the
+window every turn keeps the prompt an append-only extension of the previous
+one -- system prompt, summary, retained turns -- so upstream prefix caching
+keeps hitting until the next compaction.
+
+Token counts come from tiktoken when it is installed, else a chars/4
+heuristic. Either way the estimate is corrected by the difference to the
+usage.prompt_tokens Venice reports (which includes its own system prompt).
+
+Usage:
+  python3 venice.py chat --session s.json --budget 2000          # one user turn per stdin line
+  python3 venice.py chat --session s.json --prompt "and then?"   # one turn, state kept in s.json
+  python3 venice.py chat --summarize --stream --system "You are a concise voice assistant."
+
+Each turn reports on stderr the estimated prompt tokens sent, what the full
+history would have cost, and the difference saved.
+"""
+
+import os
+import sys
+import json
+import argparse
+import requests
+
+from venice import DEFAULT_BASE, DEFAULT_MODEL, SESSION, ThinkStripper, build_payload, stream_chat
+
+DEFAULT_BUDGET = 3000      # prompt tokens per request, estimated
+LOW_WATER = 0.6            # compaction trims the prompt down to this fraction of the budget
+KEEP_MESSAGES = 3          # newest messages never compacted (the current user turn and the exchange before it)
+MESSAGE_OVERHEAD = 4       # role / separator tokens per chat message
+SUMMARY_TOKENS = 300       # max_tokens for a --summarize call
+CALIBRATION_ALPHA = 0.3    # weight of the newest usage.prompt_tokens sample
+SUMMARY_PROMPT = ("Summarize the conversation below for your own later reference. Keep names, numbers, "
+                  "decisions and open questions; drop pleasantries. Reply with the summary only.")
+
+_encoding = None
+
+
+def count_tokens(text):
+    """tiktoken's cl100k_base count when available, else ~4 characters per token."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:  # not installed, or no cached encoding offline
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def strip_think(text):
+    s = ThinkStripper()
+    return s.feed(text) + s.flush()
+
+
+class Conversation:
+    """Local chat history kept under a prompt-token budget.
+
+    Messages are stored as {"role", "content", "tokens"}; only role and
+    content are sent. `summarizer(previous_summary, dropped_messages)` returns
+    the new summary text; without one, compacted turns are simply dropped.
+    """
+
+    def __init__(self, system=None, budget=DEFAULT_BUDGET, summarizer=None):
+        self.system = system
+        self.budget = budget
+        self.summarizer = summarizer
+        self.summary = ""
+        self.turns = []
+        self.offset = 0.0          # usage.prompt_tokens - estimate, EWMA (hidden system prompt, tokenizer error)
+        self.full_tokens = self._tokens(system) if system else 0  # every message ever added
+        self.sent_tokens = 0       # estimated prompt tokens actually sent, all turns
+        self.unpruned_tokens = 0   # what resending the full history would have cost, all turns
+        self.summary_tokens = 0    # prompt + completion tokens spent on --summarize calls
+        self.compactions = 0
+        self.turn = 0
+
+    # ----- persistence -----
+    @classmethod
+    def load(cls, path, **kwargs):
+        conv = cls(**kwargs)
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            for k in ("system", "summary", "turns", "offset", "full_tokens", "sent_tokens",
+                      "unpruned_tokens", "summary_tokens", "compactions", "turn"):
+                if k in state:
+                    setattr(conv, k, state[k])
+            if kwargs.get("system") and kwargs["system"] != state.get("system"):
+                conv.system = kwargs["system"]  # a new system prompt wins; it invalidates the cached prefix once
+        return conv
+
+    def save(self, path):
+        state = {k: getattr(self, k) for k in ("system", "summary", "turns", "offset", "full_tokens", "sent_tokens",
+                                              "unpruned_tokens", "summary_tokens", "compactions", "turn")}
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    # ----- history -----
+    @staticmethod
+    def _tokens(content):
+        return count_tokens(content) + MESSAGE_OVERHEAD
+
+    def add(self, role, content):
+        tokens = self._tokens(content)
+        self.turns.append({"role": role, "content": content, "tokens": tokens})
+        self.full_tokens += tokens
+
+    def retract(self):
+        # undo add() for a turn that never got an answer
+        self.full_tokens -= self.turns.pop()["tokens"]
+
+    def _prefix(self):
+        out = []
+        if self.system:
+            out.append({"role": "system", "content": self.system})
+        if self.summary:
+            out.append({"role": "system", "content": "Earlier in this conversation: " + self.summary})
+        return out
+
+    def messages(self):
+        return self._prefix() + [{"role": m["role"], "content": m["content"]} for m in self.turns]
+
+    def prompt_tokens(self):
+        est = sum(self._tokens(m["content"]) for m in self._prefix()) + sum(m["tokens"] for m in self.turns)
+        return est + max(0, int(self.offset))
+
+    # ----- compaction -----
+    def compact(self):
+        """Drop (or summarize) the oldest turns if the prompt is over budget."""
+        if self.prompt_tokens() <= self.budget:
+            return False
+        target = self.budget * LOW_WATER
+        keep = len(self.turns) - KEEP_MESSAGES
+        cut, over = 0, self.prompt_tokens() - target
+        while cut < keep and over > 0:
+            over -= self.turns[cut]["tokens"]
+            cut += 1
+        while cut < keep and self.turns[cut]["role"] != "user":
+            cut += 1  # history always resumes on a user message
+        if cut == 0:
+            return False
+        dropped, self.turns = self.turns[:cut], self.turns[cut:]
+        if self.summarizer:
+            try:
+                self.summary = self.summarizer(self.summary, dropped)
+            except Exception as e:
+                print(f"[warn] summarize failed ({e!r}); dropping {cut} messages instead", file=sys.stderr)
+        self.compactions += 1
+        return True
+
+    def observe(self, estimate, usage):
+        """Fold the reported prompt size into the estimate correction."""
+        actual = (usage or {}).get("prompt_tokens")
+        if actual:
+            sample = actual - estimate
+            self.offset = sample if self.turn == 0 else (1 - CALIBRATION_ALPHA) * self.offset + CALIBRATION_ALPHA * sample
+
+    def record(self, sent):
+        # sent: estimated prompt tokens of this request; the unpruned history is what the old code resent
+        full = self.full_tokens + max(0, int(self.offset))
+        self.turn += 1
+        self.sent_tokens += sent
+        self.unpruned_tokens += full
+        return {"turn": self.turn, "sent": sent, "full": full, "saved": full - sent}
+
+    def stats(self):
+        saved = self.unpruned_tokens - self.sent_tokens - self.summary_tokens
+        pct = 100.0 * saved / self.unpruned_tokens if self.unpruned_tokens else 0.0
+        return (f"Session: {self.turn} turns, ~{self.sent_tokens} prompt tokens sent vs ~{self.unpruned_tokens} "
+                f"for the full history; {self.compactions} compactions"
+                + (f", {self.summary_tokens} spent summarizing" if self.summary_tokens else "")
+                + f"; net saved ~{saved} ({pct:.0f}%)")
+
+
+def make_summarizer(conv, url, headers, args):
+    def summarize(previous, dropped):
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in dropped)
+        text = (f"Summary so far:\n{previous}\n\n" if previous else "") + f"Conversation:\n{transcript}"
+        payload = build_payload(args, [{"role": "system", "content": SUMMARY_PROMPT},
+                                       {"role": "user", "content": text}])
+        payload["max_tokens"] = SUMMARY_TOKENS
+        resp = SESSION.post(url, headers=headers, json=payload, timeout=args.timeout)
+        resp.raise_for_status()
+        body = resp.json()
+        usage = body.get("usage") or {}
+        conv.summary_tokens += (usage.get("prompt_tokens") or count_tokens(text)) + (usage.get("completion_tokens") or 0)
+        return strip_think(body["choices"][0]["message"]["content"]).strip()
+    return summarize
+
+
+def chat_turn(conv, url, headers, args, prompt):
+    conv.add("user", prompt)
+    if conv.compact():
+        print(f"[session] compacted to {len(conv.turns)} messages"
+              + (" + summary" if conv.summary else ""), file=sys.stderr)
+    sent = conv.prompt_tokens()
+    estimate = sent - max(0, int(conv.offset))
+    payload = build_payload(args, conv.messages())
+
+    try:
+        if args.stream:
+            m = stream_chat(url, headers, payload, args.timeout)
+            if m["status"] != 200:
+                raise RuntimeError(f"HTTP {m['status']}: {m['error']}")
+            reply, usage = m["text"], m["usage"]
+        else:
+            resp = SESSION.post(url, headers=headers, json=payload, timeout=args.timeout)
+            if resp.status_code != 200:
+                raise RuntimeError(f"HTTP {resp.status_code}: {resp.text.strip()[:500]}")
+            body = resp.json()
+            reply, usage = strip_think(body["choices"][0]["message"]["content"]).strip(), body.get("usage")
+            print(reply)
+    except Exception:
+        conv.retract()  # unanswered: the user turn is not kept, so a retry doesn't duplicate it
+        raise
+
+    conv.observe(estimate, usage)
+    r = conv.record(sent)
+    conv.add("assistant", reply.strip())
+    cached = ((usage or {}).get("prompt_tokens_details") or {}).get("cached_tokens")
+    pct = 100.0 * r["saved"] / r["full"] if r["full"] else 0.0
+    print(f"[session] turn {r['turn']}: prompt ~{r['sent']} tokens"
+          + (f" (reported {usage['prompt_tokens']}" + (f", {cached} cached" if cached else "") + ")"
+             if (usage or {}).get("prompt_tokens") else "")
+          + f", full history ~{r['full']}, saved ~{r['saved']} ({pct:.0f}%)", file=sys.stderr)
+    return reply
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="venice.py chat", description="Token-budgeted multi-turn Venice chat")
+    p.add_argument("--base", default=os.getenv("VENICE_BASE_URL", DEFAULT_BASE), help="Venice base URL")
+    p.add_argument("--key", default=os.getenv("VENICE_API_KEY"), help="Venice API key (or VENICE_API_KEY)")
+    p.add_argument("--model", default=DEFAULT_MODEL, help=f"Model id (default {DEFAULT_MODEL})")
+    p.add_argument("--system", help="System prompt (kept first, so it stays in the cached prefix)")
+    p.add_argument("--prompt", help="Send one user turn and exit (default: one turn per stdin line)")
+    p.add_argument("--session", metavar="PATH", help="Load/save the conversation state as JSON")
+    p.add_argument("--budget", type=int, default=DEFAULT_BUDGET, help="Prompt token budget per request")
+    p.add_argument("--summarize", action="store_true",
+                   help="Fold compacted turns into a running summary instead of dropping them")
+    p.add_argument("--max-tokens", type=int, default=500)
+    p.add_argument("--temperature", type=float, default=None)
+    p.add_argument("--timeout", type=float, default=30.0)
+    p.add_argument("--strip-thinking", action="store_true", help="Ask Venice to strip thinking content")
+    p.add_argument("--stream", action="store_true", help="Stream replies (SSE)")
+    args = p.parse_args(argv)
+
+    if not args.key:
+        print("ERROR: No API key provided. Set VENICE_API_KEY or pass --key.", file=sys.stderr)
+        sys.exit(2)
+
+    url = args.base.rstrip("/") + "/chat/completions"
+    headers = {"Authorization": f"Bearer {args.key}", "Content-Type": "application/json"}
+    conv = Conversation.load(args.session, system=args.system, budget=args.budget)
+    if args.summarize:
+        conv.summarizer = make_summarizer(conv, url, headers, args)
+
+    prompts = [args.prompt] if args.prompt is not None else (line.strip() for line in sys.stdin)
+    failed = False
+    for prompt in prompts:
+        if not prompt:
+            continue
+        try:
+            chat_turn(conv, url, headers, args, prompt)
+        except (requests.RequestException, RuntimeError) as e:
+            print(f"[err] {e}", file=sys.stderr)
+            failed = True
+            if args.prompt is not None:
+                break
+        if args.session:
+            conv.save(args.session)
+    print(conv.stats(), file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()